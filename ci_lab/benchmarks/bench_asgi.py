@@ -0,0 +1,83 @@
+"""
+Benchmark: Flask (threaded WSGI) versus the ASGI app under high concurrency
+
+Starts each app as a local server process, drives it with many concurrent
+keep-alive connections issuing a GET/PUT mix, and reports requests/sec and
+latency percentiles. The ASGI side needs an ASGI server:
+    pip install uvicorn
+
+Run from the ci_lab directory:
+    python -m benchmarks.bench_asgi [--concurrency 256] [--seconds 10]
+"""
+
+import argparse
+import asyncio
+import time
+from benchmarks.loadgen import (
+    HOST,
+    SERVERS,
+    Client,
+    free_port,
+    percentile,
+    start_server,
+)
+
+COUNTERS = 100
+
+
+async def connection(port, number, stop_at, latencies):
+    """One client connection issuing requests until stop_at"""
+    client = Client(HOST, port)
+    i = number
+    while time.perf_counter() < stop_at:
+        method = "PUT" if i % 4 == 0 else "GET"
+        started = time.perf_counter()
+        await client.request(method, f"/counters/c{i % COUNTERS}")
+        latencies.append(time.perf_counter() - started)
+        i += 1
+    client.close()
+
+
+async def drive(port, concurrency, seconds):
+    """Create the counters, then run the load; return the latencies"""
+    client = Client(HOST, port)
+    await client.request("POST", "/counters/reset")
+    for i in range(COUNTERS):
+        await client.request("POST", f"/counters/c{i}")
+    client.close()
+    latencies = []
+    stop_at = time.perf_counter() + seconds
+    await asyncio.gather(
+        *(connection(port, i, stop_at, latencies) for i in range(concurrency))
+    )
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=256)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    print(f"{'server':>6} {'req/s':>9} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for name, command in SERVERS.items():
+        port = free_port()
+        try:
+            process = start_server(command, port)
+        except RuntimeError as error:
+            print(f"{name:>6} skipped: {error}")
+            continue
+        try:
+            latencies = sorted(asyncio.run(drive(port, args.concurrency, args.seconds)))
+        finally:
+            process.terminate()
+            process.wait()
+        print(
+            f"{name:>6} {len(latencies) / args.seconds:>9,.0f} "
+            f"{percentile(latencies, 0.50) * 1e3:>9.2f} "
+            f"{percentile(latencies, 0.99) * 1e3:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
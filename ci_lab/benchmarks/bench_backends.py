@@ -0,0 +1,79 @@
+"""
+Benchmark: every storage backend through the same workload
+
+Each backend gets the same counters and the same sequence of operations;
+the table reports mean microseconds per call of each operation.
+
+Run from the ci_lab directory:
+    python -m benchmarks.bench_backends [--counters 100000]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from src.backends import DictCounterStore, SQLiteCounterStore
+from src.shm import SharedCounterStore
+from src.store import CounterStore
+
+OPERATIONS = 2_000
+QUERIES = 50
+
+
+def backends(directory, counters):
+    """Yield (name, store) for every backend, sized for the workload"""
+    yield "indexed", CounterStore()
+    yield "dict", DictCounterStore()
+    yield "sqlite", SQLiteCounterStore()
+    yield "sqlite-file", SQLiteCounterStore(os.path.join(directory, "c.db"))
+    slots = max(64, counters * 2 // 64)
+    yield "shm", SharedCounterStore(
+        os.path.join(directory, "c.shm"), stripes=64, slots_per_stripe=slots
+    )
+
+
+def timed(function, arguments):
+    """Return mean microseconds per call of function over arguments"""
+    started = time.perf_counter()
+    for argument in arguments:
+        function(*argument)
+    return (time.perf_counter() - started) / len(arguments) * 1e6
+
+
+def run(store, names):
+    """Run the workload against store; return {operation: microseconds}"""
+    started = time.perf_counter()
+    for name in names:
+        store.create(name, random.randrange(1000))
+    results = {"load (s)": time.perf_counter() - started}
+    hot = [(random.choice(names),) for _ in range(OPERATIONS)]
+    results["increment"] = timed(store.increment, hot)
+    results["get"] = timed(store.get, hot)
+    results["set"] = timed(store.set, [(name, 7) for (name,) in hot])
+    results["top10"] = timed(store.top, [(10,)] * QUERIES)
+    results["greater"] = timed(store.greater_than, [(995,)] * QUERIES)
+    results["page100"] = timed(store.page, [(names[i], 100) for i in range(QUERIES)])
+    results["total"] = timed(store.total, [()] * QUERIES)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--counters", type=int, default=100_000)
+    args = parser.parse_args()
+    names = [f"counter_{i}" for i in range(args.counters)]
+
+    columns = None
+    with tempfile.TemporaryDirectory() as directory:
+        for backend, store in backends(directory, args.counters):
+            results = run(store, names)
+            if columns is None:
+                columns = list(results)
+                print(f"{'backend':>12}" + "".join(f"{c:>11}" for c in columns))
+            print(f"{backend:>12}" + "".join(f"{results[c]:>11.2f}" for c in columns))
+    print("(microseconds per call, except load)")
+
+
+if __name__ == "__main__":
+    main()
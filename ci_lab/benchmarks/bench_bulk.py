@@ -0,0 +1,58 @@
+"""
+Benchmark: bulk delete by predicate versus one DELETE per counter
+
+Fills the indexed store, then removes the lowest tenth of the counters
+through the Flask test client two ways: one POST /counters/bulk/delete?lt=
+request, and one DELETE /counters/<name> request per counter as a cleanup
+job without the bulk route would send. Network latency, which multiplies
+the cost of the second way, is not included.
+
+Run from the ci_lab directory:
+    python -m benchmarks.bench_bulk [--sizes 10000 100000]
+"""
+
+import argparse
+import time
+from src import app, counter
+from src.store import CounterStore
+
+
+def filled(size):
+    """Return an indexed store with size counters valued 0 .. size - 1"""
+    store = CounterStore()
+    for i in range(size):
+        store.create(f"c{i}", i)
+    return store
+
+
+def bulk(client, threshold):
+    """Delete every counter below threshold with one request"""
+    client.post(f"/counters/bulk/delete?lt={threshold}")
+
+
+def one_by_one(client, threshold):
+    """Delete every counter below threshold with a request each"""
+    for i in range(threshold):
+        client.delete(f"/counters/c{i}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    client = app.test_client()
+    print(f"{'counters':>10} {'deleted':>9} {'method':>12} {'ms':>10}")
+    for size in args.sizes:
+        threshold = size // 10
+        for label, function in (("bulk", bulk), ("one by one", one_by_one)):
+            counter.STORE = filled(size)
+            started = time.perf_counter()
+            function(client, threshold)
+            elapsed = (time.perf_counter() - started) * 1e3
+            assert len(counter.STORE) == size - threshold
+            print(f"{size:>10,} {threshold:>9,} {label:>12} {elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark: one counter process versus a hash-partitioned cluster
+
+Launches a single service process and a cluster of --nodes node processes
+with a router, creates the same counters in each, then drives increments
+for a fixed time over concurrent connections three ways: to the single
+process, through the router, and straight to the owning node with the
+ring built from the router's GET /cluster, as a cluster-aware client would
+do. Then times a scatter-gather query (top 10) against a single process.
+The cluster can only go faster with as many free cores as nodes, plus
+some for the router and this load generator.
+
+Run from the ci_lab directory:
+    python -m benchmarks.bench_cluster [--nodes 4] [--connections 32] [--seconds 5]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from urllib.parse import urlsplit
+from benchmarks.loadgen import HOST, SERVERS, Client, free_port, start_server
+from src.cluster import HashRing
+
+COUNTERS = 1_000
+QUERIES = 200
+
+
+async def increments(targets, connections, seconds):
+    """PUT increments until time is up; targets(name) gives (host, port)
+
+    Each connection keeps one client per server. Returns increments/sec.
+    """
+    stop_at = time.perf_counter() + seconds
+
+    async def connection(number):
+        clients, done = {}, 0
+        while time.perf_counter() < stop_at:
+            name = f"c{(number * 7919 + done) % COUNTERS}"
+            address = targets(name)
+            if address not in clients:
+                clients[address] = Client(*address)
+            await clients[address].request("PUT", f"/counters/{name}")
+            done += 1
+        for client in clients.values():
+            client.close()
+        return done
+
+    counts = await asyncio.gather(*(connection(n) for n in range(connections)))
+    return sum(counts) / seconds
+
+
+async def setup(port):
+    """Create the counters through one server"""
+    client = Client(HOST, port)
+    await client.request("POST", "/counters/reset")
+    for i in range(COUNTERS):
+        await client.request("POST", f"/counters/c{i}")
+    client.close()
+
+
+async def query_latency(port, path):
+    """Mean milliseconds for one GET of path, one request at a time"""
+    client = Client(HOST, port)
+    started = time.perf_counter()
+    for _ in range(QUERIES):
+        await client.request("GET", path)
+    client.close()
+    return (time.perf_counter() - started) / QUERIES * 1e3
+
+
+def start_cluster(nodes, port):
+    """Launch python -m src.cluster and wait for its router"""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "src.cluster", HOST, str(port), "--nodes", str(nodes)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://{HOST}:{port}/cluster") as reply:
+                return process, json.load(reply)["nodes"]
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("cluster did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--nodes", type=int, default=4)
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    single_port, router_port = free_port(), free_port()
+    single = start_server(SERVERS["flask"], single_port)
+    cluster, urls = start_cluster(args.nodes, router_port)
+    try:
+        ring = HashRing([f"node-{number}" for number in range(len(urls))])
+        owners = {
+            f"node-{number}": (HOST, urlsplit(url).port)
+            for number, url in enumerate(urls)
+        }
+        asyncio.run(setup(single_port))
+        asyncio.run(setup(router_port))
+        print(f"{os.cpu_count()} cores, {args.nodes} nodes")
+        print(f"{'target':>24} {'increments/s':>13}")
+        runs = [
+            ("single process", lambda name: (HOST, single_port)),
+            ("cluster, via router", lambda name: (HOST, router_port)),
+            ("cluster, client-side", lambda name: owners[ring.node_for(name)]),
+        ]
+        for label, targets in runs:
+            rate = asyncio.run(increments(targets, args.connections, args.seconds))
+            print(f"{label:>24} {rate:>13,.0f}")
+        print(f"{'top 10':>24} {'ms':>13}")
+        for label, port in (("single process", single_port), ("cluster", router_port)):
+            latency = asyncio.run(query_latency(port, "/counters/top/10"))
+            print(f"{label:>24} {latency:>13.2f}")
+    finally:
+        for process in (single, cluster):
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark: value distribution, maintained histogram versus scan
+
+Fills the indexed store and the plain dict store with Pareto-distributed
+values, then times a distribution query (three quantiles and the log2
+buckets) as the number of counters grows. The indexed store reads ranks
+from its value index and buckets from its histogram; the dict store sorts
+every value on each call.
+
+Run from the ci_lab directory:
+    python -m benchmarks.bench_distribution [--sizes 10000 100000 1000000]
+"""
+
+import argparse
+import random
+import time
+from src.backends import DictCounterStore
+from src.store import CounterStore
+
+QUANTILES = [0.5, 0.9, 0.99]
+REPEATS = 20
+
+
+def fill(store, size):
+    """Create size counters with heavy-tailed values"""
+    rng = random.Random(42)
+    for i in range(size):
+        store.create(f"c{i}", int(rng.paretovariate(1.2)))
+
+
+def timed(function, *arguments):
+    """Return mean milliseconds per call"""
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        function(*arguments)
+    return (time.perf_counter() - started) / REPEATS * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    args = parser.parse_args()
+
+    print(f"{'counters':>10} {'store':>8} {'distribution (ms)':>18}")
+    for size in args.sizes:
+        for label, store in (("indexed", CounterStore()), ("dict", DictCounterStore())):
+            fill(store, size)
+            elapsed = timed(store.distribution, QUANTILES)
+            print(f"{size:>10,} {label:>8} {elapsed:>18.3f}")
+
+
+if __name__ == "__main__":
+    main()
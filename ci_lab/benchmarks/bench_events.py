@@ -0,0 +1,44 @@
+"""
+Benchmark: write cost with stream subscribers that never read
+
+Times increments on the indexed store with no subscribers and with many
+subscribers that never take their changes, the worst case of slow
+consumers. Coalescing keeps each subscriber's queue at one entry per
+counter (bounded by its capacity), so writers pay a fixed, small cost per
+subscriber and never wait on a consumer.
+
+Run from the ci_lab directory:
+    python -m benchmarks.bench_events [--subscribers 0 1 10 100]
+"""
+
+import argparse
+import time
+from src.store import CounterStore
+
+COUNTERS = 1000
+INCREMENTS = 100_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[0, 1, 10, 100])
+    args = parser.parse_args()
+
+    print(f"{'subscribers':>11} {'us/increment':>13} {'max queued':>11}")
+    for count in args.subscribers:
+        store = CounterStore()
+        for i in range(COUNTERS):
+            store.create(f"c{i}")
+        subscriptions = [store.events.subscribe() for _ in range(count)]
+        for subscription in subscriptions:
+            subscription.take(0)
+        started = time.perf_counter()
+        for i in range(INCREMENTS):
+            store.increment(f"c{i % COUNTERS}")
+        elapsed = time.perf_counter() - started
+        queued = max((len(s._pending) for s in subscriptions), default=0)
+        print(f"{count:>11} {elapsed / INCREMENTS * 1e6:>13.2f} {queued:>11}")
+
+
+if __name__ == "__main__":
+    main()
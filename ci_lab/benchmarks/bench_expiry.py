@@ -0,0 +1,57 @@
+"""
+Benchmark: cost of counter expiry as the number of TTL counters grows
+
+Gives every counter a TTL, then advances a fake clock one tick at a time
+and times the expiry pass that runs before each request. The cost per
+expired counter stays flat because the timing wheel only touches the
+entries that are due, never the whole store.
+
+Run from the ci_lab directory:
+    python -m benchmarks.bench_expiry [--sizes 10000 100000 1000000]
+"""
+
+import argparse
+import random
+import time
+from src.expiry import CounterExpiry
+from src.store import CounterStore
+
+
+def run(size, seed=0):
+    """Return (seconds per idle pass, seconds per expired counter)"""
+    rng = random.Random(seed)
+    now = [0.0]
+    store = CounterStore()
+    store.expiry = store.observers[-1] = CounterExpiry(clock=lambda: now[0])
+    for i in range(size):
+        store.create(f"c{i}")
+        store.expiry.set_ttl(f"c{i}", rng.uniform(1, 3600))
+
+    started = time.perf_counter()
+    for _ in range(1_000):
+        store.expiry.expire(store)
+    idle = (time.perf_counter() - started) / 1_000
+
+    started = time.perf_counter()
+    expired = 0
+    while len(store):
+        now[0] += 1
+        expired += store.expiry.expire(store)
+    return idle, (time.perf_counter() - started) / expired
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    args = parser.parse_args()
+
+    print(f"{'counters':>10} {'idle pass (us)':>15} {'per expiry (us)':>16}")
+    for size in args.sizes:
+        idle, per_expiry = run(size)
+        print(f"{size:>10,} {idle * 1e6:>15.2f} {per_expiry * 1e6:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: increment throughput with striped locks versus one global lock
+
+The global-lock store makes every increment hold one lock across the
+value, the index, stats and histogram updates, the version stamp and the
+rate rings, as the store did before striping. The striped store holds
+only the name's stripe: index updates are queued for readers to apply,
+and versions and rates are split by the same stripes. Increments go
+through the store and the rate rings, as the PUT route does. Under
+CPython's GIL the interpreter serializes bytecode anyway, so expect the
+two to be close there; on a free-threaded build (3.13t) only the striped
+store's writers can run in parallel.
+
+Run from the ci_lab directory:
+    python -m benchmarks.bench_locks
+"""
+
+import threading
+import time
+from src.backends import notify
+from src.store import CounterStore, DEFAULT_STRIPES
+
+COUNTERS = 1_000
+INCREMENTS = 20_000
+THREAD_COUNTS = (1, 2, 4, 8, 16)
+
+
+class GlobalLockStore(CounterStore):
+    """One stripe, with every derived structure updated inside its lock"""
+
+    def __init__(self):
+        super().__init__(stripes=1)
+
+    def _apply(self, name, old, new):
+        for derived in self.derived:
+            notify(derived, name, old, new)
+        for observer in self.observers:
+            notify(observer, name, old, new)
+
+
+def run(store, threads):
+    """Return increments/second for threads hammering distinct counters"""
+    names = [f"c{i}" for i in range(COUNTERS)]
+    for name in names:
+        store.create(name)
+    barrier = threading.Barrier(threads + 1)
+
+    def work(offset):
+        barrier.wait()
+        for i in range(INCREMENTS):
+            name = names[(offset + i) % COUNTERS]
+            store.increment(name)
+            store.rates.record(name)
+
+    workers = [
+        threading.Thread(target=work, args=(i * COUNTERS // threads,))
+        for i in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    started = time.perf_counter()
+    barrier.wait()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    assert store.total() == threads * INCREMENTS
+    store.check()
+    return threads * INCREMENTS / elapsed
+
+
+def main():
+    print(f"{'threads':>8} {'global (ops/s)':>15} {'striped (ops/s)':>16}")
+    for threads in THREAD_COUNTS:
+        single = run(GlobalLockStore(), threads)
+        striped = run(CounterStore(stripes=DEFAULT_STRIPES), threads)
+        print(f"{threads:>8} {single:>15,.0f} {striped:>16,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark: resident memory per counter for each in-memory backend
+
+Loads N counters into one backend in a fresh child process and reports
+the growth in resident set size divided by N, so each number reflects
+only that backend's structures.
+
+Run from the ci_lab directory:
+    python -m benchmarks.bench_memory [--sizes 1000000 10000000]
+        [--backends dict compact indexed]
+"""
+
+import argparse
+import subprocess
+import sys
+
+BACKENDS = {
+    "dict": "from src.backends import DictCounterStore as Store",
+    "compact": "from src.compact import CompactCounterStore as Store",
+    "indexed": "from src.store import CounterStore as Store",
+}
+
+CHILD = """
+import os, sys
+{import_line}
+
+def rss():
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+size = int(sys.argv[1])
+store = Store()
+before = rss()
+for i in range(size):
+    store.create(f"svc_region_{{i}}", i)
+print(rss() - before)
+"""
+
+
+def measure(backend, size):
+    """Return bytes of RSS growth per counter for size counters in backend"""
+    code = CHILD.format(import_line=BACKENDS[backend])
+    output = subprocess.run(
+        [sys.executable, "-c", code, str(size)],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return int(output) / size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument(
+        "--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS)
+    )
+    args = parser.parse_args()
+
+    print(f"{'counters':>12}" + "".join(f"{name:>10}" for name in args.backends))
+    for size in args.sizes:
+        row = [measure(backend, size) for backend in args.backends]
+        print(f"{size:>12,}" + "".join(f"{per:>10.1f}" for per in row))
+    print("(bytes of resident memory per counter; names like svc_region_123456)")
+
+
+if __name__ == "__main__":
+    main()
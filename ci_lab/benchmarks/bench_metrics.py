@@ -0,0 +1,54 @@
+"""
+Benchmark: cost of recording request metrics
+
+Times RequestMetrics.observe on its own, then a GET through the Flask test
+client with METRICS_ENABLED on and off.
+
+Run from the ci_lab directory:
+    python -m benchmarks.bench_metrics [--requests 20000]
+"""
+
+import argparse
+import time
+from src import app
+from src.counter import METRICS
+from src.metrics import RequestMetrics
+
+
+def time_observe(calls):
+    """Return the mean seconds per RequestMetrics.observe call"""
+    metrics = RequestMetrics()
+    started = time.perf_counter()
+    for i in range(calls):
+        metrics.observe("/counters/<name>", "GET", 200, (i % 100) * 1e-5)
+    return (time.perf_counter() - started) / calls
+
+
+def time_requests(client, requests, enabled):
+    """Return the mean seconds per GET with metrics on or off"""
+    app.config["METRICS_ENABLED"] = enabled
+    started = time.perf_counter()
+    for _ in range(requests):
+        client.get("/counters/c")
+    return (time.perf_counter() - started) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+
+    print(f"observe():           {time_observe(args.requests * 10) * 1e6:8.3f} us")
+    client = app.test_client()
+    client.post("/counters/reset")
+    client.post("/counters/c")
+    METRICS.reset()
+    off = min(time_requests(client, args.requests, False) for _ in range(3))
+    on = min(time_requests(client, args.requests, True) for _ in range(3))
+    print(f"request, metrics off: {off * 1e6:8.2f} us")
+    print(f"request, metrics on:  {on * 1e6:8.2f} us")
+    print(f"overhead per request: {(on - off) * 1e6:8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
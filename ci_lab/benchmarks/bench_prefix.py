@@ -0,0 +1,53 @@
+"""
+Benchmark: prefix listing and aggregates, name index versus scan
+
+Fills the indexed store and the plain dict store with svc_region_metric
+style names, then times a 100-counter prefix page and a prefix aggregate
+over one service as the total number of counters grows. The indexed
+store's cost follows the matching names; the dict store scans them all.
+
+Run from the ci_lab directory:
+    python -m benchmarks.bench_prefix [--sizes 10000 100000 1000000]
+"""
+
+import argparse
+import time
+from src.backends import DictCounterStore
+from src.store import CounterStore
+
+SERVICES = 100
+REPEATS = 20
+
+
+def fill(store, size):
+    """Create size counters spread evenly across SERVICES services"""
+    for i in range(size):
+        store.create(f"svc{i % SERVICES}_region{i // SERVICES % 10}_m{i}", i)
+
+
+def timed(function, *arguments):
+    """Return mean milliseconds per call"""
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        function(*arguments)
+    return (time.perf_counter() - started) / REPEATS * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    args = parser.parse_args()
+
+    print(f"{'counters':>10} {'store':>8} {'page100 (ms)':>13} {'stats (ms)':>11}")
+    for size in args.sizes:
+        for label, store in (("indexed", CounterStore()), ("dict", DictCounterStore())):
+            fill(store, size)
+            page = timed(store.prefix, "svc7_", None, 100)
+            stats = timed(store.prefix_summary, "svc7_")
+            print(f"{size:>10,} {label:>8} {page:>13.3f} {stats:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
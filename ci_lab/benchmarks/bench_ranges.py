@@ -0,0 +1,54 @@
+"""
+Benchmark: greater/less/equal filters via the value index versus a full scan
+
+The threshold is chosen so each query matches about 0.1% of the counters;
+the scan cost grows with the total, the index cost with the result.
+
+Run from the ci_lab directory:
+    python -m benchmarks.bench_ranges
+"""
+
+import random
+import timeit
+from src.index import CounterIndex
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+REPEAT = 20
+
+
+def main():
+    print(
+        f"{'counters':>10} {'query':>8} {'matches':>8} "
+        f"{'scan (ms)':>10} {'index (ms)':>11}"
+    )
+    for size in SIZES:
+        counters = {f"counter_{i}": random.randrange(size) for i in range(size)}
+        index = CounterIndex()
+        for name, value in counters.items():
+            index.add(name, value)
+        high = size - size // 1000 - 1
+        low = size // 1000
+        value = counters["counter_0"]
+        queries = (
+            ("greater", lambda: [k for k, v in counters.items() if v > high]),
+            ("less", lambda: [k for k, v in counters.items() if v < low]),
+            ("equal", lambda: [k for k, v in counters.items() if v == value]),
+        )
+        indexed = {
+            "greater": lambda: index.greater_than(high),
+            "less": lambda: index.less_than(low),
+            "equal": lambda: index.equal_to(value),
+        }
+        for name, scan in queries:
+            scan_s = min(timeit.repeat(scan, number=1, repeat=3))
+            index_s = (
+                min(timeit.repeat(indexed[name], number=REPEAT, repeat=3)) / REPEAT
+            )
+            print(
+                f"{size:>10} {name:>8} {len(indexed[name]()):>8} "
+                f"{scan_s * 1e3:>10.3f} {index_s * 1e3:>11.4f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark: rank lookups, order-statistics index versus scan
+
+Fills the indexed store, the plain dict store and SQLite, then times
+looking up one counter's rank and the counter at a middle rank as the
+number of counters grows. The indexed store answers both from positions
+in its SortedList value index in O(log n); the dict store scans, and
+SQLite counts a range of its value index.
+
+Run from the ci_lab directory:
+    python -m benchmarks.bench_rank [--sizes 10000 100000 1000000]
+"""
+
+import argparse
+import random
+import time
+from src.backends import DictCounterStore, SQLiteCounterStore
+from src.store import CounterStore
+
+LOOKUPS = 100
+STORES = {
+    "indexed": CounterStore,
+    "dict": DictCounterStore,
+    "sqlite": SQLiteCounterStore,
+}
+
+
+def timed(function, arguments):
+    """Return mean microseconds per call over the arguments"""
+    started = time.perf_counter()
+    for argument in arguments:
+        function(argument)
+    return (time.perf_counter() - started) / len(arguments) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(f"{'counters':>10} {'store':>8} {'rank (us)':>12} {'at_rank (us)':>13}")
+    for size in args.sizes:
+        names = [f"c{rng.randrange(size)}" for _ in range(LOOKUPS)]
+        ranks = [rng.randrange(1, size + 1) for _ in range(LOOKUPS)]
+        for label, factory in STORES.items():
+            store = factory()
+            for i in range(size):
+                store.create(f"c{i}", rng.randrange(size))
+            rank = timed(store.rank, names)
+            at_rank = timed(store.at_rank, ranks)
+            print(f"{size:>10,} {label:>8} {rank:>12.1f} {at_rank:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark: cost of recording increments for sliding-window rates
+
+Times CounterRates.record on hot and cold counters, a one-minute count
+and a top-10 by rate, and reports the memory held per active counter.
+
+Run from the ci_lab directory:
+    python -m benchmarks.bench_rates [--counters 100000]
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+from src.rates import CounterRates
+
+OPERATIONS = 200_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--counters", type=int, default=100_000)
+    args = parser.parse_args()
+    names = [f"counter_{i}" for i in range(args.counters)]
+    now = [0.0]
+    rates = CounterRates(clock=lambda: now[0])
+
+    tracemalloc.start()
+    for name in names:
+        rates.record(name)
+    memory = tracemalloc.get_traced_memory()[0] / args.counters
+    tracemalloc.stop()
+
+    hot = [random.choice(names[:100]) for _ in range(OPERATIONS)]
+    started = time.perf_counter()
+    for i, name in enumerate(hot):
+        now[0] = i * 0.01
+        rates.record(name)
+    record = (time.perf_counter() - started) / OPERATIONS
+
+    started = time.perf_counter()
+    for name in hot[:10_000]:
+        rates.count(name, 60)
+    count = (time.perf_counter() - started) / 10_000
+
+    started = time.perf_counter()
+    rates.top(10, 60)
+    top = time.perf_counter() - started
+
+    print(f"memory per active counter: {memory:8.0f} bytes")
+    print(f"record:                    {record * 1e6:8.2f} us")
+    print(f"count (1m window):         {count * 1e6:8.2f} us")
+    print(f"top 10 by rate:            {top * 1e3:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
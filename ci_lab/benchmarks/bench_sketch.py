@@ -0,0 +1,80 @@
+"""
+Benchmark: Space-Saving summary versus exact counting of many names
+
+Feeds a Zipf-skewed stream with a large number of distinct names into the
+exact indexed store and into SpaceSaving, then reports time per increment,
+memory held and how well the approximate top 10 matches the exact one.
+
+Run from the ci_lab directory:
+    python -m benchmarks.bench_sketch [--events 1000000] [--capacity 10000]
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+from src.sketch import SpaceSaving
+from src.store import CounterStore
+
+
+def stream(events, seed=0):
+    """Return event names; ranks follow a heavy-tailed Pareto distribution"""
+    rng = random.Random(seed)
+    return [f"event{int(rng.paretovariate(0.2))}" for _ in range(events)]
+
+
+def exact(names):
+    """Count names in the indexed store"""
+    store = CounterStore()
+    for name in names:
+        if store.increment(name) is None:
+            store.create(name, 1)
+    return store, lambda n: [name for name, _ in store.top(n)]
+
+
+def approximate(names, capacity):
+    """Count names in a Space-Saving summary"""
+    summary = SpaceSaving(capacity)
+    for name in names:
+        summary.increment(name)
+    return summary, lambda n: [name for name, _, _ in summary.top(n)]
+
+
+def measure(build):
+    """Return (seconds, bytes allocated, top-10 function) for one build"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    structure, top = build()
+    elapsed = time.perf_counter() - started
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return elapsed, memory, top
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--capacity", type=int, default=10_000)
+    args = parser.parse_args()
+
+    names = stream(args.events)
+    print(f"{args.events:,} events, {len(set(names)):,} distinct names")
+    print(f"{'structure':>14} {'us/event':>9} {'memory (MB)':>12} {'top-10 match':>13}")
+    exact_seconds, exact_memory, exact_top = measure(lambda: exact(names))
+    truth = exact_top(10)
+    approx_seconds, approx_memory, approx_top = measure(
+        lambda: approximate(names, args.capacity)
+    )
+    for label, seconds, memory, top in (
+        ("exact", exact_seconds, exact_memory, exact_top),
+        ("space-saving", approx_seconds, approx_memory, approx_top),
+    ):
+        match = len(set(top(10)) & set(truth))
+        print(
+            f"{label:>14} {seconds / args.events * 1e6:>9.2f} "
+            f"{memory / 1e6:>12.1f} {match:>10}/10"
+        )
+
+
+if __name__ == "__main__":
+    main()
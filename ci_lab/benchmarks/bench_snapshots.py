@@ -0,0 +1,86 @@
+"""
+Benchmark: snapshot cost and its effect on concurrent writers
+
+For each size, fills the indexed store and times taking a snapshot (one
+dict copy), taking another with no write in between (shares the copy),
+and reading the first page (sorts the names once). Then runs a writer
+thread for a second, alone and while another thread takes a snapshot
+and reads it every 100 ms, and reports the writer's increments/sec.
+
+Run from the ci_lab directory:
+    python -m benchmarks.bench_snapshots [--sizes 100000 1000000]
+"""
+
+import argparse
+import threading
+import time
+from src.snapshots import SnapshotRegistry
+from src.store import CounterStore
+
+SECONDS = 1.0
+
+
+def timed(function, *arguments):
+    """Return (milliseconds for one call, its result)"""
+    started = time.perf_counter()
+    result = function(*arguments)
+    return (time.perf_counter() - started) * 1e3, result
+
+
+def writer_rate(store, size, reader=None):
+    """Return increments/sec of one writer thread, with an optional reader"""
+    stop = threading.Event()
+    done = []
+
+    def write():
+        count = 0
+        while not stop.is_set():
+            store.increment(f"c{count % size}")
+            count += 1
+        done.append(count)
+
+    threads = [threading.Thread(target=write)]
+    if reader is not None:
+        threads.append(threading.Thread(target=reader, args=(stop,)))
+    for thread in threads:
+        thread.start()
+    time.sleep(SECONDS)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return done[0] / SECONDS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(
+        f"{'counters':>10} {'copy (ms)':>10} {'shared (ms)':>12} "
+        f"{'page (ms)':>10} {'writes/s':>10} {'w/ snaps':>10}"
+    )
+    for size in args.sizes:
+        store, registry = CounterStore(), SnapshotRegistry()
+        for i in range(size):
+            store.create(f"c{i}", i)
+        copy, (_, snapshot) = timed(registry.create, store)
+        shared, _ = timed(registry.create, store)
+        page, _ = timed(snapshot.page, None, 100)
+
+        def reader(stop):
+            while not stop.wait(0.1):
+                _, snapshot = registry.create(store)
+                snapshot.page(None, 100)
+                snapshot.summary()
+
+        alone = writer_rate(store, size)
+        with_snapshots = writer_rate(store, size, reader)
+        print(
+            f"{size:>10,} {copy:>10.1f} {shared:>12.3f} {page:>10.1f} "
+            f"{alone:>10,.0f} {with_snapshots:>10,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark: increments over the TCP protocol versus HTTP PUT
+
+Starts one server process serving both the HTTP API and the TCP protocol
+over the same store, creates the counters over HTTP, then drives each
+front-end with concurrent connections for a fixed time: HTTP with one
+PUT /counters/<name> in flight per connection, and the protocol with
+INCR commands pipelined at several depths. Reports increments/sec.
+
+Run from the ci_lab directory:
+    python -m benchmarks.bench_tcp [--connections 8] [--seconds 5]
+"""
+
+import argparse
+import asyncio
+import functools
+import socket
+import sys
+import time
+from benchmarks.loadgen import HOST, Client, free_port, start_server
+
+COUNTERS = 100
+DEPTHS = (1, 16, 256)
+
+
+async def http_connection(port, number, stop_at):
+    """Increment over HTTP until stop_at; return the increments made"""
+    client = Client(HOST, port)
+    done = 0
+    while time.perf_counter() < stop_at:
+        await client.request("PUT", f"/counters/c{(number + done) % COUNTERS}")
+        done += 1
+    client.close()
+    return done
+
+
+async def tcp_connection(port, number, stop_at, depth):
+    """Send INCRs depth at a time until stop_at; return the increments made"""
+    reader, writer = await asyncio.open_connection(HOST, port)
+    batch = "".join(f"INCR c{(number + i) % COUNTERS}\n" for i in range(depth))
+    done = 0
+    while time.perf_counter() < stop_at:
+        writer.write(batch.encode())
+        for _ in range(depth):
+            await reader.readline()
+        done += depth
+    writer.close()
+    return done
+
+
+async def drive(connection, connections, seconds):
+    """Run connection(number, stop_at) concurrently; return increments/sec"""
+    stop_at = time.perf_counter() + seconds
+    counts = await asyncio.gather(
+        *(connection(number, stop_at) for number in range(connections))
+    )
+    return sum(counts) / seconds
+
+
+async def create_counters(http_port):
+    """Wait for the HTTP side and create the counters"""
+    deadline = time.monotonic() + 15
+    while True:
+        try:
+            socket.create_connection((HOST, http_port), timeout=0.2).close()
+            break
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+    client = Client(HOST, http_port)
+    await client.request("POST", "/counters/reset")
+    for i in range(COUNTERS):
+        await client.request("POST", f"/counters/c{i}")
+    client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    tcp_port, http_port = free_port(), free_port()
+    command = [sys.executable, "-m", "src.tcp", "--http-port", str(http_port)]
+    process = start_server(command, tcp_port)
+    try:
+        asyncio.run(create_counters(http_port))
+        print(f"{'front-end':>18} {'increments/s':>13}")
+        http = functools.partial(http_connection, http_port)
+        rate = asyncio.run(drive(http, args.connections, args.seconds))
+        print(f"{'http':>18} {rate:>13,.0f}")
+        for depth in DEPTHS:
+            tcp = functools.partial(tcp_connection, tcp_port, depth=depth)
+            rate = asyncio.run(drive(tcp, args.connections, args.seconds))
+            print(f"{f'tcp, depth {depth}':>18} {rate:>13,.0f}")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Benchmark: top/bottom N via the value index versus a full sort
+
+Run from the ci_lab directory:
+    python -m benchmarks.bench_top_n
+"""
+
+import random
+import timeit
+from src.index import CounterIndex
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+N = 10
+REPEAT = 20
+
+
+def sort_top(counters, n):
+    """The previous implementation: sort everything, keep n"""
+    return sorted(counters.items(), key=lambda item: item[1], reverse=True)[:n]
+
+
+def main():
+    print(f"{'counters':>10} {'sort (ms)':>12} {'index (ms)':>12} {'speedup':>9}")
+    for size in SIZES:
+        counters = {f"counter_{i}": random.randrange(size) for i in range(size)}
+        index = CounterIndex()
+        for name, value in counters.items():
+            index.add(name, value)
+
+        sort_s = min(timeit.repeat(lambda: sort_top(counters, N), number=1, repeat=3))
+        index_s = (
+            min(timeit.repeat(lambda: index.top(N), number=REPEAT, repeat=3)) / REPEAT
+        )
+        print(
+            f"{size:>10} {sort_s * 1e3:>12.3f} {index_s * 1e3:>12.4f} "
+            f"{sort_s / index_s:>8.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""
+Load-testing and latency benchmark suite for the counter API
+
+Generates a reproducible workload (create, increment, get, top-N,
+threshold scan and list, with Zipfian key popularity) and runs it either
+in-process through the Flask test client or against a local server over
+HTTP. Reports throughput and p50/p95/p99 latency per route, and can save
+the results as JSON and compare them with an earlier run.
+
+Run from the ci_lab directory:
+    python -m benchmarks.loadgen                          # in-process
+    python -m benchmarks.loadgen --server flask -c 32     # launched server
+    python -m benchmarks.loadgen --server asgi -c 256     # needs uvicorn
+    python -m benchmarks.loadgen --url http://host:5000   # running server
+    python -m benchmarks.loadgen --json new.json --compare old.json
+"""
+
+import argparse
+import asyncio
+import bisect
+import itertools
+import json
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+HOST = "127.0.0.1"
+
+# Relative weight of each operation in the generated workload
+DEFAULT_MIX = {
+    "increment": 50,
+    "get": 30,
+    "create": 5,
+    "top": 5,
+    "greater": 5,
+    "list": 5,
+}
+
+SERVERS = {
+    "flask": [
+        sys.executable,
+        "-c",
+        "import sys; from werkzeug.serving import run_simple; from src import app; "
+        "run_simple(sys.argv[1], int(sys.argv[2]), app, threaded=True)",
+    ],
+    "asgi": [
+        sys.executable,
+        "-c",
+        "import sys, uvicorn; "
+        "uvicorn.run('src.asgi:app', host=sys.argv[1], port=int(sys.argv[2]), "
+        "log_level='warning')",
+    ],
+}
+
+
+class Zipf:
+    """Draws ranks 0..n-1 with probability proportional to 1 / (rank + 1) ** s"""
+
+    def __init__(self, n, s=1.1, rng=random):
+        self.rng = rng
+        self.cumulative = list(
+            itertools.accumulate(1 / (rank + 1) ** s for rank in range(n))
+        )
+
+    def sample(self):
+        point = self.rng.random() * self.cumulative[-1]
+        return bisect.bisect_left(self.cumulative, point)
+
+
+def generate_workload(keys, operations, mix=None, skew=1.1, seed=0):
+    """Return (setup, workload): lists of (route, method, path) requests
+
+    setup creates the initial keys; workload draws each operation from the
+    mix and each key from a Zipf distribution, so a few counters are hot.
+    """
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    zipf = Zipf(keys, skew, rng)
+    kinds = list(mix)
+    weights = list(itertools.accumulate(mix.values()))
+    fresh = itertools.count()
+
+    setup = [("POST /counters/reset", "POST", "/counters/reset")]
+    setup += [("setup", "POST", f"/counters/k{i}") for i in range(keys)]
+    workload = []
+    for _ in range(operations):
+        kind = rng.choices(kinds, cum_weights=weights)[0]
+        name = f"k{zipf.sample()}"
+        if kind == "increment":
+            request = ("PUT /counters/<name>", "PUT", f"/counters/{name}")
+        elif kind == "get":
+            request = ("GET /counters/<name>", "GET", f"/counters/{name}")
+        elif kind == "create":
+            path = f"/counters/new{next(fresh)}"
+            request = ("POST /counters/<name>", "POST", path)
+        elif kind == "top":
+            request = ("GET /counters/top/<n>", "GET", "/counters/top/10")
+        elif kind == "greater":
+            threshold = rng.choice((1, 10, 100))
+            path = f"/counters/greater/{threshold}"
+            request = ("GET /counters/greater/<t>", "GET", path)
+        else:
+            request = ("GET /counters", "GET", "/counters?limit=100")
+        workload.append(request)
+    return setup, workload
+
+
+def run_in_process(setup, workload):
+    """Run the workload through the Flask test client
+
+    Returns the (route, seconds) samples and the elapsed wall time.
+    """
+    from src import app
+
+    client = app.test_client()
+    for _, method, path in setup:
+        client.open(path, method=method)
+    samples = []
+    started = time.perf_counter()
+    for route, method, path in workload:
+        sent = time.perf_counter()
+        client.open(path, method=method)
+        samples.append((route, time.perf_counter() - sent))
+    return samples, time.perf_counter() - started
+
+
+class Client:
+    """One HTTP/1.1 connection that reconnects when the server closes it
+
+    Werkzeug's development server answers every request with
+    "Connection: close", so its numbers include reconnecting.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path):
+        """Send one request and read the whole response; return the status"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port
+            )
+        self.writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+            "Content-Length: 0\r\n\r\n".encode()
+        )
+        await self.writer.drain()
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        headers = {}
+        for line in head.split(b"\r\n")[1:]:
+            key, _, value = line.partition(b":")
+            headers[key.strip().lower()] = value.strip()
+        length = int(headers.get(b"content-length", 0))
+        if length:
+            await self.reader.readexactly(length)
+        if headers.get(b"connection", b"").lower() == b"close":
+            self.close()
+        return int(head.split(b" ", 2)[1])
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+async def run_over_http(host, port, setup, workload, concurrency):
+    """Run the workload over `concurrency` connections
+
+    Returns the (route, seconds) samples and the elapsed wall time.
+    """
+    client = Client(host, port)
+    for _, method, path in setup:
+        await client.request(method, path)
+    client.close()
+
+    requests = iter(workload)
+    samples = []
+
+    async def worker():
+        client = Client(host, port)
+        for route, method, path in requests:
+            started = time.perf_counter()
+            await client.request(method, path)
+            samples.append((route, time.perf_counter() - started))
+        client.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, time.perf_counter() - started
+
+
+def free_port():
+    """Ask the OS for an unused TCP port"""
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def start_server(command, port):
+    """Launch a server process and wait until it accepts connections"""
+    process = subprocess.Popen(
+        command + [HOST, str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((HOST, port), timeout=0.2).close()
+            return process
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"server {command[-1]!r} did not start")
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(samples, elapsed):
+    """Return per-route and overall count, throughput and latency in ms"""
+    by_route = {}
+    for route, seconds in samples:
+        by_route.setdefault(route, []).append(seconds)
+    by_route["all"] = [seconds for _, seconds in samples]
+    summary = {}
+    for route, latencies in sorted(by_route.items()):
+        latencies.sort()
+        summary[route] = {
+            "count": len(latencies),
+            "throughput": len(latencies) / elapsed,
+            "p50_ms": percentile(latencies, 0.50) * 1e3,
+            "p95_ms": percentile(latencies, 0.95) * 1e3,
+            "p99_ms": percentile(latencies, 0.99) * 1e3,
+        }
+    return summary
+
+
+def git_commit():
+    """Return the current commit hash, or None outside a git checkout"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(routes, baseline=None):
+    """Print the per-route table, with p50/p99 ratios against a baseline"""
+    header = f"{'route':<28}{'count':>8}{'req/s':>10}{'p50':>9}{'p95':>9}{'p99':>9}"
+    print(header + ("  p50/base  p99/base" if baseline else "") + "   (ms)")
+    for route, row in routes.items():
+        line = (
+            f"{route:<28}{row['count']:>8}{row['throughput']:>10,.0f}"
+            f"{row['p50_ms']:>9.3f}{row['p95_ms']:>9.3f}{row['p99_ms']:>9.3f}"
+        )
+        old = (baseline or {}).get(route)
+        if old:
+            line += (
+                f"{row['p50_ms'] / old['p50_ms']:>10.2f}"
+                f"{row['p99_ms'] / old['p99_ms']:>10.2f}"
+            )
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--server", choices=SERVERS, help="launch a local server")
+    target.add_argument("--url", help="use an already running server")
+    parser.add_argument("-c", "--concurrency", type=int, default=16)
+    parser.add_argument("--keys", type=int, default=1_000)
+    parser.add_argument("--operations", type=int, default=20_000)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="results file from an earlier run")
+    args = parser.parse_args()
+
+    setup, workload = generate_workload(
+        args.keys, args.operations, skew=args.skew, seed=args.seed
+    )
+    process = None
+    if args.server or args.url:
+        if args.url:
+            parts = urlsplit(args.url)
+            host, port = parts.hostname, parts.port or 80
+        else:
+            host, port = HOST, free_port()
+            process = start_server(SERVERS[args.server], port)
+        try:
+            samples, elapsed = asyncio.run(
+                run_over_http(host, port, setup, workload, args.concurrency)
+            )
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+        mode = args.server or args.url
+    else:
+        samples, elapsed = run_in_process(setup, workload)
+        mode = "in-process"
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "mode": mode,
+        "config": {
+            key: getattr(args, key)
+            for key in ("concurrency", "keys", "operations", "skew", "seed")
+        },
+        "routes": summarize(samples, elapsed),
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as previous:
+            baseline = json.load(previous)["routes"]
+    print(f"mode: {mode}  commit: {results['commit']}")
+    print_report(results["routes"], baseline)
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,598 @@
+"""
+Counter API as an ASGI Application
+
+Serves the counter and approximate-counter routes of the Flask app in
+src/counter.py with the same responses, on an asyncio event loop and over
+the same store. Store operations are in-memory and short, so handlers run
+inline on the loop. Only the Flask app serves /metrics and answers
+conditional requests: responses here carry no ETag and are never 304.
+
+Run with any ASGI server, for example:
+    uvicorn src.asgi:app
+"""
+
+import asyncio
+import json
+import re
+from http import HTTPStatus
+from urllib.parse import parse_qs
+from src import counter
+from src.backends import CounterRangeError
+from src.counter import (
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_QUANTILES,
+    DEFAULT_WINDOW,
+    EVENTS_UNSUPPORTED_ERROR,
+    INVALID_NAME_ERROR,
+    apply_batch,
+    approx_response,
+    is_valid_counter_name,
+    ndjson_lines,
+    page_response,
+    parse_counter_value,
+    parse_page_limit,
+    parse_predicate,
+    parse_quantiles,
+    parse_ttl,
+    parse_window,
+    rate_response,
+)
+from src.events import KEEPALIVE, render
+from src.shm import SharedTableError
+
+# Store errors answered as the Flask app's error handlers answer them
+STORE_ERRORS = {
+    CounterRangeError: HTTPStatus.BAD_REQUEST,
+    SharedTableError: HTTPStatus.INSUFFICIENT_STORAGE,
+}
+
+
+class Request:
+    """The parts of an HTTP request the handlers look at"""
+
+    def __init__(self, args, body, arg_lists=None):
+        self.args = args
+        self.body = body
+        # Every value of each query argument, for repeatable ones
+        self.arg_lists = arg_lists or {}
+
+    def get_json(self):
+        """Decode the body as JSON, or return None if it is not JSON"""
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            return None
+
+
+class Stream:
+    """A streamed response body produced by an iterator of str chunks
+
+    An async iterator may be endless; it is sent until the client leaves.
+    """
+
+    def __init__(self, chunks, content_type):
+        self.chunks = chunks
+        self.content_type = content_type
+
+
+def not_found(name):
+    """Counter not found error response"""
+    return {"error": f"Counter '{name}' not found"}, HTTPStatus.NOT_FOUND
+
+
+def create_counter(request, name):
+    """Create a new counter"""
+    if not is_valid_counter_name(name):
+        return {"error": INVALID_NAME_ERROR}, HTTPStatus.BAD_REQUEST
+    ttl = request.args.get("ttl")
+    if ttl is not None:
+        ttl, error = parse_ttl(ttl)
+        if error:
+            return {"error": error}, HTTPStatus.BAD_REQUEST
+    if not counter.STORE.create(name):
+        return {"error": f"Counter '{name}' already exists"}, HTTPStatus.CONFLICT
+    if ttl is not None:
+        counter.STORE.expiry.set_ttl(name, ttl)
+    return {name: 0}, HTTPStatus.CREATED
+
+
+def get_counter(request, name):
+    """Retrieve an existing counter"""
+    value = counter.STORE.get(name)
+    if value is None:
+        return not_found(name)
+    return {name: value}, HTTPStatus.OK
+
+
+def increment_counter(request, name):
+    """Increment an existing counter"""
+    value = counter.increment(name)
+    if value is None:
+        return not_found(name)
+    return {name: value}, HTTPStatus.OK
+
+
+def delete_counter(request, name):
+    """Delete an existing counter"""
+    if counter.STORE.delete(name) is None:
+        return not_found(name)
+    return None, HTTPStatus.NO_CONTENT
+
+
+def list_counters(request):
+    """List all counters, one page at a time, or as an NDJSON stream"""
+    after = request.args.get("after")
+    if request.args.get("format") == "ndjson":
+        return Stream(ndjson_lines(after), "application/x-ndjson"), HTTPStatus.OK
+    if after is None and "limit" not in request.args:
+        return counter.STORE.items(), HTTPStatus.OK
+    limit, error = parse_page_limit(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    if error:
+        return {"error": error}, HTTPStatus.BAD_REQUEST
+    return page_response(counter.STORE.page(after, limit), limit), HTTPStatus.OK
+
+
+def stream_counters(request):
+    """Push counter changes as server-sent events"""
+    store = counter.STORE
+    if store.events is None:
+        return {"error": EVENTS_UNSUPPORTED_ERROR}, HTTPStatus.BAD_REQUEST
+    loop, ready = asyncio.get_running_loop(), asyncio.Event()
+
+    def wake():
+        try:
+            loop.call_soon_threadsafe(ready.set)
+        except RuntimeError:
+            # The loop has closed; the stream is going away with it
+            pass
+
+    subscription = store.events.subscribe(
+        request.arg_lists.get("name"), request.args.get("prefix"), wake=wake
+    )
+    # Subscriptions start with the initial snapshot due
+    ready.set()
+    chunks = event_chunks(store, subscription, ready)
+    return Stream(chunks, "text/event-stream"), HTTPStatus.OK
+
+
+async def event_chunks(store, subscription, ready):
+    """Yield server-sent events for a subscription, waiting on the loop"""
+    try:
+        while True:
+            try:
+                await asyncio.wait_for(ready.wait(), KEEPALIVE)
+            except asyncio.TimeoutError:
+                pass
+            ready.clear()
+            stale, changes = subscription.take(0)
+            yield render(subscription, store, stale, changes)
+    finally:
+        store.events.unsubscribe(subscription)
+
+
+def list_counters_with_prefix(request, prefix):
+    """List counters whose name starts with prefix, one page at a time"""
+    after = request.args.get("after")
+    limit, error = parse_page_limit(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    if error:
+        return {"error": error}, HTTPStatus.BAD_REQUEST
+    page = counter.STORE.prefix(prefix, after, limit)
+    return page_response(page, limit), HTTPStatus.OK
+
+
+def get_prefix_stats(request, prefix):
+    """Retrieve the count and sum of counters whose name starts with prefix"""
+    return dict(counter.STORE.prefix_summary(prefix), prefix=prefix), HTTPStatus.OK
+
+
+def reset_counters(request):
+    """Reset all counters"""
+    counter.STORE.clear()
+    return {"message": "All counters have been reset"}, HTTPStatus.OK
+
+
+def bulk_delete_counters(request):
+    """Delete every counter matching ?lt=, ?gt=, ?eq= or ?prefix="""
+    predicate, error = parse_predicate(request.args)
+    if error:
+        return {"error": error}, HTTPStatus.BAD_REQUEST
+    return {"deleted": counter.STORE.delete_where(*predicate)}, HTTPStatus.OK
+
+
+def bulk_reset_counters(request):
+    """Reset every counter matching ?lt=, ?gt=, ?eq= or ?prefix= to zero"""
+    predicate, error = parse_predicate(request.args)
+    if error:
+        return {"error": error}, HTTPStatus.BAD_REQUEST
+    return {"reset": counter.STORE.reset_where(*predicate)}, HTTPStatus.OK
+
+
+def get_total_counters(request):
+    """Retrieve the sum of all counter values"""
+    return {"total": counter.STORE.total()}, HTTPStatus.OK
+
+
+def get_counter_stats(request):
+    """Retrieve count, sum, min, max and mean of all counter values"""
+    return counter.STORE.summary(), HTTPStatus.OK
+
+
+def get_counter_distribution(request):
+    """Retrieve quantiles and power-of-two buckets of all counter values"""
+    quantiles, error = parse_quantiles(request.args.get("q", DEFAULT_QUANTILES))
+    if error:
+        return {"error": error}, HTTPStatus.BAD_REQUEST
+    return counter.STORE.distribution(quantiles), HTTPStatus.OK
+
+
+def get_total_number_of_counters(request):
+    """Get the total number of counters"""
+    return {"count": len(counter.STORE)}, HTTPStatus.OK
+
+
+def get_top_n_counters(request, n):
+    """Retrieve the top N highest counters"""
+    if not counter.STORE:
+        return {"error": "No counters available"}, HTTPStatus.NOT_FOUND
+    return dict(counter.STORE.top(int(n))), HTTPStatus.OK
+
+
+def get_bottom_n_counters(request, n):
+    """Retrieve the bottom N lowest counters"""
+    if not counter.STORE:
+        return {"error": "No counters available"}, HTTPStatus.NOT_FOUND
+    return dict(counter.STORE.bottom(int(n))), HTTPStatus.OK
+
+
+def get_counters_greater_than(request, threshold):
+    """Retrieve counters greater than a given threshold"""
+    return dict(counter.STORE.greater_than(int(threshold))), HTTPStatus.OK
+
+
+def get_counters_less_than_threshold(request, threshold):
+    """Get all counters with values less than the given threshold"""
+    return dict(counter.STORE.less_than(int(threshold))), HTTPStatus.OK
+
+
+def get_counters_equal_to(request, value):
+    """Get all counters whose value equals the given value"""
+    return dict(counter.STORE.equal_to(int(value))), HTTPStatus.OK
+
+
+def get_counter_rank(request, name):
+    """Retrieve a counter's position in the leaderboard (1 is the highest)"""
+    rank = counter.STORE.rank(name)
+    if rank is None:
+        return not_found(name)
+    return {"name": name, "rank": rank}, HTTPStatus.OK
+
+
+def get_counter_at_rank(request, k):
+    """Retrieve the counter at position k in the leaderboard"""
+    k = int(k)
+    ranked = counter.STORE.at_rank(k)
+    if ranked is None:
+        return {"error": f"No counter at rank {k}"}, HTTPStatus.NOT_FOUND
+    name, value = ranked
+    return {"name": name, "value": value, "rank": k}, HTTPStatus.OK
+
+
+def create_snapshot(request):
+    """Take a consistent snapshot of every counter to read from"""
+    snapshot_id, snapshot = counter.SNAPSHOTS.create(counter.STORE)
+    body = dict(snapshot.summary(), id=snapshot_id, ttl=counter.SNAPSHOTS.ttl)
+    return body, HTTPStatus.CREATED
+
+
+def snapshot_not_found(snapshot_id):
+    """Snapshot not found (or expired) error response"""
+    error = f"Snapshot '{snapshot_id}' not found or expired"
+    return {"error": error}, HTTPStatus.NOT_FOUND
+
+
+def list_snapshot_counters(request, snapshot_id):
+    """List a snapshot's counters one page at a time, in name order"""
+    snapshot = counter.SNAPSHOTS.get(snapshot_id)
+    if snapshot is None:
+        return snapshot_not_found(snapshot_id)
+    limit, error = parse_page_limit(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    if error:
+        return {"error": error}, HTTPStatus.BAD_REQUEST
+    page = snapshot.page(request.args.get("after"), limit)
+    return page_response(page, limit), HTTPStatus.OK
+
+
+def get_snapshot_stats(request, snapshot_id):
+    """Retrieve count, sum, min, max and mean of a snapshot's counters"""
+    snapshot = counter.SNAPSHOTS.get(snapshot_id)
+    if snapshot is None:
+        return snapshot_not_found(snapshot_id)
+    return snapshot.summary(), HTTPStatus.OK
+
+
+def get_snapshot_top_n(request, snapshot_id, n):
+    """Retrieve a snapshot's N highest counters"""
+    snapshot = counter.SNAPSHOTS.get(snapshot_id)
+    if snapshot is None:
+        return snapshot_not_found(snapshot_id)
+    return dict(snapshot.top(int(n))), HTTPStatus.OK
+
+
+def release_snapshot(request, snapshot_id):
+    """Release a snapshot before it expires"""
+    if not counter.SNAPSHOTS.release(snapshot_id):
+        return snapshot_not_found(snapshot_id)
+    return None, HTTPStatus.NO_CONTENT
+
+
+def set_counter_value(request, name, value):
+    """Set a counter to a specific value"""
+    if name not in counter.STORE:
+        return not_found(name)
+    value, error = parse_counter_value(value)
+    if error:
+        return {"error": error}, HTTPStatus.BAD_REQUEST
+    if counter.STORE.set(name, value) is None:
+        return not_found(name)
+    return {name: value}, HTTPStatus.OK
+
+
+def get_counter_rate(request, name):
+    """Retrieve a counter's increments over the last ?window= (default 60s)"""
+    window, error = parse_window(request.args.get("window", DEFAULT_WINDOW))
+    if error:
+        return {"error": error}, HTTPStatus.BAD_REQUEST
+    if name not in counter.STORE:
+        return not_found(name)
+    count = counter.STORE.rates.count(name, window)
+    return dict(rate_response(name, count, window), window=window), HTTPStatus.OK
+
+
+def get_top_n_counters_by_rate(request, n):
+    """Retrieve the N counters with the most increments over ?window="""
+    window, error = parse_window(request.args.get("window", DEFAULT_WINDOW))
+    if error:
+        return {"error": error}, HTTPStatus.BAD_REQUEST
+    top = counter.STORE.rates.top(int(n), window)
+    body = {"window": window, "counters": [rate_response(*e, window) for e in top]}
+    return body, HTTPStatus.OK
+
+
+def reset_single_counter(request, name):
+    """Reset a single counter to zero"""
+    if counter.STORE.set(name, 0) is None:
+        return not_found(name)
+    return {name: 0}, HTTPStatus.OK
+
+
+def batch_counters(request):
+    """Apply a list of counter operations in one request"""
+    body = request.get_json()
+    if isinstance(body, dict):
+        body = body.get("operations")
+    if not isinstance(body, list):
+        return {"error": "Expected a list of operations"}, HTTPStatus.BAD_REQUEST
+    return {"results": apply_batch(body)}, HTTPStatus.OK
+
+
+def increment_approx_counter(request, name):
+    """Count one occurrence of an approximate counter"""
+    if not is_valid_counter_name(name):
+        return {"error": INVALID_NAME_ERROR}, HTTPStatus.BAD_REQUEST
+    return approx_response(name, *counter.APPROX.increment(name)), HTTPStatus.OK
+
+
+def get_approx_counter(request, name):
+    """Estimate an approximate counter"""
+    return approx_response(name, *counter.APPROX.estimate(name)), HTTPStatus.OK
+
+
+def get_top_n_approx_counters(request, n):
+    """Retrieve the N highest approximate counters, highest first"""
+    top = [approx_response(*entry) for entry in counter.APPROX.top(int(n))]
+    return {"counters": top}, HTTPStatus.OK
+
+
+def get_approx_summary(request):
+    """Retrieve the capacity, stream total and error bound of /approx"""
+    return counter.APPROX.summary(), HTTPStatus.OK
+
+
+def reset_approx_counters(request):
+    """Forget every approximate counter"""
+    counter.APPROX.clear()
+    return {"message": "All approximate counters have been reset"}, HTTPStatus.OK
+
+
+# (path pattern, {method: handler}); like Flask, fixed paths are listed
+# before the patterns that would also match them
+ROUTES = [
+    (r"/counters", {"GET": list_counters}),
+    (r"/counters/batch", {"POST": batch_counters}),
+    (r"/counters/reset", {"POST": reset_counters}),
+    (r"/counters/bulk/delete", {"POST": bulk_delete_counters}),
+    (r"/counters/bulk/reset", {"POST": bulk_reset_counters}),
+    (r"/counters/total", {"GET": get_total_counters}),
+    (r"/counters/stats", {"GET": get_counter_stats}),
+    (r"/counters/count", {"GET": get_total_number_of_counters}),
+    (r"/counters/distribution", {"GET": get_counter_distribution}),
+    (r"/counters/stream", {"GET": stream_counters}),
+    (r"/counters/snapshot", {"POST": create_snapshot}),
+    (
+        r"/counters/snapshot/(?P<snapshot_id>[^/]+)",
+        {"GET": list_snapshot_counters, "DELETE": release_snapshot},
+    ),
+    (r"/counters/snapshot/(?P<snapshot_id>[^/]+)/stats", {"GET": get_snapshot_stats}),
+    (
+        r"/counters/snapshot/(?P<snapshot_id>[^/]+)/top/(?P<n>\d+)",
+        {"GET": get_snapshot_top_n},
+    ),
+    (r"/counters/prefix/(?P<prefix>[^/]+)", {"GET": list_counters_with_prefix}),
+    (r"/counters/prefix/(?P<prefix>[^/]+)/stats", {"GET": get_prefix_stats}),
+    (r"/counters/top/(?P<n>\d+)", {"GET": get_top_n_counters}),
+    (r"/counters/bottom/(?P<n>\d+)", {"GET": get_bottom_n_counters}),
+    (r"/counters/greater/(?P<threshold>\d+)", {"GET": get_counters_greater_than}),
+    (r"/counters/less/(?P<threshold>\d+)", {"GET": get_counters_less_than_threshold}),
+    (r"/counters/equal/(?P<value>\d+)", {"GET": get_counters_equal_to}),
+    (r"/counters/(?P<name>[^/]+)/set/(?P<value>[^/]+)", {"PUT": set_counter_value}),
+    (r"/counters/rate/top/(?P<n>\d+)", {"GET": get_top_n_counters_by_rate}),
+    (r"/counters/(?P<name>[^/]+)/rate", {"GET": get_counter_rate}),
+    (r"/counters/rank/(?P<k>\d+)", {"GET": get_counter_at_rank}),
+    (r"/counters/(?P<name>[^/]+)/rank", {"GET": get_counter_rank}),
+    (r"/counters/(?P<name>[^/]+)/reset", {"POST": reset_single_counter}),
+    (
+        r"/counters/(?P<name>[^/]+)",
+        {
+            "POST": create_counter,
+            "GET": get_counter,
+            "PUT": increment_counter,
+            "DELETE": delete_counter,
+        },
+    ),
+    (r"/approx", {"GET": get_approx_summary, "DELETE": reset_approx_counters}),
+    (r"/approx/top/(?P<n>\d+)", {"GET": get_top_n_approx_counters}),
+    (
+        r"/approx/(?P<name>[^/]+)",
+        {"PUT": increment_approx_counter, "GET": get_approx_counter},
+    ),
+]
+COMPILED_ROUTES = [(re.compile(pattern), methods) for pattern, methods in ROUTES]
+
+
+def resolve(method, path):
+    """Return (handler, path parameters, allowed methods) for a request
+
+    As in Flask, a path matched only with other methods yields no handler
+    and the methods it allows (405); no match at all yields neither (404).
+    """
+    allowed = set()
+    for pattern, methods in COMPILED_ROUTES:
+        match = pattern.fullmatch(path)
+        if match is None:
+            continue
+        if method in methods:
+            return methods[method], match.groupdict(), allowed
+        allowed.update(methods)
+    return None, None, allowed
+
+
+def encode(payload):
+    """Serialize a payload the way Flask's jsonify does"""
+    return json.dumps(payload, sort_keys=True, separators=(",", ":")).encode() + b"\n"
+
+
+async def read_body(receive):
+    """Collect the full request body"""
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def send_response(send, status, body, content_type="application/json"):
+    """Send a complete response"""
+    headers = [(b"content-type", content_type.encode())]
+    if status == HTTPStatus.NO_CONTENT:
+        body = b""
+    else:
+        headers.append((b"content-length", str(len(body)).encode()))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_stream(send, status, stream, receive):
+    """Send a response whose body is produced chunk by chunk"""
+    headers = [(b"content-type", stream.content_type.encode())]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    if hasattr(stream.chunks, "__aiter__"):
+        await send_until_disconnect(send, receive, stream.chunks)
+    else:
+        for chunk in stream.chunks:
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": chunk.encode(),
+                    "more_body": True,
+                }
+            )
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def send_until_disconnect(send, receive, chunks):
+    """Send chunks from an async iterator until it ends or the client leaves"""
+
+    async def pump():
+        async for chunk in chunks:
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": chunk.encode(),
+                    "more_body": True,
+                }
+            )
+
+    async def disconnected():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(disconnected())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Runs the iterator's cleanup even if it stopped at a yield
+        await chunks.aclose()
+
+
+async def lifespan(receive, send):
+    """Acknowledge server startup and shutdown"""
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI entry point"""
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] != "http":
+        return None
+
+    handler, params, allowed = resolve(scope["method"], scope["path"])
+    if handler is None:
+        if allowed:
+            error = {"error": "Method Not Allowed"}
+            return await send_response(
+                send, HTTPStatus.METHOD_NOT_ALLOWED, encode(error)
+            )
+        return await send_response(
+            send, HTTPStatus.NOT_FOUND, encode({"error": "Not Found"})
+        )
+
+    if counter.STORE.expiry is not None:
+        counter.STORE.expiry.expire(counter.STORE)
+    query = parse_qs(scope.get("query_string", b"").decode(), keep_blank_values=True)
+    args = {key: values[0] for key, values in query.items()}
+    request = Request(args, await read_body(receive), query)
+    try:
+        payload, status = handler(request, **params)
+    except tuple(STORE_ERRORS) as error:
+        error_body = encode({"error": str(error)})
+        return await send_response(send, STORE_ERRORS[type(error)], error_body)
+    if counter.STORE.journal is not None:
+        # Group commit: acknowledge once the changes are fsynced, waiting
+        # off the event loop
+        await asyncio.get_running_loop().run_in_executor(
+            None, counter.STORE.journal.sync
+        )
+    if isinstance(payload, Stream):
+        return await send_stream(send, status, payload, receive)
+    return await send_response(send, status, encode(payload))
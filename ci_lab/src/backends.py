@@ -0,0 +1,617 @@
+"""
+Counter Storage Backends
+
+Every store the routes can run on implements the CounterBackend interface,
+so the API can move between a plain dict, the indexed in-memory store, a
+SQLite database or a shared-memory table without touching the routes.
+"""
+
+import heapq
+import sqlite3
+import threading
+from contextlib import contextmanager
+from src.events import CounterEvents
+from src.expiry import CounterExpiry
+from src.rates import CounterRates
+from src.stats import ValueHistogram, rank
+from src.versions import CounterVersions
+
+# Values that fit the int64 columns of the compact, SQLite and shared stores
+INT64_MIN, INT64_MAX = -(2**63), 2**63 - 1
+
+
+class CounterRangeError(ValueError):
+    """A counter value or name outside what a backend can store"""
+
+
+def check_int64(value):
+    """Return value, or raise CounterRangeError if it does not fit in int64"""
+    if not INT64_MIN <= value <= INT64_MAX:
+        raise CounterRangeError(f"Counter value must not exceed {INT64_MAX}")
+    return value
+
+
+def notify(target, name, old, new):
+    """Deliver one change to a derived structure or observer"""
+    if old is None:
+        target.add(name, new)
+    elif new is None:
+        target.remove(name, old)
+    else:
+        target.update(name, old, new)
+
+
+def page_through(store, after, chunk):
+    """Yield store's counters named after `after` in order, chunk pages at a time
+
+    For stores whose page() reads a name index, so each page is cheap.
+    """
+    while True:
+        page = store.page(after, chunk)
+        yield from page
+        if len(page) < chunk:
+            return
+        after = page[-1][0]
+
+
+# Bulk predicates: value below, above or equal to an int, or name prefix
+PREDICATES = ("lt", "gt", "eq", "prefix")
+# SQL conditions for the value predicates
+VALUE_CONDITIONS = {"lt": "value < ?", "gt": "value > ?", "eq": "value = ?"}
+# SUM() raises once a total passes int64, so totals add up the high and
+# low 32 bits of the values separately, which cannot overflow, and join them
+SPLIT_SUM = "COALESCE(SUM(value >> 32), 0), COALESCE(SUM(value & 4294967295), 0)"
+
+
+class CounterBackend:
+    """Interface shared by every counter store
+
+    Point operations: get, create, increment, set, delete and clear. Scans:
+    items (every counter), page (name order, after a cursor) and prefix (the
+    same, restricted to names starting with a prefix). Ordered and range
+    queries: top, bottom, greater_than, less_than and equal_to, each
+    returning (name, value) pairs, plus rank (a counter's position from the
+    highest) and at_rank (the pair at one). Aggregates: total, summary,
+    prefix_summary and distribution. Bulk operations: matching, delete_where
+    and reset_where, on every counter a predicate selects. A missing counter
+    is reported as None, never raised.
+
+    Subclasses must provide the point operations and items(); the other
+    queries default to scanning items() and should be overridden wherever
+    the backend can answer them from an index.
+
+    Stores whose counters only change through this object keep a
+    CounterVersions in `versions`, for ETags and cached responses, a
+    CounterExpiry in `expiry`, for counters with a TTL, CounterRates in
+    `rates`, for recent increments, and CounterEvents in `events`, for
+    streaming changes; all four stay None where other processes may write.
+    A store with an attached CounterJournal has it in `journal`.
+    """
+
+    versions = None
+    expiry = None
+    rates = None
+    events = None
+    journal = None
+
+    def get(self, name):
+        """Return a counter's value, or None if it does not exist"""
+        raise NotImplementedError
+
+    def _check_journaled(self, name, value):
+        """Raise CounterRangeError if the attached journal cannot record value
+
+        Called before the change is made, so the counters never hold a
+        change that would be lost on restart.
+        """
+        if self.journal is not None:
+            self.journal.check(name, value)
+
+    def create(self, name, value=0):
+        """Create a counter; return False if it already exists"""
+        raise NotImplementedError
+
+    def increment(self, name, delta=1):
+        """Add delta to a counter; return the new value, or None if missing"""
+        raise NotImplementedError
+
+    def set(self, name, value):
+        """Set a counter's value; return it, or None if the counter is missing"""
+        raise NotImplementedError
+
+    def delete(self, name):
+        """Delete a counter; return its last value, or None if missing"""
+        raise NotImplementedError
+
+    def clear(self):
+        """Delete every counter"""
+        raise NotImplementedError
+
+    def items(self):
+        """Return a point-in-time copy of every counter as a dict"""
+        raise NotImplementedError
+
+    def __len__(self):
+        return len(self.items())
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def page(self, after, limit):
+        """Return up to limit (name, value) pairs named after `after`, in order"""
+        items = self.items().items()
+        if after is not None:
+            items = [item for item in items if item[0] > after]
+        return heapq.nsmallest(limit, items)
+
+    def scan(self, after, chunk):
+        """Yield every (name, value) pair named after `after`, in name order
+
+        Sorts one items() snapshot, since every page() call would scan the
+        whole store again; stores with a name index page through it chunk
+        pairs at a time instead.
+        """
+        yield from sorted(
+            item for item in self.items().items() if after is None or item[0] > after
+        )
+
+    def prefix(self, prefix, after, limit):
+        """Return up to limit (name, value) pairs whose name starts with prefix
+
+        In name order, starting after `after` like page().
+        """
+        items = [
+            item
+            for item in self.items().items()
+            if item[0].startswith(prefix) and (after is None or item[0] > after)
+        ]
+        return heapq.nsmallest(limit, items)
+
+    def prefix_summary(self, prefix):
+        """Return the count and total of counters whose name starts with prefix"""
+        values = [
+            value for name, value in self.items().items() if name.startswith(prefix)
+        ]
+        return {"count": len(values), "total": sum(values)}
+
+    def top(self, n):
+        """Return the n highest (name, value) pairs, highest first"""
+        entries = ((value, name) for name, value in self.items().items())
+        return [(name, value) for value, name in heapq.nlargest(n, entries)]
+
+    def bottom(self, n):
+        """Return the n lowest (name, value) pairs, lowest first"""
+        entries = ((value, name) for name, value in self.items().items())
+        return [(name, value) for value, name in heapq.nsmallest(n, entries)]
+
+    def rank(self, name):
+        """Return a counter's 1-based position from the highest, or None
+
+        Ties are ordered as in top(): by name, highest first.
+        """
+        value = self.get(name)
+        if value is None:
+            return None
+        return 1 + sum(
+            (other, key) > (value, name) for key, other in self.items().items()
+        )
+
+    def at_rank(self, rank):
+        """Return the (name, value) pair at a 1-based rank, or None"""
+        count = len(self)
+        if not 1 <= rank <= count:
+            return None
+        # Count in from whichever end is nearer
+        if rank <= count // 2:
+            return self.top(rank)[-1]
+        return self.bottom(count - rank + 1)[-1]
+
+    def greater_than(self, threshold):
+        """Return (name, value) pairs with value above threshold"""
+        return [item for item in self.items().items() if item[1] > threshold]
+
+    def less_than(self, threshold):
+        """Return (name, value) pairs with value below threshold"""
+        return [item for item in self.items().items() if item[1] < threshold]
+
+    def equal_to(self, value):
+        """Return (name, value) pairs holding exactly value"""
+        return [item for item in self.items().items() if item[1] == value]
+
+    def total(self):
+        """Return the sum of all counter values"""
+        return sum(self.items().values())
+
+    def summary(self):
+        """Return count, total, min, max and mean of all counter values"""
+        values = self.items().values()
+        count, total = len(values), sum(values)
+        return {
+            "count": count,
+            "total": total,
+            "min": min(values, default=None),
+            "max": max(values, default=None),
+            "mean": total / count if count else None,
+        }
+
+    def distribution(self, quantiles):
+        """Return the count, the value at each quantile and the log2 buckets
+
+        quantiles is a list of fractions between 0 and 1; each maps to the
+        value at that nearest rank, or None with no counters.
+        """
+        values = sorted(self.items().values())
+        histogram = ValueHistogram()
+        for value in values:
+            histogram.add(None, value)
+        return {
+            "count": len(values),
+            "quantiles": {
+                str(q): values[rank(q, len(values))] if values else None
+                for q in quantiles
+            },
+            "buckets": histogram.buckets(),
+        }
+
+    def matching(self, op, operand):
+        """Return the (name, value) pairs a bulk predicate selects
+
+        op is "lt", "gt" or "eq" with an integer operand, or "prefix" with
+        a name prefix.
+        """
+        if op == "prefix":
+            return self.prefix(operand, None, len(self))
+        queries = {"lt": self.less_than, "gt": self.greater_than, "eq": self.equal_to}
+        return queries[op](operand)
+
+    def delete_where(self, op, operand):
+        """Delete every counter a bulk predicate selects; return how many
+
+        Deletes the matches one by one, so a counter changed in between is
+        still deleted; stores that can should do it in one step.
+        """
+        return sum(
+            self.delete(name) is not None for name, _ in self.matching(op, operand)
+        )
+
+    def reset_where(self, op, operand):
+        """Set every counter a bulk predicate selects to zero; return how many"""
+        return sum(
+            self.set(name, 0) is not None for name, _ in self.matching(op, operand)
+        )
+
+    def check(self):
+        """Raise AssertionError if derived state disagrees with the counters"""
+
+
+class DictCounterStore(CounterBackend):
+    """A plain dict behind one lock; every query is a scan
+
+    The smallest possible store: cheapest writes, no index upkeep. Supports
+    observers, so it can be journaled like the indexed store.
+    """
+
+    def __init__(self, rates=True):
+        self.values = {}
+        self.versions = CounterVersions()
+        self.expiry = CounterExpiry()
+        self.events = CounterEvents()
+        self.observers = [self.versions, self.expiry, self.events]
+        if rates:
+            self.rates = CounterRates()
+            self.observers.append(self.rates)
+        self._lock = threading.Lock()
+
+    def _notify(self, name, old, new):
+        for observer in self.observers:
+            notify(observer, name, old, new)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __contains__(self, name):
+        return name in self.values
+
+    def get(self, name):
+        """Return a counter's value, or None if it does not exist"""
+        return self.values.get(name)
+
+    def create(self, name, value=0):
+        """Create a counter; return False if it already exists"""
+        self._check_journaled(name, value)
+        with self._lock:
+            if name in self.values:
+                return False
+            self.values[name] = value
+            self._notify(name, None, value)
+        return True
+
+    def increment(self, name, delta=1):
+        """Add delta to a counter; return the new value, or None if missing"""
+        with self._lock:
+            old = self.values.get(name)
+            if old is None:
+                return None
+            new = old + delta
+            self._check_journaled(name, new)
+            self.values[name] = new
+            self._notify(name, old, new)
+        return new
+
+    def set(self, name, value):
+        """Set a counter's value; return it, or None if the counter is missing"""
+        self._check_journaled(name, value)
+        with self._lock:
+            old = self.values.get(name)
+            if old is None:
+                return None
+            self.values[name] = value
+            self._notify(name, old, value)
+        return value
+
+    def delete(self, name):
+        """Delete a counter; return its last value, or None if missing"""
+        with self._lock:
+            old = self.values.pop(name, None)
+            if old is not None:
+                self._notify(name, old, None)
+        return old
+
+    def clear(self):
+        """Delete every counter"""
+        with self._lock:
+            self.values.clear()
+            for observer in self.observers:
+                observer.clear()
+
+    def items(self):
+        """Return a point-in-time copy of every counter"""
+        return self.values.copy()
+
+
+class SQLiteCounterStore(CounterBackend):
+    """Counters in a SQLite table with an index on (value, name)
+
+    Durable when given a file path, and shareable between processes on one
+    host; ordered and range queries use the value index. ":memory:" keeps
+    the database private to this store.
+    """
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False
+        )
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS counters "
+            "(name TEXT PRIMARY KEY, value INTEGER NOT NULL) WITHOUT ROWID"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS counters_by_value ON counters (value, name)"
+        )
+
+    @contextmanager
+    def _transaction(self):
+        """Run statements atomically, also against other processes"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _query(self, sql, parameters=()):
+        with self._lock:
+            return self._conn.execute(sql, parameters).fetchall()
+
+    def close(self):
+        """Close the database connection"""
+        self._conn.close()
+
+    def __len__(self):
+        return self._query("SELECT COUNT(*) FROM counters")[0][0]
+
+    def get(self, name):
+        """Return a counter's value, or None if it does not exist"""
+        rows = self._query("SELECT value FROM counters WHERE name = ?", (name,))
+        return rows[0][0] if rows else None
+
+    def create(self, name, value=0):
+        """Create a counter; return False if it already exists"""
+        check_int64(value)
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO counters (name, value) VALUES (?, ?)",
+                (name, value),
+            )
+            return cursor.rowcount == 1
+
+    def increment(self, name, delta=1):
+        """Add delta to a counter; return the new value, or None if missing"""
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT value FROM counters WHERE name = ?", (name,)
+            ).fetchone()
+            if row is None:
+                return None
+            # Checked here: SQLite would turn an overflowing sum into a REAL
+            value = check_int64(row[0] + delta)
+            conn.execute("UPDATE counters SET value = ? WHERE name = ?", (value, name))
+        return value
+
+    def set(self, name, value):
+        """Set a counter's value; return it, or None if the counter is missing"""
+        check_int64(value)
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE counters SET value = ? WHERE name = ?", (value, name)
+            )
+        return value if cursor.rowcount else None
+
+    def delete(self, name):
+        """Delete a counter; return its last value, or None if missing"""
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT value FROM counters WHERE name = ?", (name,)
+            ).fetchone()
+            if row:
+                conn.execute("DELETE FROM counters WHERE name = ?", (name,))
+        return row[0] if row else None
+
+    def clear(self):
+        """Delete every counter"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM counters")
+
+    def items(self):
+        """Return a point-in-time copy of every counter"""
+        return dict(self._query("SELECT name, value FROM counters"))
+
+    def page(self, after, limit):
+        """Return up to limit (name, value) pairs named after `after`, in order"""
+        return self._query(
+            "SELECT name, value FROM counters WHERE name > ? ORDER BY name LIMIT ?",
+            ("" if after is None else after, limit),
+        )
+
+    def scan(self, after, chunk):
+        """Yield every (name, value) pair named after `after`, in name order"""
+        return page_through(self, after, chunk)
+
+    def _prefix_range(self, prefix):
+        """SQL condition and parameters selecting names that start with prefix"""
+        if not prefix:
+            return "1", ()
+        # Text compares by code point, so the prefixed names sort between
+        # the prefix and the prefix with its last character bumped
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return "name >= ? AND name < ?", (prefix, upper)
+
+    def prefix(self, prefix, after, limit):
+        """Return up to limit (name, value) pairs whose name starts with prefix"""
+        condition, parameters = self._prefix_range(prefix)
+        return self._query(
+            f"SELECT name, value FROM counters WHERE {condition} AND name > ? "
+            "ORDER BY name LIMIT ?",
+            parameters + ("" if after is None else after, limit),
+        )
+
+    def prefix_summary(self, prefix):
+        """Return the count and total of counters whose name starts with prefix"""
+        condition, parameters = self._prefix_range(prefix)
+        count, high, low = self._query(
+            f"SELECT COUNT(*), {SPLIT_SUM} FROM counters WHERE {condition}",
+            parameters,
+        )[0]
+        return {"count": count, "total": (high << 32) + low}
+
+    def top(self, n):
+        """Return the n highest (name, value) pairs, highest first"""
+        return self._query(
+            "SELECT name, value FROM counters ORDER BY value DESC, name DESC LIMIT ?",
+            (min(n, INT64_MAX),),
+        )
+
+    def bottom(self, n):
+        """Return the n lowest (name, value) pairs, lowest first"""
+        return self._query(
+            "SELECT name, value FROM counters ORDER BY value, name LIMIT ?",
+            (min(n, INT64_MAX),),
+        )
+
+    def rank(self, name):
+        """Return a counter's 1-based position from the highest, or None"""
+        # Two ranges of the (value, name) index: higher values, then the
+        # same value with a higher name
+        rows = self._query(
+            "SELECT 1 + (SELECT COUNT(*) FROM counters WHERE value > c.value) "
+            "+ (SELECT COUNT(*) FROM counters WHERE value = c.value AND name > c.name) "
+            "FROM counters AS c WHERE name = ?",
+            (name,),
+        )
+        return rows[0][0] if rows else None
+
+    def at_rank(self, rank):
+        """Return the (name, value) pair at a 1-based rank, or None"""
+        if not 1 <= rank <= INT64_MAX:
+            return None
+        rows = self._query(
+            "SELECT name, value FROM counters ORDER BY value DESC, name DESC "
+            "LIMIT 1 OFFSET ?",
+            (rank - 1,),
+        )
+        return rows[0] if rows else None
+
+    def _where_value(self, op, operand):
+        """Return (name, value) pairs whose value is lt, gt or eq operand"""
+        condition, parameters = self._predicate(op, operand)
+        return self._query(
+            f"SELECT name, value FROM counters WHERE {condition}", parameters
+        )
+
+    def greater_than(self, threshold):
+        """Return (name, value) pairs with value above threshold"""
+        return self._where_value("gt", threshold)
+
+    def less_than(self, threshold):
+        """Return (name, value) pairs with value below threshold"""
+        return self._where_value("lt", threshold)
+
+    def equal_to(self, value):
+        """Return (name, value) pairs holding exactly value"""
+        return self._where_value("eq", value)
+
+    def total(self):
+        """Return the sum of all counter values"""
+        high, low = self._query(f"SELECT {SPLIT_SUM} FROM counters")[0]
+        return (high << 32) + low
+
+    def _predicate(self, op, operand):
+        """SQL condition and parameters for a bulk predicate
+
+        SQLite cannot bind an int outside int64. No value equals such an
+        operand, and it lies above or below every value, so its condition
+        is constant.
+        """
+        if op == "prefix":
+            return self._prefix_range(operand)
+        if INT64_MIN <= operand <= INT64_MAX:
+            return VALUE_CONDITIONS[op], (operand,)
+        selects_all = op != "eq" and (op == "lt") == (operand > INT64_MAX)
+        return ("1" if selects_all else "0"), ()
+
+    def delete_where(self, op, operand):
+        """Delete every counter a bulk predicate selects in one statement"""
+        condition, parameters = self._predicate(op, operand)
+        with self._transaction() as conn:
+            cursor = conn.execute(f"DELETE FROM counters WHERE {condition}", parameters)
+        return cursor.rowcount
+
+    def reset_where(self, op, operand):
+        """Set every counter a bulk predicate selects to zero in one statement"""
+        condition, parameters = self._predicate(op, operand)
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                f"UPDATE counters SET value = 0 WHERE {condition}", parameters
+            )
+        return cursor.rowcount
+
+    def summary(self):
+        """Return count, total, min, max and mean of all counter values"""
+        count, high_bits, low_bits, low, high = self._query(
+            f"SELECT COUNT(*), {SPLIT_SUM}, MIN(value), MAX(value) FROM counters"
+        )[0]
+        total = (high_bits << 32) + low_bits
+        return {
+            "count": count,
+            "total": total,
+            "min": low,
+            "max": high,
+            "mean": total / count if count else None,
+        }
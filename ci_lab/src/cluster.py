@@ -0,0 +1,546 @@
+"""
+Counter Cluster: Hash-partitioned Nodes behind a Router
+
+One process serves one core's worth of counter operations, since the GIL
+runs its Python one thread at a time. A cluster runs several counter
+service processes ("nodes") on one host, each the ordinary Flask app with
+its own in-memory store, and partitions the counter names among them with
+a consistent-hash ring. A router process in front speaks the same HTTP
+API: it sends every single-counter request to the node owning the name,
+and fans the whole-collection queries out to every node in parallel,
+merging their answers (sums, top-N, threshold filters, pages in name
+order, batches split per node).
+
+Nodes are placed on the ring by position (node-0, node-1, ...), not by
+address, so a cluster restarted with the same number of nodes and data
+directory puts every counter back on the node holding its journal.
+Adding a node moves only about 1/n of the names, but moves no data: grow
+a persistent cluster by exporting and re-importing its counters.
+
+The router keeps no state, so it can itself run as several processes:
+    COUNTER_CLUSTER_NODES=http://127.0.0.1:5001,http://127.0.0.1:5002 \\
+        gunicorn -w 4 "src.cluster:create_router()"
+
+Launch nodes and a router together:
+    python -m src.cluster [host] [port] [--nodes 4] [--data-dir DIR]
+"""
+
+import argparse
+import bisect
+import hashlib
+import heapq
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import quote, urlsplit
+from flask import Blueprint, Flask, Response, current_app, jsonify, request
+from src.counter import DEFAULT_PAGE_SIZE, page_response, parse_page_limit
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5000
+DEFAULT_NODES = 4
+# Points per node on the ring; more spread the names more evenly
+DEFAULT_REPLICAS = 128
+# Seconds to wait for a node's reply
+NODE_TIMEOUT = 10.0
+# Seconds to wait for a launched node to accept connections
+START_TIMEOUT = 15.0
+# Request and response headers passed between clients and nodes
+FORWARDED_REQUEST_HEADERS = ("Content-Type", "If-None-Match")
+FORWARDED_RESPONSE_HEADERS = ("Content-Type", "ETag")
+
+NODE_COMMAND = [
+    sys.executable,
+    "-c",
+    "import sys; from werkzeug.serving import run_simple; from src import app; "
+    "run_simple(sys.argv[1], int(sys.argv[2]), app, threaded=True)",
+]
+
+
+def ring_hash(key):
+    """Position of a key on the ring; the same in every process
+
+    Python's own hash() of a str is salted per process, so it cannot be
+    shared between a router and its clients.
+    """
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hashing of counter names onto nodes
+
+    Each node owns `replicas` points on a ring of 64-bit hashes, and a name
+    belongs to the first point at or after its own hash, wrapping around.
+    """
+
+    def __init__(self, nodes, replicas=DEFAULT_REPLICAS):
+        if not nodes:
+            raise ValueError("a hash ring needs at least one node")
+        self.nodes = list(nodes)
+        self.replicas = replicas
+        points = sorted(
+            (ring_hash(f"{node}#{replica}"), node)
+            for node in self.nodes
+            for replica in range(replicas)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, name):
+        """Return the node owning name"""
+        position = bisect.bisect_left(self._hashes, ring_hash(name))
+        return self._owners[position % len(self._owners)]
+
+
+class NodeUnavailable(Exception):
+    """A node that could not be reached or did not answer"""
+
+    def __init__(self, url):
+        super().__init__(f"Node {url} is unavailable")
+        self.url = url
+
+
+class Router:
+    """Sends requests to the nodes of a cluster, one node or all in parallel
+
+    nodes are base URLs, e.g. "http://127.0.0.1:5001", in ring order.
+    """
+
+    def __init__(self, nodes, replicas=DEFAULT_REPLICAS, timeout=NODE_TIMEOUT):
+        self.urls = {f"node-{number}": url for number, url in enumerate(nodes)}
+        self.ring = HashRing(self.urls, replicas)
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=4 * len(self.urls))
+
+    def send(self, node, method, target, body=None, headers=None):
+        """Send one request to a node; return (status, headers, body bytes)"""
+        url = self.urls[node]
+        parts = urlsplit(url)
+        connection = http.client.HTTPConnection(
+            parts.hostname, parts.port, timeout=self.timeout
+        )
+        try:
+            connection.request(method, target, body, headers or {})
+            response = connection.getresponse()
+            return response.status, response.headers, response.read()
+        except (OSError, http.client.HTTPException) as error:
+            raise NodeUnavailable(url) from error
+        finally:
+            connection.close()
+
+    def send_json(self, node, method, target, payload=None):
+        """Send a request to a node; return (status, decoded JSON body or None)"""
+        body = headers = None
+        if payload is not None:
+            body = json.dumps(payload).encode()
+            headers = {"Content-Type": "application/json"}
+        status, _, data = self.send(node, method, target, body, headers)
+        return status, json.loads(data) if data else None
+
+    def gather(self, method, target):
+        """Send a request to every node; return their (status, JSON) replies"""
+        futures = [
+            self._pool.submit(self.send_json, node, method, target)
+            for node in self.urls
+        ]
+        return [future.result() for future in futures]
+
+    def scatter(self, method, target, payloads):
+        """Send each node its own JSON payload; return {node: (status, JSON)}"""
+        futures = {
+            node: self._pool.submit(self.send_json, node, method, target, payload)
+            for node, payload in payloads.items()
+        }
+        return {node: future.result() for node, future in futures.items()}
+
+
+routes = Blueprint("cluster", __name__)
+
+
+def _router():
+    return current_app.extensions["cluster"]
+
+
+def _target():
+    """Path and query string of the current request, for a node"""
+    target = quote(request.path)
+    if request.query_string:
+        target += "?" + request.query_string.decode()
+    return target
+
+
+def _failed(replies):
+    """The first error among node replies as a response, or None"""
+    for status, payload in replies:
+        if status >= HTTPStatus.BAD_REQUEST:
+            return jsonify(payload), status
+    return None
+
+
+def _merged(replies):
+    """Union of the {name: value} objects the nodes returned"""
+    counters = {}
+    for _, payload in replies:
+        counters.update(payload)
+    return counters
+
+
+@routes.errorhandler(NodeUnavailable)
+def node_unavailable(error):
+    """A node is down: the cluster cannot give a complete answer"""
+    return jsonify({"error": str(error)}), HTTPStatus.BAD_GATEWAY
+
+
+@routes.route("/cluster", methods=["GET"])
+def get_cluster():
+    """List the nodes in ring order, so clients can hash names themselves"""
+    router = _router()
+    return (
+        jsonify(
+            {"nodes": list(router.urls.values()), "replicas": router.ring.replicas}
+        ),
+        HTTPStatus.OK,
+    )
+
+
+@routes.route("/counters/<name>", methods=["POST", "GET", "PUT", "DELETE"])
+@routes.route("/counters/<name>/set/<value>", methods=["PUT"])
+@routes.route("/counters/<name>/reset", methods=["POST"])
+@routes.route("/counters/<name>/rate", methods=["GET"])
+def forward(name, value=None):
+    """Pass a single-counter request to the node owning the counter"""
+    router = _router()
+    headers = {
+        header: request.headers[header]
+        for header in FORWARDED_REQUEST_HEADERS
+        if header in request.headers
+    }
+    status, reply_headers, body = router.send(
+        router.ring.node_for(name),
+        request.method,
+        _target(),
+        request.get_data() or None,
+        headers,
+    )
+    response = Response(body, status)
+    for header in FORWARDED_RESPONSE_HEADERS:
+        if header in reply_headers:
+            response.headers[header] = reply_headers[header]
+    return response
+
+
+@routes.route("/counters", methods=["GET"])
+@routes.route("/counters/prefix/<prefix>", methods=["GET"])
+def list_counters(prefix=None):
+    """List every node's counters, or merge one page from each in name order
+
+    Each node returns its first `limit` names after the cursor, so the
+    first `limit` of all of them is the cluster's page. An NDJSON listing
+    is gathered in full before the first line goes out.
+    """
+    after = request.args.get("after")
+    if request.args.get("format") == "ndjson" and prefix is None:
+        replies = _router().gather("GET", "/counters")
+        counters = sorted(_merged(replies).items())
+        lines = (
+            json.dumps({name: value}) + "\n"
+            for name, value in counters
+            if after is None or name > after
+        )
+        return _failed(replies) or Response(lines, mimetype="application/x-ndjson")
+    if prefix is None and after is None and "limit" not in request.args:
+        replies = _router().gather("GET", "/counters")
+        return _failed(replies) or (jsonify(_merged(replies)), HTTPStatus.OK)
+    limit, error = parse_page_limit(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    if error:
+        return jsonify({"error": error}), HTTPStatus.BAD_REQUEST
+    replies = _router().gather("GET", _target())
+    failed = _failed(replies)
+    if failed:
+        return failed
+    pages = [sorted(payload["counters"].items()) for _, payload in replies]
+    page = list(heapq.merge(*pages))[:limit]
+    return jsonify(page_response(page, limit)), HTTPStatus.OK
+
+
+@routes.route("/counters/prefix/<prefix>/stats", methods=["GET"])
+def get_prefix_stats(prefix):
+    """Add up the count and sum of each node's counters with the prefix"""
+    replies = _router().gather("GET", _target())
+    return _failed(replies) or (
+        jsonify(
+            {
+                "count": sum(payload["count"] for _, payload in replies),
+                "total": sum(payload["total"] for _, payload in replies),
+                "prefix": prefix,
+            }
+        ),
+        HTTPStatus.OK,
+    )
+
+
+@routes.route("/counters/reset", methods=["POST"])
+def reset_counters():
+    """Reset the counters on every node"""
+    replies = _router().gather("POST", _target())
+    return _failed(replies) or (
+        jsonify({"message": "All counters have been reset"}),
+        HTTPStatus.OK,
+    )
+
+
+@routes.route("/counters/bulk/delete", methods=["POST"])
+@routes.route("/counters/bulk/reset", methods=["POST"])
+def bulk_counters():
+    """Apply a bulk delete or reset on every node and add up the counts"""
+    replies = _router().gather("POST", _target())
+    failed = _failed(replies)
+    if failed:
+        return failed
+    key = "deleted" if request.path.endswith("/delete") else "reset"
+    return jsonify({key: sum(payload[key] for _, payload in replies)}), HTTPStatus.OK
+
+
+@routes.route("/counters/total", methods=["GET"])
+@routes.route("/counters/count", methods=["GET"])
+def get_sum():
+    """Add up the total or the count of every node"""
+    replies = _router().gather("GET", _target())
+    failed = _failed(replies)
+    if failed:
+        return failed
+    key = request.path.rsplit("/", 1)[1]
+    return jsonify({key: sum(payload[key] for _, payload in replies)}), HTTPStatus.OK
+
+
+@routes.route("/counters/stats", methods=["GET"])
+def get_counter_stats():
+    """Combine each node's count, sum, min and max"""
+    replies = _router().gather("GET", _target())
+    failed = _failed(replies)
+    if failed:
+        return failed
+    summaries = [payload for _, payload in replies]
+    count = sum(summary["count"] for summary in summaries)
+    total = sum(summary["total"] for summary in summaries)
+    lows = [summary["min"] for summary in summaries if summary["count"]]
+    highs = [summary["max"] for summary in summaries if summary["count"]]
+    return (
+        jsonify(
+            {
+                "count": count,
+                "total": total,
+                "min": min(lows, default=None),
+                "max": max(highs, default=None),
+                "mean": total / count if count else None,
+            }
+        ),
+        HTTPStatus.OK,
+    )
+
+
+@routes.route("/counters/top/<int:n>", methods=["GET"])
+@routes.route("/counters/bottom/<int:n>", methods=["GET"])
+def get_extreme_counters(n):
+    """Merge each node's top (or bottom) n into the cluster's n"""
+    replies = _router().gather("GET", _target())
+    found = [
+        (status, payload)
+        for status, payload in replies
+        if status != HTTPStatus.NOT_FOUND
+    ]
+    if not found:
+        return jsonify({"error": "No counters available"}), HTTPStatus.NOT_FOUND
+    failed = _failed(found)
+    if failed:
+        return failed
+    entries = [(value, name) for name, value in _merged(found).items()]
+    pick = heapq.nlargest if "/top/" in request.path else heapq.nsmallest
+    return jsonify({name: value for value, name in pick(n, entries)}), HTTPStatus.OK
+
+
+@routes.route("/counters/greater/<int:threshold>", methods=["GET"])
+@routes.route("/counters/less/<int:threshold>", methods=["GET"])
+@routes.route("/counters/equal/<int:threshold>", methods=["GET"])
+def get_filtered_counters(threshold):
+    """Merge every node's counters matching a threshold filter"""
+    replies = _router().gather("GET", _target())
+    return _failed(replies) or (jsonify(_merged(replies)), HTTPStatus.OK)
+
+
+@routes.route("/counters/batch", methods=["POST"])
+def batch_counters():
+    """Split a batch by owning node, run the parts in parallel, keep the order
+
+    Operations on one counter all go to one node, in their original order,
+    so each counter sees the same sequence as on a single process.
+    Malformed operations go to the first node, which reports them.
+    """
+    body = request.get_json(silent=True)
+    if isinstance(body, dict):
+        body = body.get("operations")
+    if not isinstance(body, list):
+        return (
+            jsonify({"error": "Expected a list of operations"}),
+            HTTPStatus.BAD_REQUEST,
+        )
+    router = _router()
+    # node -> positions in the batch of the operations it owns
+    positions = {}
+    for position, operation in enumerate(body):
+        name = operation.get("name") if isinstance(operation, dict) else None
+        node = router.ring.node_for(name) if isinstance(name, str) else "node-0"
+        positions.setdefault(node, []).append(position)
+    replies = router.scatter(
+        "POST",
+        "/counters/batch",
+        {
+            node: {"operations": [body[position] for position in owned]}
+            for node, owned in positions.items()
+        },
+    )
+    results = [None] * len(body)
+    for node, (status, payload) in replies.items():
+        if status != HTTPStatus.OK:
+            return jsonify(payload), status
+        for position, result in zip(positions[node], payload["results"]):
+            results[position] = result
+    return jsonify({"results": results}), HTTPStatus.OK
+
+
+# Routes of a single process whose answers the router cannot merge. They
+# are registered so the /counters/<name> route does not forward them to
+# the owner of, say, "distribution", which would answer for its share only
+@routes.route("/counters/distribution", methods=["GET"])
+@routes.route("/counters/stream", methods=["GET"])
+@routes.route("/counters/snapshot", methods=["POST"])
+@routes.route("/counters/snapshot/<path:rest>", methods=["GET", "DELETE"])
+@routes.route("/counters/rank/<int:k>", methods=["GET"])
+@routes.route("/counters/<name>/rank", methods=["GET"])
+@routes.route("/counters/rate/top/<int:n>", methods=["GET"])
+@routes.route("/approx", methods=["GET", "DELETE"])
+@routes.route("/approx/<path:rest>", methods=["GET", "PUT"])
+def not_clustered(**params):
+    """A query only a single process can answer"""
+    error = f"{request.path} is not served by the cluster"
+    return jsonify({"error": error}), HTTPStatus.NOT_IMPLEMENTED
+
+
+def create_router(nodes=None, replicas=DEFAULT_REPLICAS):
+    """Build the router's Flask app for nodes, in ring order
+
+    Without nodes, they come from COUNTER_CLUSTER_NODES, comma-separated.
+    """
+    if nodes is None:
+        nodes = [
+            url for url in os.environ.get("COUNTER_CLUSTER_NODES", "").split(",") if url
+        ]
+    if not nodes:
+        raise ValueError("A cluster router needs at least one node URL")
+    app = Flask(__name__)
+    app.extensions["cluster"] = Router(nodes, replicas)
+    app.register_blueprint(routes)
+    return app
+
+
+def free_port(host=DEFAULT_HOST):
+    """Ask the OS for an unused TCP port"""
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def node_environment(number, data_dir=None, environ=os.environ):
+    """Environment for node `number`: its own store, journaled under data_dir"""
+    if environ.get("COUNTER_BACKEND") == "shm" or "COUNTER_SHM_PATH" in environ:
+        raise ValueError("Cluster nodes cannot share one shared-memory table")
+    environ = {
+        key: value
+        for key, value in environ.items()
+        if key not in ("COUNTER_DATA_DIR", "COUNTER_SQLITE_PATH")
+    }
+    if data_dir:
+        environ["COUNTER_DATA_DIR"] = os.path.join(data_dir, f"node-{number}")
+    return environ
+
+
+def wait_until_listening(process, host, port, timeout=START_TIMEOUT):
+    """Wait for a launched server to accept connections; raise if it exits"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.2).close()
+            return
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.05)
+    raise RuntimeError(f"cluster node on port {port} did not start")
+
+
+def start_nodes(count, host=DEFAULT_HOST, data_dir=None):
+    """Launch count node processes on free ports; return (processes, URLs)
+
+    Returns once every node accepts connections; stops them all if any
+    does not.
+    """
+    processes, urls = [], []
+    try:
+        for number in range(count):
+            port = free_port(host)
+            processes.append(
+                subprocess.Popen(
+                    NODE_COMMAND + [host, str(port)],
+                    env=node_environment(number, data_dir),
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+            )
+            urls.append(f"http://{host}:{port}")
+        for process, url in zip(processes, urls):
+            wait_until_listening(process, host, urlsplit(url).port)
+    except BaseException:
+        stop_nodes(processes)
+        raise
+    return processes, urls
+
+
+def stop_nodes(processes):
+    """Terminate node processes and wait for them to exit"""
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("host", nargs="?", default=DEFAULT_HOST)
+    parser.add_argument("port", nargs="?", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--nodes", type=int, default=DEFAULT_NODES)
+    parser.add_argument(
+        "--data-dir", help="journal node i's counters under DATA_DIR/node-i"
+    )
+    args = parser.parse_args()
+
+    from werkzeug.serving import run_simple
+
+    # Exit through the finally below on SIGTERM too, so the nodes stop with us
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    processes, urls = start_nodes(args.nodes, args.host, args.data_dir)
+    try:
+        print(f"nodes: {', '.join(urls)}", flush=True)
+        run_simple(args.host, args.port, create_router(urls), threaded=True)
+    finally:
+        stop_nodes(processes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Compact In-memory Counter Store
+
+Keeps every counter in flat machine-integer arrays instead of a dict of
+Python objects. Names are stored once, as UTF-8, in a single bytearray;
+each counter gets a slot in parallel int64 columns (value, name hash and
+the name's position in the bytearray), and an open-addressing table of
+slot numbers finds a name's slot. Deleted slots go on a free list for
+reuse. A counter costs roughly 40 bytes plus its name, against well over
+100 for a dict entry with its str and int objects.
+"""
+
+import threading
+from array import array
+from src.backends import CounterBackend, check_int64, notify
+from src.events import CounterEvents
+from src.expiry import CounterExpiry
+from src.rates import CounterRates
+from src.versions import CounterVersions
+
+# Table entries: EMPTY, DELETED, or a slot number plus one
+EMPTY, DELETED = 0, -1
+# Marks a slot on the free list in the spans column
+FREE = -1
+MIN_TABLE_SIZE = 8
+
+
+class CompactCounterStore(CounterBackend):
+    """Counters in int64 arrays with interned names, behind one lock
+
+    Point operations are O(1) on average; ordered and range queries use
+    the CounterBackend scans, like the plain dict store. Values are int64,
+    so a counter cannot go past 2 ** 63 - 1. Rates are off by default:
+    their rings would cost far more than the counter they describe.
+    """
+
+    def __init__(self, rates=False):
+        self.versions = CounterVersions(per_counter=False)
+        self.expiry = CounterExpiry()
+        self.events = CounterEvents()
+        self.observers = [self.versions, self.expiry, self.events]
+        if rates:
+            self.rates = CounterRates()
+            self.observers.append(self.rates)
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # Columns indexed by slot
+        self._values = array("q")
+        self._hashes = array("q")
+        # offset << 32 | length of the slot's name in _names, or FREE
+        self._spans = array("q")
+        self._names = bytearray()
+        self._free = array("q")
+        self._table = array("q", bytes(8 * MIN_TABLE_SIZE))
+        self._count = 0
+        self._total = 0
+        # Table entries that are not EMPTY, tombstones included
+        self._filled = 0
+        # Bytes of _names belonging to deleted counters
+        self._garbage = 0
+
+    def _notify(self, name, old, new):
+        for observer in self.observers:
+            notify(observer, name, old, new)
+
+    def _name(self, slot):
+        span = self._spans[slot]
+        start = span >> 32
+        return self._names[start : start + (span & 0xFFFFFFFF)]
+
+    def _find(self, encoded, hashed):
+        """Return (table position of the name or None, first reusable position)"""
+        table, mask = self._table, len(self._table) - 1
+        position, reusable = hashed & mask, None
+        while True:
+            entry = table[position]
+            if entry == EMPTY:
+                return None, position if reusable is None else reusable
+            if entry == DELETED:
+                if reusable is None:
+                    reusable = position
+            elif self._hashes[entry - 1] == hashed and self._name(entry - 1) == encoded:
+                return position, None
+            position = (position + 1) & mask
+
+    def _slot(self, name):
+        """Return the slot holding name, or None"""
+        position, _ = self._find(name.encode(), hash(name))
+        return None if position is None else self._table[position] - 1
+
+    def _resize(self):
+        """Rebuild the table with room to grow and no tombstones"""
+        size = MIN_TABLE_SIZE
+        while size < self._count * 3:
+            size *= 2
+        table, mask = array("q", bytes(8 * size)), size - 1
+        for slot, span in enumerate(self._spans):
+            if span != FREE:
+                position = self._hashes[slot] & mask
+                while table[position] != EMPTY:
+                    position = (position + 1) & mask
+                table[position] = slot + 1
+        self._table, self._filled = table, self._count
+
+    def _compact_names(self):
+        """Copy live names into a fresh bytearray, dropping deleted ones"""
+        names = bytearray()
+        for slot, span in enumerate(self._spans):
+            if span != FREE:
+                encoded = self._name(slot)
+                self._spans[slot] = len(names) << 32 | len(encoded)
+                names += encoded
+        self._names, self._garbage = names, 0
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def get(self, name):
+        """Return a counter's value, or None if it does not exist"""
+        with self._lock:
+            slot = self._slot(name)
+            return None if slot is None else self._values[slot]
+
+    def create(self, name, value=0):
+        """Create a counter; return False if it already exists"""
+        check_int64(value)
+        self._check_journaled(name, value)
+        encoded, hashed = name.encode(), hash(name)
+        with self._lock:
+            position, reusable = self._find(encoded, hashed)
+            if position is not None:
+                return False
+            span = len(self._names) << 32 | len(encoded)
+            if self._free:
+                slot = self._free.pop()
+                self._values[slot] = value
+                self._hashes[slot], self._spans[slot] = hashed, span
+            else:
+                slot = len(self._spans)
+                self._values.append(value)
+                self._hashes.append(hashed)
+                self._spans.append(span)
+            self._names += encoded
+            if self._table[reusable] == EMPTY:
+                self._filled += 1
+            self._table[reusable] = slot + 1
+            self._count += 1
+            self._total += value
+            if self._filled * 3 >= len(self._table) * 2:
+                self._resize()
+            self._notify(name, None, value)
+        return True
+
+    def increment(self, name, delta=1):
+        """Add delta to a counter; return the new value, or None if missing"""
+        with self._lock:
+            slot = self._slot(name)
+            if slot is None:
+                return None
+            old = self._values[slot]
+            self._values[slot] = new = check_int64(old + delta)
+            self._total += delta
+            self._notify(name, old, new)
+        return new
+
+    def set(self, name, value):
+        """Set a counter's value; return it, or None if the counter is missing"""
+        check_int64(value)
+        with self._lock:
+            slot = self._slot(name)
+            if slot is None:
+                return None
+            old = self._values[slot]
+            self._values[slot] = value
+            self._total += value - old
+            self._notify(name, old, value)
+        return value
+
+    def delete(self, name):
+        """Delete a counter; return its last value, or None if missing"""
+        with self._lock:
+            position, _ = self._find(name.encode(), hash(name))
+            if position is None:
+                return None
+            slot = self._table[position] - 1
+            old = self._values[slot]
+            self._table[position] = DELETED
+            self._garbage += self._spans[slot] & 0xFFFFFFFF
+            self._spans[slot] = FREE
+            self._free.append(slot)
+            self._count -= 1
+            self._total -= old
+            if self._garbage * 2 > len(self._names):
+                self._compact_names()
+            self._notify(name, old, None)
+        return old
+
+    def clear(self):
+        """Delete every counter"""
+        with self._lock:
+            self._reset()
+            for observer in self.observers:
+                observer.clear()
+
+    def items(self):
+        """Return a point-in-time copy of every counter"""
+        with self._lock:
+            return {
+                self._name(slot).decode(): self._values[slot]
+                for slot, span in enumerate(self._spans)
+                if span != FREE
+            }
+
+    def total(self):
+        """Return the sum of all counter values"""
+        return self._total
+
+    def check(self):
+        """Raise AssertionError if the table, columns and totals disagree"""
+        with self._lock:
+            live = [slot for slot, span in enumerate(self._spans) if span != FREE]
+            found = sorted(entry - 1 for entry in self._table if entry > 0)
+            if found != live:
+                raise AssertionError("hash table does not match the live slots")
+            values = [self._values[slot] for slot in live]
+            if (self._count, self._total) != (len(values), sum(values)):
+                raise AssertionError(
+                    f"(count, total) {(self._count, self._total)} != "
+                    f"{(len(values), sum(values))}"
+                )
+            for slot in live:
+                name = self._name(slot).decode()
+                if self._slot(name) != slot:
+                    raise AssertionError(f"{name!r} does not hash to its slot")
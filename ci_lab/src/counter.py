@@ -2,14 +2,139 @@
 Counter API Implementation
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, json, jsonify, request, stream_with_context
 from http import HTTPStatus
+import atexit
+import hashlib
+import math
+import os
 import re
+import time
+from src.backends import (
+    PREDICATES,
+    CounterRangeError,
+    DictCounterStore,
+    SQLiteCounterStore,
+)
+from src.compact import CompactCounterStore
+from src.events import KEEPALIVE, render
+from src.metrics import RequestMetrics
+from src.persistence import CounterJournal
+from src.rates import MAX_WINDOW
+from src.shm import (
+    DEFAULT_SLOTS_PER_STRIPE,
+    DEFAULT_STRIPES,
+    SharedCounterStore,
+    SharedTableError,
+)
+from src.sketch import DEFAULT_CAPACITY, SpaceSaving
+from src.snapshots import SnapshotRegistry
+from src.store import CounterStore
 
 app = Flask(__name__)
-
-# Dictionary to store counters
-COUNTERS = {}
+# Recompute every derived structure after each request (for tests)
+app.config.setdefault("CHECK_CONSISTENCY", False)
+# Time every request into the /metrics histograms (COUNTER_METRICS=0 disables)
+app.config.setdefault("METRICS_ENABLED", os.environ.get("COUNTER_METRICS", "1") != "0")
+
+
+def tracks_rates(environ, default):
+    """Whether COUNTER_RATES ("1" or "0") turns rate tracking on, else default"""
+    if "COUNTER_RATES" not in environ:
+        return default
+    return environ["COUNTER_RATES"] != "0"
+
+
+# Backends selectable with COUNTER_BACKEND, each built from the environment
+BACKENDS = {
+    "indexed": lambda environ: CounterStore(rates=tracks_rates(environ, True)),
+    "dict": lambda environ: DictCounterStore(rates=tracks_rates(environ, True)),
+    "compact": lambda environ: CompactCounterStore(rates=tracks_rates(environ, False)),
+    "sqlite": lambda environ: SQLiteCounterStore(
+        environ.get("COUNTER_SQLITE_PATH", ":memory:")
+    ),
+    "shm": lambda environ: SharedCounterStore(
+        environ.get("COUNTER_SHM_PATH", "/dev/shm/counters"),
+        stripes=int(environ.get("COUNTER_SHM_STRIPES", DEFAULT_STRIPES)),
+        slots_per_stripe=int(
+            environ.get("COUNTER_SHM_SLOTS", DEFAULT_SLOTS_PER_STRIPE)
+        ),
+    ),
+}
+
+
+# COUNTER_DURABILITY values: fsync before acknowledging, or in the background
+DURABILITY_MODES = ("commit", "interval")
+
+
+def create_store(environ=os.environ):
+    """Build the store selected by the environment
+
+    COUNTER_BACKEND picks one of BACKENDS (default "indexed"). Setting only
+    COUNTER_SHM_PATH selects the shared table; a new table file gets
+    COUNTER_SHM_STRIPES stripes of COUNTER_SHM_SLOTS slots, one counter
+    each. COUNTER_RATES=0 or 1 turns rate tracking off or on for the
+    in-process backends; it is on by default except on the compact store.
+    COUNTER_DATA_DIR makes an in-memory backend durable across restarts.
+    COUNTER_DURABILITY is "commit" (default), where a request is
+    acknowledged once its changes are fsynced, or "interval", where they
+    are fsynced in the background.
+    """
+    default = "shm" if "COUNTER_SHM_PATH" in environ else "indexed"
+    backend = environ.get("COUNTER_BACKEND", default)
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Unknown COUNTER_BACKEND {backend!r}; choose from {', '.join(BACKENDS)}"
+        )
+    store = BACKENDS[backend](environ)
+    data_dir = environ.get("COUNTER_DATA_DIR")
+    if data_dir:
+        if not hasattr(store, "observers"):
+            raise ValueError(f"COUNTER_DATA_DIR cannot journal the {backend} backend")
+        durability = environ.get("COUNTER_DURABILITY", "commit")
+        if durability not in DURABILITY_MODES:
+            raise ValueError(
+                f"Unknown COUNTER_DURABILITY {durability!r}; "
+                f"choose from {', '.join(DURABILITY_MODES)}"
+            )
+        journal = CounterJournal(data_dir, group_commit=durability == "commit")
+        atexit.register(journal.attach(store).close)
+    return store
+
+
+# Store holding every counter and its indexes
+STORE = create_store()
+# Request counts and latency histograms served at /metrics
+METRICS = RequestMetrics()
+# Approximate counters under /approx, for more distinct names than fit in STORE
+APPROX = SpaceSaving(int(os.environ.get("COUNTER_APPROX_CAPACITY", DEFAULT_CAPACITY)))
+# Open snapshots under /counters/snapshot, for multi-step reads of one state
+SNAPSHOTS = SnapshotRegistry()
+
+INVALID_NAME_ERROR = "Invalid counter name. Only alphanumeric and underscores allowed."
+INVALID_VALUE_ERROR = "Invalid counter value"
+NEGATIVE_VALUE_ERROR = "Counter value cannot be negative"
+INVALID_TTL_ERROR = "ttl must be a positive number of seconds"
+TTL_UNSUPPORTED_ERROR = "This storage backend does not support ttl"
+INVALID_WINDOW_ERROR = (
+    f"window must be 1 to {MAX_WINDOW} seconds, e.g. 90, 30s, 5m or 1h"
+)
+RATES_UNSUPPORTED_ERROR = "This storage backend does not track rates"
+EVENTS_UNSUPPORTED_ERROR = "This storage backend does not stream changes"
+DEFAULT_WINDOW = 60
+INVALID_QUANTILES_ERROR = "q must be comma-separated fractions between 0 and 1"
+DEFAULT_QUANTILES = "0.5,0.9,0.99"
+INVALID_PREDICATE_ERROR = (
+    "Give exactly one of ?lt=, ?gt= or ?eq= (an integer) or ?prefix= "
+    "(a non-empty name prefix)"
+)
+# Suffixes accepted on ?window=
+WINDOW_UNITS = {"s": 1, "m": 60, "h": 3600}
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Counters fetched from the store per step of an NDJSON stream
+STREAM_CHUNK = 1000
 
 
 def is_valid_counter_name(name):
@@ -17,152 +142,715 @@ def is_valid_counter_name(name):
     return re.match(r"^[a-zA-Z0-9_]+$", name) is not None
 
 
+def parse_counter_value(value):
+    """Convert value to a non-negative int; return (value, error message)
+
+    Accepts ints and strings of digits only: a JSON float or bool in a
+    batch is refused like "1.9" in a URL, rather than truncated by int().
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        return None, INVALID_VALUE_ERROR
+    try:
+        value = int(value)  # Convert value to an integer
+    except (TypeError, ValueError):
+        return None, INVALID_VALUE_ERROR
+    if value < 0:
+        return None, NEGATIVE_VALUE_ERROR
+    return value, None
+
+
+def parse_ttl(ttl):
+    """Convert a ttl argument to seconds; return (seconds, error message)"""
+    if STORE.expiry is None:
+        return None, TTL_UNSUPPORTED_ERROR
+    try:
+        ttl = float(ttl)
+    except (TypeError, ValueError):
+        return None, INVALID_TTL_ERROR
+    if not (math.isfinite(ttl) and ttl > 0):
+        return None, INVALID_TTL_ERROR
+    return ttl, None
+
+
+def parse_window(window):
+    """Convert a ?window= argument to seconds; return (seconds, error message)"""
+    if STORE.rates is None:
+        return None, RATES_UNSUPPORTED_ERROR
+    window = str(window)
+    unit = WINDOW_UNITS.get(window[-1:])
+    try:
+        seconds = int(window[:-1]) * unit if unit else int(window)
+    except ValueError:
+        return None, INVALID_WINDOW_ERROR
+    if not 0 < seconds <= MAX_WINDOW:
+        return None, INVALID_WINDOW_ERROR
+    return seconds, None
+
+
+def parse_quantiles(quantiles):
+    """Convert a ?q= argument to a list of fractions; return (list, error)"""
+    try:
+        fractions = [float(q) for q in quantiles.split(",")]
+    except ValueError:
+        return None, INVALID_QUANTILES_ERROR
+    if not all(0 <= q <= 1 for q in fractions):
+        return None, INVALID_QUANTILES_ERROR
+    return fractions, None
+
+
+def parse_predicate(args):
+    """Find the one bulk predicate in query args; return ((op, operand), error)"""
+    given = [op for op in PREDICATES if op in args]
+    if len(given) != 1:
+        return None, INVALID_PREDICATE_ERROR
+    op = given[0]
+    operand = args[op]
+    if op == "prefix":
+        # An empty prefix would match, and delete, every counter
+        if not operand:
+            return None, INVALID_PREDICATE_ERROR
+    else:
+        try:
+            operand = int(operand)
+        except ValueError:
+            return None, INVALID_PREDICATE_ERROR
+    return (op, operand), None
+
+
+def increment(name, delta=1):
+    """Increment a counter and count it towards the counter's rates"""
+    value = STORE.increment(name, delta)
+    if value is not None and STORE.rates is not None:
+        STORE.rates.record(name, delta)
+    return value
+
+
+def parse_page_limit(limit):
+    """Convert a ?limit= argument to a page size; return (limit, error message)"""
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        limit = 0
+    if not 0 < limit <= MAX_PAGE_SIZE:
+        return None, f"limit must be between 1 and {MAX_PAGE_SIZE}"
+    return limit, None
+
+
+def page_response(page, limit):
+    """Body for one page of (name, value) pairs and the cursor after it"""
+    next_after = page[-1][0] if len(page) == limit else None
+    return {"counters": dict(page), "next": next_after}
+
+
+def json_body(payload):
+    """Serialize a payload exactly as jsonify does"""
+    return jsonify(payload).get_data()
+
+
+def tagged_response(body, tag=None):
+    """JSON response carrying an ETag, or 304 if the client already has it
+
+    Without a version tag the body is tagged by its hash, which still saves
+    the transfer but not the work of building it.
+    """
+    if tag is None:
+        tag = hashlib.blake2b(body, digest_size=8).hexdigest()
+    response = Response(body, mimetype="application/json")
+    response.set_etag(tag)
+    return response.make_conditional(request)
+
+
+def cached_response(key, render):
+    """Tagged response for a read-only query; render() builds its payload
+
+    Stores that keep versions serve the serialized body from their cache
+    until the next write, so repeated polls skip the query entirely.
+    """
+    versions = STORE.versions
+    if versions is None:
+        return tagged_response(json_body(render()))
+    tag, body = versions.cached(key, lambda: json_body(render()))
+    return tagged_response(body, tag)
+
+
+def not_found_response(name):
+    """Counter not found error response"""
+    return jsonify({"error": f"Counter '{name}' not found"}), HTTPStatus.NOT_FOUND
+
+
+def check_consistency():
+    """Raise AssertionError if any derived structure disagrees with the counters"""
+    STORE.check()
+
+
+@app.before_request
+def _start_timer():
+    """Note when the request started, if metrics are on"""
+    if app.config["METRICS_ENABLED"]:
+        g.started = time.perf_counter()
+
+
+@app.before_request
+def _expire_counters():
+    """Delete counters whose TTL has run out before serving anything"""
+    if STORE.expiry is not None:
+        STORE.expiry.expire(STORE)
+
+
+@app.after_request
+def _check_after_request(response):
+    """Verify the derived structures when CHECK_CONSISTENCY is on"""
+    if app.config["CHECK_CONSISTENCY"]:
+        check_consistency()
+    return response
+
+
+@app.after_request
+def _record_metrics(response):
+    """Record the request's route, status and latency"""
+    started = g.get("started")
+    if started is not None:
+        rule = request.url_rule
+        METRICS.observe(
+            rule.rule if rule is not None else "unmatched",
+            request.method,
+            response.status_code,
+            time.perf_counter() - started,
+        )
+    return response
+
+
+@app.after_request
+def _wait_until_durable(response):
+    """Hold the response until the journal has fsynced the request's changes
+
+    Registered last so it runs first, and its wait counts in the metrics.
+    """
+    if STORE.journal is not None:
+        STORE.journal.sync()
+    return response
+
+
+@app.errorhandler(SharedTableError)
+def shared_table_error(error):
+    """The shared counter table cannot hold this counter"""
+    return jsonify({"error": str(error)}), HTTPStatus.INSUFFICIENT_STORAGE
+
+
+@app.errorhandler(CounterRangeError)
+def counter_range_error(error):
+    """The storage backend cannot hold this value; nothing was changed"""
+    return jsonify({"error": str(error)}), HTTPStatus.BAD_REQUEST
+
+
 @app.route("/counters/<name>", methods=["POST"])
 def create_counter(name):
-    """Create a new counter"""
+    """Create a new counter, expiring ?ttl= seconds after its last change"""
     if not is_valid_counter_name(name):
-        return (
-            jsonify(
-                {
-                    "error": "Invalid counter name. Only alphanumeric and underscores allowed."
-                }
-            ),
-            HTTPStatus.BAD_REQUEST,
-        )
-    if name in COUNTERS:
+        return jsonify({"error": INVALID_NAME_ERROR}), HTTPStatus.BAD_REQUEST
+    ttl = request.args.get("ttl")
+    if ttl is not None:
+        ttl, error = parse_ttl(ttl)
+        if error:
+            return jsonify({"error": error}), HTTPStatus.BAD_REQUEST
+    if not STORE.create(name):
         return (
             jsonify({"error": f"Counter '{name}' already exists"}),
             HTTPStatus.CONFLICT,
         )
-    COUNTERS[name] = 0
-    return jsonify({name: COUNTERS[name]}), HTTPStatus.CREATED
+    if ttl is not None:
+        STORE.expiry.set_ttl(name, ttl)
+    return jsonify({name: 0}), HTTPStatus.CREATED
 
 
 @app.route("/counters/<name>", methods=["GET"])
 def get_counter(name):
     """Retrieve an existing counter"""
-    if name not in COUNTERS:
-        return jsonify({"error": f"Counter '{name}' not found"}), HTTPStatus.NOT_FOUND
-    return jsonify({name: COUNTERS[name]}), HTTPStatus.OK
+    # Read the version first: a racing write can then only make it stale
+    tag = STORE.versions.etag(name) if STORE.versions else None
+    value = STORE.get(name)
+    if value is None:
+        return not_found_response(name)
+    return tagged_response(json_body({name: value}), tag)
 
 
 @app.route("/counters/<name>", methods=["PUT"])
 def increment_counter(name):
     """Increment an existing counter"""
-    if name not in COUNTERS:
-        return jsonify({"error": f"Counter '{name}' not found"}), HTTPStatus.NOT_FOUND
-    COUNTERS[name] += 1
-    return jsonify({name: COUNTERS[name]}), HTTPStatus.OK
+    value = increment(name)
+    if value is None:
+        return not_found_response(name)
+    return jsonify({name: value}), HTTPStatus.OK
 
 
 @app.route("/counters/<name>", methods=["DELETE"])
 def delete_counter(name):
     """Delete an existing counter"""
-    if name not in COUNTERS:
-        return jsonify({"error": f"Counter '{name}' not found"}), HTTPStatus.NOT_FOUND
-    del COUNTERS[name]
+    if STORE.delete(name) is None:
+        return not_found_response(name)
     return jsonify({"message": f"Counter '{name}' deleted"}), HTTPStatus.NO_CONTENT
 
 
 @app.route("/counters", methods=["GET"])
 def list_counters():
-    """List all counters"""
-    return jsonify(COUNTERS), HTTPStatus.OK
+    """List all counters, one page at a time, or as an NDJSON stream
+
+    ?limit=&after= return a page of counters in name order plus the cursor
+    for the next page; ?format=ndjson streams every counter, one JSON
+    object per line. Without either, all counters come back in one object.
+    """
+    after = request.args.get("after")
+    if request.args.get("format") == "ndjson":
+        return Response(
+            stream_with_context(ndjson_lines(after)),
+            mimetype="application/x-ndjson",
+        )
+    if after is None and "limit" not in request.args:
+        return cached_response(("list",), STORE.items)
+
+    limit, error = parse_page_limit(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    if error:
+        return jsonify({"error": error}), HTTPStatus.BAD_REQUEST
+    return cached_response(
+        ("page", after, limit), lambda: page_response(STORE.page(after, limit), limit)
+    )
+
+
+def ndjson_lines(after):
+    """Yield one NDJSON line per counter, in name order"""
+    for name, value in STORE.scan(after, STREAM_CHUNK):
+        yield json.dumps({name: value}) + "\n"
+
+
+@app.route("/counters/stream", methods=["GET"])
+def stream_counters():
+    """Push counter changes as server-sent events
+
+    ?name= (repeatable) and ?prefix= limit the stream to those counters.
+    The first event is a resync carrying their current values.
+    """
+    if STORE.events is None:
+        return jsonify({"error": EVENTS_UNSUPPORTED_ERROR}), HTTPStatus.BAD_REQUEST
+    subscription = STORE.events.subscribe(
+        request.args.getlist("name"), request.args.get("prefix")
+    )
+    return Response(
+        stream_with_context(event_chunks(STORE, subscription)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+def event_chunks(store, subscription):
+    """Yield server-sent events for a subscription until the client leaves"""
+    try:
+        while True:
+            stale, changes = subscription.take(KEEPALIVE)
+            yield render(subscription, store, stale, changes)
+    finally:
+        store.events.unsubscribe(subscription)
+
+
+@app.route("/counters/prefix/<prefix>", methods=["GET"])
+def list_counters_with_prefix(prefix):
+    """List counters whose name starts with prefix, one page at a time"""
+    after = request.args.get("after")
+    limit, error = parse_page_limit(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    if error:
+        return jsonify({"error": error}), HTTPStatus.BAD_REQUEST
+    return cached_response(
+        ("prefix", prefix, after, limit),
+        lambda: page_response(STORE.prefix(prefix, after, limit), limit),
+    )
+
+
+@app.route("/counters/prefix/<prefix>/stats", methods=["GET"])
+def get_prefix_stats(prefix):
+    """Retrieve the count and sum of counters whose name starts with prefix"""
+    return cached_response(
+        ("prefix_stats", prefix),
+        lambda: dict(STORE.prefix_summary(prefix), prefix=prefix),
+    )
 
 
 @app.route("/counters/reset", methods=["POST"])
 def reset_counters():
     """Reset all counters"""
-    COUNTERS.clear()
+    STORE.clear()
     return jsonify({"message": "All counters have been reset"}), HTTPStatus.OK
 
 
+@app.route("/counters/bulk/delete", methods=["POST"])
+def bulk_delete_counters():
+    """Delete every counter matching ?lt=, ?gt=, ?eq= or ?prefix="""
+    predicate, error = parse_predicate(request.args)
+    if error:
+        return jsonify({"error": error}), HTTPStatus.BAD_REQUEST
+    return jsonify({"deleted": STORE.delete_where(*predicate)}), HTTPStatus.OK
+
+
+@app.route("/counters/bulk/reset", methods=["POST"])
+def bulk_reset_counters():
+    """Reset every counter matching ?lt=, ?gt=, ?eq= or ?prefix= to zero"""
+    predicate, error = parse_predicate(request.args)
+    if error:
+        return jsonify({"error": error}), HTTPStatus.BAD_REQUEST
+    return jsonify({"reset": STORE.reset_where(*predicate)}), HTTPStatus.OK
+
+
 @app.route("/counters/total", methods=["GET"])
 def get_total_counters():
     """Retrieve the sum of all counter values"""
-    total = sum(COUNTERS.values())
-    return jsonify({"total": total}), HTTPStatus.OK
+    return cached_response(("total",), lambda: {"total": STORE.total()})
+
+
+@app.route("/counters/stats", methods=["GET"])
+def get_counter_stats():
+    """Retrieve count, sum, min, max and mean of all counter values"""
+    return jsonify(STORE.summary()), HTTPStatus.OK
+
+
+@app.route("/counters/distribution", methods=["GET"])
+def get_counter_distribution():
+    """Retrieve quantiles and power-of-two buckets of all counter values"""
+    quantiles, error = parse_quantiles(request.args.get("q", DEFAULT_QUANTILES))
+    if error:
+        return jsonify({"error": error}), HTTPStatus.BAD_REQUEST
+    return cached_response(
+        ("distribution", tuple(quantiles)), lambda: STORE.distribution(quantiles)
+    )
 
 
 @app.route("/counters/top/<int:n>", methods=["GET"])
 def get_top_n_counters(n):
     """Retrieve the top N highest counters"""
-    if not COUNTERS:
+    if not STORE:
         return jsonify({"error": "No counters available"}), HTTPStatus.NOT_FOUND
 
-    # Sort by value in descending order
-    sorted_items = sorted(COUNTERS.items(), key=lambda item: item[1], reverse=True)
-
-    # Get top N items
-    top_n = dict(sorted_items[:n])
-
-    return jsonify(top_n), HTTPStatus.OK
+    # Walk the value index from the high end instead of sorting everything
+    return cached_response(("top", n), lambda: dict(STORE.top(n)))
 
 
 @app.route("/counters/bottom/<int:n>", methods=["GET"])
 def get_bottom_n_counters(n):
     """Retrieve the bottom N lowest counters"""
-    if not COUNTERS:
+    if not STORE:
         return jsonify({"error": "No counters available"}), HTTPStatus.NOT_FOUND
-    # Sort by value in ascending order (to get the lowest)
-    sorted_items = sorted(COUNTERS.items(), key=lambda item: item[1])
-    # Get bottom N items
-    bottom_n = dict(sorted_items[:n])
+    # Walk the value index from the low end (to get the lowest)
+    bottom_n = dict(STORE.bottom(n))
     return jsonify(bottom_n), HTTPStatus.OK
 
 
+@app.route("/counters/<name>/rank", methods=["GET"])
+def get_counter_rank(name):
+    """Retrieve a counter's position in the leaderboard (1 is the highest)"""
+    rank = STORE.rank(name)
+    if rank is None:
+        return not_found_response(name)
+    return jsonify({"name": name, "rank": rank}), HTTPStatus.OK
+
+
+@app.route("/counters/rank/<int:k>", methods=["GET"])
+def get_counter_at_rank(k):
+    """Retrieve the counter at position k in the leaderboard"""
+    ranked = STORE.at_rank(k)
+    if ranked is None:
+        return jsonify({"error": f"No counter at rank {k}"}), HTTPStatus.NOT_FOUND
+    name, value = ranked
+    return jsonify({"name": name, "value": value, "rank": k}), HTTPStatus.OK
+
+
+@app.route("/counters/snapshot", methods=["POST"])
+def create_snapshot():
+    """Take a consistent snapshot of every counter to read from"""
+    snapshot_id, snapshot = SNAPSHOTS.create(STORE)
+    body = dict(snapshot.summary(), id=snapshot_id, ttl=SNAPSHOTS.ttl)
+    return jsonify(body), HTTPStatus.CREATED
+
+
+def snapshot_not_found_response(snapshot_id):
+    """Snapshot not found (or expired) error response"""
+    error = f"Snapshot '{snapshot_id}' not found or expired"
+    return jsonify({"error": error}), HTTPStatus.NOT_FOUND
+
+
+@app.route("/counters/snapshot/<snapshot_id>", methods=["GET"])
+def list_snapshot_counters(snapshot_id):
+    """List a snapshot's counters one page at a time, in name order"""
+    snapshot = SNAPSHOTS.get(snapshot_id)
+    if snapshot is None:
+        return snapshot_not_found_response(snapshot_id)
+    limit, error = parse_page_limit(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    if error:
+        return jsonify({"error": error}), HTTPStatus.BAD_REQUEST
+    page = snapshot.page(request.args.get("after"), limit)
+    return jsonify(page_response(page, limit)), HTTPStatus.OK
+
+
+@app.route("/counters/snapshot/<snapshot_id>/stats", methods=["GET"])
+def get_snapshot_stats(snapshot_id):
+    """Retrieve count, sum, min, max and mean of a snapshot's counters"""
+    snapshot = SNAPSHOTS.get(snapshot_id)
+    if snapshot is None:
+        return snapshot_not_found_response(snapshot_id)
+    return jsonify(snapshot.summary()), HTTPStatus.OK
+
+
+@app.route("/counters/snapshot/<snapshot_id>/top/<int:n>", methods=["GET"])
+def get_snapshot_top_n(snapshot_id, n):
+    """Retrieve a snapshot's N highest counters"""
+    snapshot = SNAPSHOTS.get(snapshot_id)
+    if snapshot is None:
+        return snapshot_not_found_response(snapshot_id)
+    return jsonify(dict(snapshot.top(n))), HTTPStatus.OK
+
+
+@app.route("/counters/snapshot/<snapshot_id>", methods=["DELETE"])
+def release_snapshot(snapshot_id):
+    """Release a snapshot before it expires"""
+    if not SNAPSHOTS.release(snapshot_id):
+        return snapshot_not_found_response(snapshot_id)
+    message = f"Snapshot '{snapshot_id}' released"
+    return jsonify({"message": message}), HTTPStatus.NO_CONTENT
+
+
+def rate_response(name, count, window):
+    """Body for one counter's increments over a window"""
+    return {"name": name, "count": round(count, 3), "rate": count / window}
+
+
+@app.route("/counters/<name>/rate", methods=["GET"])
+def get_counter_rate(name):
+    """Retrieve a counter's increments over the last ?window= (default 60s)"""
+    window, error = parse_window(request.args.get("window", DEFAULT_WINDOW))
+    if error:
+        return jsonify({"error": error}), HTTPStatus.BAD_REQUEST
+    if name not in STORE:
+        return not_found_response(name)
+    count = STORE.rates.count(name, window)
+    body = dict(rate_response(name, count, window), window=window)
+    return jsonify(body), HTTPStatus.OK
+
+
+@app.route("/counters/rate/top/<int:n>", methods=["GET"])
+def get_top_n_counters_by_rate(n):
+    """Retrieve the N counters with the most increments over ?window="""
+    window, error = parse_window(request.args.get("window", DEFAULT_WINDOW))
+    if error:
+        return jsonify({"error": error}), HTTPStatus.BAD_REQUEST
+    top = [rate_response(*entry, window) for entry in STORE.rates.top(n, window)]
+    return jsonify({"window": window, "counters": top}), HTTPStatus.OK
+
+
 @app.route("/counters/<name>/set/<value>", methods=["PUT"])
 def set_counter_value(name, value):
     """Set a counter to a specific value"""
-    if name not in COUNTERS:
-        return jsonify({"error": f"Counter '{name}' not found"}), HTTPStatus.NOT_FOUND
-    try:
-        value = int(value)  # Convert value to an integer
-    except ValueError:
-        return jsonify({"error": "Invalid counter value"}), HTTPStatus.BAD_REQUEST
-    if value < 0:
-        return (
-            jsonify({"error": "Counter value cannot be negative"}),
-            HTTPStatus.BAD_REQUEST,
-        )
-    COUNTERS[name] = value
-    return jsonify({name: COUNTERS[name]}), HTTPStatus.OK
+    if name not in STORE:
+        return not_found_response(name)
+    value, error = parse_counter_value(value)
+    if error:
+        return jsonify({"error": error}), HTTPStatus.BAD_REQUEST
+    if STORE.set(name, value) is None:
+        return not_found_response(name)
+    return jsonify({name: value}), HTTPStatus.OK
 
 
 @app.route("/counters/<name>/reset", methods=["POST"])
 def reset_single_counter(name):
     """Reset a single counter to zero"""
-    if name not in COUNTERS:
-        return jsonify({"error": f"Counter '{name}' not found"}), HTTPStatus.NOT_FOUND
-    COUNTERS[name] = 0
-    return jsonify({name: COUNTERS[name]}), HTTPStatus.OK
+    if STORE.set(name, 0) is None:
+        return not_found_response(name)
+    return jsonify({name: 0}), HTTPStatus.OK
 
 
 @app.route("/counters/count", methods=["GET"])
 def get_total_number_of_counters():
     """Get the total number of counters"""
-    total_count = len(COUNTERS)  # Only count actual active counters
+    total_count = len(STORE)  # Only count actual active counters
     return jsonify({"count": total_count}), HTTPStatus.OK
 
 
 @app.route("/counters/greater/<int:threshold>", methods=["GET"])
 def get_counters_greater_than(threshold):
     """Retrieve counters greater than a given threshold"""
-    filtered_counters = {key: val for key, val in COUNTERS.items() if val > threshold}
+    filtered_counters = dict(STORE.greater_than(threshold))
     return jsonify(filtered_counters), HTTPStatus.OK
 
 
 @app.route("/counters/less/<int:threshold>", methods=["GET"])
 def get_counters_less_than_threshold(threshold):
     """Get all counters with values less than the given threshold"""
-    filtered_counters = {
-        k: v for k, v in COUNTERS.items() if v < threshold
-    }  # Only keep valid ones
+    filtered_counters = dict(STORE.less_than(threshold))
     return jsonify(filtered_counters), HTTPStatus.OK
 
 
 @app.route("/counters/equal/<int:value>", methods=["GET"])
 def get_counters_equal_to(value):
     """Get all counters whose value equals the given value"""
-    filtered_counters = {k: v for k, v in COUNTERS.items() if v == value}
+    filtered_counters = dict(STORE.equal_to(value))
     return jsonify(filtered_counters), HTTPStatus.OK
+
+
+def _batch_not_found(name):
+    """Batch result for a counter that does not exist"""
+    return HTTPStatus.NOT_FOUND, f"Counter '{name}' not found"
+
+
+def _batch_create(name, operation):
+    """Batch operation: create a counter at zero, with an optional ttl"""
+    if not is_valid_counter_name(name):
+        return HTTPStatus.BAD_REQUEST, INVALID_NAME_ERROR
+    ttl = operation.get("ttl")
+    if ttl is not None:
+        ttl, error = parse_ttl(ttl)
+        if error:
+            return HTTPStatus.BAD_REQUEST, error
+    if not STORE.create(name):
+        return HTTPStatus.CONFLICT, f"Counter '{name}' already exists"
+    if ttl is not None:
+        STORE.expiry.set_ttl(name, ttl)
+    return HTTPStatus.CREATED, 0
+
+
+def _batch_increment(name, operation):
+    """Batch operation: add a non-negative delta (default 1) to a counter"""
+    delta, error = parse_counter_value(operation.get("delta", 1))
+    if error:
+        return HTTPStatus.BAD_REQUEST, error
+    value = increment(name, delta)
+    if value is None:
+        return _batch_not_found(name)
+    return HTTPStatus.OK, value
+
+
+def _batch_set(name, operation):
+    """Batch operation: set a counter to a non-negative value"""
+    value, error = parse_counter_value(operation.get("value"))
+    if error:
+        return HTTPStatus.BAD_REQUEST, error
+    if STORE.set(name, value) is None:
+        return _batch_not_found(name)
+    return HTTPStatus.OK, value
+
+
+def _batch_reset(name, operation):
+    """Batch operation: reset a counter to zero"""
+    if STORE.set(name, 0) is None:
+        return _batch_not_found(name)
+    return HTTPStatus.OK, 0
+
+
+def _batch_delete(name, operation):
+    """Batch operation: delete a counter"""
+    if STORE.delete(name) is None:
+        return _batch_not_found(name)
+    return HTTPStatus.NO_CONTENT, None
+
+
+BATCH_OPERATIONS = {
+    "create": _batch_create,
+    "increment": _batch_increment,
+    "set": _batch_set,
+    "reset": _batch_reset,
+    "delete": _batch_delete,
+}
+
+
+def apply_batch(operations):
+    """Apply operations in order and return one result dict per operation"""
+    results = []
+    for operation in operations:
+        if not isinstance(operation, dict):
+            results.append(
+                {"status": HTTPStatus.BAD_REQUEST, "error": "Invalid operation"}
+            )
+            continue
+        op, name = operation.get("op"), operation.get("name")
+        handler = BATCH_OPERATIONS.get(op)
+        if handler is None or not isinstance(name, str):
+            results.append(
+                {
+                    "op": op,
+                    "name": name,
+                    "status": HTTPStatus.BAD_REQUEST,
+                    "error": "Invalid operation",
+                }
+            )
+            continue
+        try:
+            status, outcome = handler(name, operation)
+        except CounterRangeError as error:
+            # Only this operation failed; the backend changed nothing
+            status, outcome = HTTPStatus.BAD_REQUEST, str(error)
+        result = {"op": op, "name": name, "status": status}
+        if status >= HTTPStatus.BAD_REQUEST:
+            result["error"] = outcome
+        elif outcome is not None:
+            result["value"] = outcome
+        results.append(result)
+    return results
+
+
+@app.route("/counters/batch", methods=["POST"])
+def batch_counters():
+    """Apply a list of counter operations in one request"""
+    body = request.get_json(silent=True)
+    if isinstance(body, dict):
+        body = body.get("operations")
+    if not isinstance(body, list):
+        return (
+            jsonify({"error": "Expected a list of operations"}),
+            HTTPStatus.BAD_REQUEST,
+        )
+    return jsonify({"results": apply_batch(body)}), HTTPStatus.OK
+
+
+def approx_response(name, count, error):
+    """Body for one approximate counter; its true count is count - error..count"""
+    return {"name": name, "count": count, "error": error}
+
+
+@app.route("/approx/<name>", methods=["PUT"])
+def increment_approx_counter(name):
+    """Count one occurrence of an approximate counter"""
+    if not is_valid_counter_name(name):
+        return jsonify({"error": INVALID_NAME_ERROR}), HTTPStatus.BAD_REQUEST
+    count, error = APPROX.increment(name)
+    return jsonify(approx_response(name, count, error)), HTTPStatus.OK
+
+
+@app.route("/approx/<name>", methods=["GET"])
+def get_approx_counter(name):
+    """Estimate an approximate counter"""
+    count, error = APPROX.estimate(name)
+    return jsonify(approx_response(name, count, error)), HTTPStatus.OK
+
+
+@app.route("/approx/top/<int:n>", methods=["GET"])
+def get_top_n_approx_counters(n):
+    """Retrieve the N highest approximate counters, highest first"""
+    top = [approx_response(*entry) for entry in APPROX.top(n)]
+    return jsonify({"counters": top}), HTTPStatus.OK
+
+
+@app.route("/approx", methods=["GET"])
+def get_approx_summary():
+    """Retrieve the capacity, stream total and error bound of /approx"""
+    return jsonify(APPROX.summary()), HTTPStatus.OK
+
+
+@app.route("/approx", methods=["DELETE"])
+def reset_approx_counters():
+    """Forget every approximate counter"""
+    APPROX.clear()
+    return (
+        jsonify({"message": "All approximate counters have been reset"}),
+        HTTPStatus.OK,
+    )
+
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Request metrics and counter cardinality in Prometheus text format"""
+    gauges = {"counter_counters": ("Number of counters currently stored", len(STORE))}
+    return Response(METRICS.render(gauges), mimetype="text/plain; version=0.0.4")
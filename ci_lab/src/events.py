@@ -0,0 +1,178 @@
+"""
+Counter Change Events for Streaming Subscribers
+
+Every subscriber has its own bounded queue of pending changes, keyed by
+counter name, so repeated updates to one counter coalesce into its latest
+value and a writer's cost per subscriber is one dict assignment. Events
+carry absolute values, so coalescing loses no state. When a subscriber
+falls more than `capacity` distinct counters behind, its queue is dropped
+and it is resynchronized from a fresh snapshot instead, which bounds the
+memory a slow consumer can hold without ever blocking a writer.
+"""
+
+import json
+import threading
+
+# Distinct counters a subscriber may have pending before it is resynced
+DEFAULT_QUEUE_SIZE = 1024
+# Seconds between keep-alive comments on an idle stream
+KEEPALIVE = 15.0
+
+
+class Subscription:
+    """Pending changes for one stream consumer, coalesced per counter
+
+    Starts out stale, so the first take() asks the consumer for the
+    initial snapshot. `wake` is called after every change, for consumers
+    that wait on something other than take(), e.g. an asyncio event.
+    """
+
+    def __init__(self, names=None, prefix=None, capacity=DEFAULT_QUEUE_SIZE, wake=None):
+        self.names = set(names) if names else None
+        self.prefix = prefix
+        self.capacity = capacity
+        self.wake = wake
+        # name -> latest value, or None once deleted
+        self._pending = {}
+        self._stale = True
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._ready.set()
+
+    def matches(self, name):
+        """Whether changes to name belong on this stream"""
+        if self.names is None and self.prefix is None:
+            return True
+        return (self.names is not None and name in self.names) or (
+            self.prefix is not None and name.startswith(self.prefix)
+        )
+
+    def _signal(self):
+        self._ready.set()
+        if self.wake is not None:
+            self.wake()
+
+    def offer(self, name, value):
+        """Queue a counter's new value (None once deleted)"""
+        with self._lock:
+            if self._stale:
+                # A snapshot is due anyway and will include this change
+                return
+            # A non-empty queue was signalled when its first change came in
+            first = not self._pending
+            if name in self._pending or len(self._pending) < self.capacity:
+                self._pending[name] = value
+            else:
+                self._pending.clear()
+                self._stale = True
+        if first:
+            self._signal()
+
+    def invalidate(self):
+        """Drop the queue and resync the consumer from a snapshot"""
+        with self._lock:
+            self._pending.clear()
+            self._stale = True
+        self._signal()
+
+    def take(self, timeout=None):
+        """Wait up to timeout for changes; return (stale, {name: value or None})
+
+        stale means the consumer must replace its view with a new snapshot,
+        read after this call so no change made since can be missed.
+        """
+        self._ready.wait(timeout)
+        with self._lock:
+            self._ready.clear()
+            stale, pending = self._stale, self._pending
+            self._stale, self._pending = False, {}
+        return stale, pending
+
+    def snapshot(self, store):
+        """Return the current {name: value} of every counter on this stream"""
+        if self.names is None and self.prefix is None:
+            return store.items()
+        counters = {}
+        if self.prefix is not None:
+            counters.update(store.prefix(self.prefix, None, len(store)))
+        for name in self.names or ():
+            value = store.get(name)
+            if value is not None:
+                counters[name] = value
+        return counters
+
+
+def _event(kind, data):
+    return f"event: {kind}\ndata: {json.dumps(data)}\n\n"
+
+
+def render(subscription, store, stale, changes):
+    """Format one take() as server-sent events
+
+    A resync event carries the full {name: value} view of the stream, a
+    change event one counter's new value, a delete event a deleted
+    counter's name. With nothing to send, a comment keeps the stream alive.
+    """
+    chunks = []
+    if stale:
+        chunks.append(_event("resync", subscription.snapshot(store)))
+    for name, value in changes.items():
+        if value is None:
+            chunks.append(_event("delete", {"name": name}))
+        else:
+            chunks.append(_event("change", {"name": name, "value": value}))
+    return "".join(chunks) or ": keepalive\n\n"
+
+
+class CounterEvents:
+    """Fans counter changes out to the subscriptions of streaming clients
+
+    An observer of the store. The subscriber list is replaced rather than
+    modified, so writers iterate it without taking a lock, and with no
+    subscribers a change costs one empty loop.
+    """
+
+    def __init__(self):
+        self._subscribers = ()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def subscribe(
+        self, names=None, prefix=None, capacity=DEFAULT_QUEUE_SIZE, wake=None
+    ):
+        """Start queueing changes for a new subscriber and return it"""
+        subscription = Subscription(names, prefix, capacity, wake)
+        with self._lock:
+            self._subscribers += (subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Stop queueing changes for a subscriber"""
+        with self._lock:
+            self._subscribers = tuple(
+                s for s in self._subscribers if s is not subscription
+            )
+
+    def _publish(self, name, value):
+        for subscription in self._subscribers:
+            if subscription.matches(name):
+                subscription.offer(name, value)
+
+    def add(self, name, value):
+        """Publish a new counter"""
+        self._publish(name, value)
+
+    def remove(self, name, value):
+        """Publish a deleted counter"""
+        self._publish(name, None)
+
+    def update(self, name, old, new):
+        """Publish a counter's new value"""
+        self._publish(name, new)
+
+    def clear(self):
+        """Resync every subscriber, as every counter is gone"""
+        for subscription in self._subscribers:
+            subscription.invalidate()
@@ -0,0 +1,164 @@
+"""
+Counter Expiry on a Hierarchical Timing Wheel
+"""
+
+import math
+import threading
+import time
+
+# Each level of the wheel has 2 ** WHEEL_BITS slots
+WHEEL_BITS = 6
+WHEEL_LEVELS = 4
+
+
+class TimingWheel:
+    """Hierarchical timing wheel over integer ticks
+
+    Level 0 has one slot per tick; each higher level has slots as wide as
+    the whole level below it. An entry is filed at the lowest level whose
+    span reaches its deadline and drops a level each time the wheel turns
+    past its slot, so scheduling is O(1) and every entry is moved at most
+    once per level. Deadlines beyond the top level wait in its furthest
+    slot and are refiled when it comes round.
+    """
+
+    def __init__(self, bits=WHEEL_BITS, levels=WHEEL_LEVELS, now=0):
+        self.bits = bits
+        self.mask = (1 << bits) - 1
+        self.now = now
+        self.pending = 0
+        self._wheels = [[[] for _ in range(1 << bits)] for _ in range(levels)]
+
+    def schedule(self, key, deadline):
+        """File key to come due at the deadline tick (the next one if passed)"""
+        self.pending += 1
+        self._file(key, deadline, self.now + 1)
+
+    def _file(self, key, deadline, soonest):
+        tick = max(deadline, soonest)
+        top = len(self._wheels) - 1
+        for level, wheel in enumerate(self._wheels):
+            shift = level * self.bits
+            if tick - self.now < 1 << (shift + self.bits) or level == top:
+                tick = min(tick, self.now + (self.mask << shift))
+                wheel[(tick >> shift) & self.mask].append((key, deadline))
+                return
+
+    def advance(self, to):
+        """Move the wheel to tick `to`; return the (key, deadline) entries due"""
+        due = []
+        if not self.pending:
+            self.now = max(self.now, to)
+            return due
+        while self.now < to:
+            self.now += 1
+            # Every level whose lower levels all wrapped to zero turns a slot
+            level = 0
+            while level < len(self._wheels) - 1 and not (
+                (self.now >> level * self.bits) & self.mask
+            ):
+                level += 1
+            # Refile those slots top down, so entries can fall several levels
+            for upper in range(level, 0, -1):
+                slot = self._wheels[upper][(self.now >> upper * self.bits) & self.mask]
+                entries = slot[:]
+                slot.clear()
+                for key, deadline in entries:
+                    self._file(key, deadline, self.now)
+            slot = self._wheels[0][self.now & self.mask]
+            entries = slot[:]
+            slot.clear()
+            for key, deadline in entries:
+                if deadline <= self.now:
+                    due.append((key, deadline))
+                    self.pending -= 1
+                else:
+                    # Only a one-level wheel parks far deadlines here
+                    self._file(key, deadline, self.now + 1)
+        return due
+
+    def clear(self):
+        """Drop every entry"""
+        self.pending = 0
+        for wheel in self._wheels:
+            for slot in wheel:
+                slot.clear()
+
+
+class CounterExpiry:
+    """Time-to-live for counters, refreshed whenever they change
+
+    An observer of the store: an update to a counter with a TTL pushes its
+    deadline out again, and deleting or clearing forgets it. Refreshing
+    files a new wheel entry and leaves the old one to be skipped when it
+    comes due, which keeps every write O(1). Deadlines are rounded up to
+    whole ticks, so counters expire up to one tick late, never early.
+    """
+
+    def __init__(self, tick=1.0, clock=time.monotonic):
+        self.tick = tick
+        self.clock = clock
+        # name -> TTL in seconds
+        self.ttls = {}
+        # name -> deadline tick of its live wheel entry
+        self.deadlines = {}
+        self.wheel = TimingWheel(now=self._now())
+        self._lock = threading.Lock()
+
+    def _now(self):
+        """Return the number of whole ticks elapsed on the clock"""
+        return math.floor(self.clock() / self.tick)
+
+    def _schedule(self, name):
+        deadline = math.ceil((self.clock() + self.ttls[name]) / self.tick)
+        if self.deadlines.get(name) == deadline:
+            return
+        self.deadlines[name] = deadline
+        self.wheel.schedule(name, deadline)
+
+    def set_ttl(self, name, ttl):
+        """Expire name ttl seconds after its last change"""
+        with self._lock:
+            self.ttls[name] = ttl
+            self._schedule(name)
+
+    def add(self, name, value):
+        """A new counter has no TTL until set_ttl gives it one"""
+
+    def remove(self, name, value):
+        """Forget a deleted counter's TTL"""
+        with self._lock:
+            self.ttls.pop(name, None)
+            self.deadlines.pop(name, None)
+
+    def update(self, name, old, new):
+        """Push out the deadline of a changed counter with a TTL"""
+        if name in self.ttls:
+            with self._lock:
+                if name in self.ttls:
+                    self._schedule(name)
+
+    def clear(self):
+        """Forget every TTL"""
+        with self._lock:
+            self.ttls.clear()
+            self.deadlines.clear()
+            self.wheel.clear()
+
+    def due(self):
+        """Return the names whose deadline has passed"""
+        with self._lock:
+            entries = self.wheel.advance(self._now())
+            # Entries superseded by a refresh or a delete are skipped
+            return [
+                name
+                for name, deadline in entries
+                if self.deadlines.get(name) == deadline
+            ]
+
+    def expire(self, store):
+        """Delete every expired counter from store; return how many"""
+        names = self.due()
+        for name in names:
+            store.delete(name)
+        return len(names)
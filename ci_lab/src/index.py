@@ -0,0 +1,155 @@
+"""
+Ordered Indexes over Counter Values and Names
+"""
+
+from itertools import islice, takewhile
+from sortedcontainers import SortedList
+
+
+class CounterIndex:
+    """Keeps (value, name) pairs sorted so ordered queries avoid a full sort"""
+
+    def __init__(self):
+        self._entries = SortedList()
+        # value -> names holding it, for equality lookups
+        self._buckets = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, name, value):
+        """Record a new counter"""
+        self._entries.add((value, name))
+        self._buckets.setdefault(value, set()).add(name)
+
+    def remove(self, name, value):
+        """Forget a counter"""
+        self._entries.remove((value, name))
+        bucket = self._buckets[value]
+        bucket.discard(name)
+        if not bucket:
+            del self._buckets[value]
+
+    def update(self, name, old, new):
+        """Move a counter from its old value to its new one"""
+        if old == new:
+            return
+        self.remove(name, old)
+        self.add(name, new)
+
+    def clear(self):
+        """Forget every counter"""
+        self._entries.clear()
+        self._buckets.clear()
+
+    def min_value(self):
+        """Return the lowest value, or None when empty"""
+        return self._entries[0][0] if self._entries else None
+
+    def max_value(self):
+        """Return the highest value, or None when empty"""
+        return self._entries[-1][0] if self._entries else None
+
+    def value_at(self, position):
+        """Return the value at a position in ascending order"""
+        return self._entries[position][0]
+
+    def rank(self, name, value):
+        """Return a counter's 1-based position from the highest, as in top()
+
+        O(log n): SortedList finds a pair's position from its sublist
+        lengths without walking the entries before it.
+        """
+        return len(self._entries) - self._entries.index((value, name))
+
+    def at_rank(self, rank):
+        """Return the (name, value) pair at a 1-based position from the highest"""
+        value, name = self._entries[len(self._entries) - rank]
+        return name, value
+
+    def top(self, n):
+        """Return the n highest (name, value) pairs, highest first"""
+        start = max(len(self._entries) - n, 0)
+        return [
+            (name, value) for value, name in self._entries.islice(start, reverse=True)
+        ]
+
+    def bottom(self, n):
+        """Return the n lowest (name, value) pairs, lowest first"""
+        return [(name, value) for value, name in self._entries.islice(0, n)]
+
+    def greater_than(self, threshold):
+        """Return (name, value) pairs with value strictly above threshold"""
+        # Values are ints, so (threshold + 1,) sorts before any entry > threshold
+        start = self._entries.bisect_left((threshold + 1,))
+        return [(name, value) for value, name in self._entries.islice(start)]
+
+    def less_than(self, threshold):
+        """Return (name, value) pairs with value strictly below threshold"""
+        stop = self._entries.bisect_left((threshold,))
+        return [(name, value) for value, name in self._entries.islice(0, stop)]
+
+    def equal_to(self, value):
+        """Return (name, value) pairs holding exactly value"""
+        return [(name, value) for name in self._buckets.get(value, ())]
+
+    def check(self, counters):
+        """Rebuild the index from counters and compare"""
+        expected = sorted((value, name) for name, value in counters.items())
+        if list(self._entries) != expected:
+            raise AssertionError("value index does not match counters")
+        buckets = {}
+        for name, value in counters.items():
+            buckets.setdefault(value, set()).add(name)
+        if self._buckets != buckets:
+            raise AssertionError("value buckets do not match counters")
+
+
+class NameIndex:
+    """Keeps counter names sorted so paging by name avoids a full sort"""
+
+    def __init__(self):
+        self._names = SortedList()
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, name, value):
+        """Record a new counter"""
+        self._names.add(name)
+
+    def remove(self, name, value):
+        """Forget a counter"""
+        self._names.remove(name)
+
+    def update(self, name, old, new):
+        """Values do not affect name order"""
+
+    def clear(self):
+        """Forget every counter"""
+        self._names.clear()
+
+    def after(self, name, limit):
+        """Return up to limit names sorting after name (from the start if None)"""
+        if name is None:
+            return list(self._names.islice(0, limit))
+        names = self._names.irange(minimum=name, inclusive=(False, False))
+        return list(islice(names, limit))
+
+    def with_prefix(self, prefix, after=None, limit=None):
+        """Return up to limit names starting with prefix, sorting after `after`
+
+        Starts from the first candidate in the sorted names and stops at the
+        first name without the prefix, so the cost follows the matches.
+        """
+        if after is None or after < prefix:
+            names = self._names.irange(minimum=prefix)
+        else:
+            names = self._names.irange(minimum=after, inclusive=(False, False))
+        matching = takewhile(lambda name: name.startswith(prefix), names)
+        return list(islice(matching, limit))
+
+    def check(self, counters):
+        """Rebuild the index from counters and compare"""
+        if list(self._names) != sorted(counters):
+            raise AssertionError("name index does not match counters")
@@ -0,0 +1,297 @@
+"""
+Durable Counter State: Append-only Log plus Snapshots
+
+Every mutation is appended to the current log segment as the counter's
+resulting state (SET name value, DELETE name or CLEAR). Records are buffered
+and written with group commit: a front-end calls sync() before it
+acknowledges a request, and sync() returns once the request's records are
+fsynced. The first caller to find records unwritten writes and fsyncs
+every buffered record, while later callers wait for that fsync (or the
+next one) to cover theirs, so concurrent requests share one fsync.
+
+With group_commit=False, sync() returns at once and only a background
+thread writes the records, every flush_interval seconds. That is faster,
+but a crash loses up to flush_interval of acknowledged writes.
+
+A second thread periodically starts a new segment, copies the store and
+writes the copy as a compact binary snapshot; segments older than the
+snapshot are then deleted. Because records hold resulting values, replaying
+a record that the snapshot already reflects is harmless, which lets the
+copy be taken without pausing writers.
+
+Recovery loads the latest snapshot and replays only the segments after it.
+"""
+
+import os
+import struct
+import threading
+from src.backends import CounterRangeError, check_int64
+
+SNAPSHOT_MAGIC = b"CNTRSNP1"
+# magic, first log segment not covered by the snapshot, counter count
+SNAPSHOT_HEADER = struct.Struct("<8sQQ")
+# name length, value
+SNAPSHOT_ENTRY = struct.Struct("<Hq")
+# operation, name length, value
+RECORD = struct.Struct("<BHq")
+# Longest name, in UTF-8 bytes, that a record's length field holds
+MAX_NAME_BYTES = 2**16 - 1
+SET, DELETE, CLEAR = 1, 2, 3
+
+SNAPSHOT_FILE = "snapshot.bin"
+SEGMENT_PREFIX = "log."
+
+
+class CounterJournal:
+    """Write-ahead journal that makes a CounterStore survive restarts
+
+    Attach it to a store with attach(); it then observes every mutation, and
+    the store's `journal` is set to it. sync() waits until the mutations
+    made so far are on disk. Buffered records are also written every
+    flush_interval seconds, and a snapshot is taken every snapshot_interval
+    seconds when anything has changed.
+    """
+
+    def __init__(
+        self,
+        directory,
+        flush_interval=0.05,
+        snapshot_interval=300.0,
+        group_commit=True,
+    ):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.snapshot_interval = snapshot_interval
+        self.group_commit = group_commit
+        os.makedirs(directory, exist_ok=True)
+        # Guards the buffered records and the counts below
+        self._lock = threading.Lock()
+        # Notified whenever a flush ends
+        self._flushed = threading.Condition(self._lock)
+        # Guards the open segment; always taken before _lock
+        self._io_lock = threading.Lock()
+        self._pending = []
+        # Records appended so far, and how many of them are fsynced
+        self._appended = 0
+        self._durable = 0
+        self._flushing = False
+        self._since_snapshot = 0
+        self._segment = 0
+        self._file = None
+        self._store = None
+        self._stop = threading.Event()
+        self._threads = []
+
+    def check(self, name, value):
+        """Raise CounterRangeError unless a record can hold name and value"""
+        check_int64(value)
+        if len(name.encode()) > MAX_NAME_BYTES:
+            raise CounterRangeError(
+                f"Counter name must not exceed {MAX_NAME_BYTES} bytes"
+            )
+
+    # Observer interface, called by CounterStore with the stripe held
+
+    def add(self, name, value):
+        """Log a newly created counter"""
+        self._append(SET, name, value)
+
+    def update(self, name, old, new):
+        """Log a counter's new value"""
+        self._append(SET, name, new)
+
+    def remove(self, name, value):
+        """Log a deleted counter"""
+        self._append(DELETE, name, 0)
+
+    def clear(self):
+        """Log that every counter was deleted"""
+        self._append(CLEAR, "", 0)
+
+    def _append(self, operation, name, value):
+        encoded = name.encode()
+        record = RECORD.pack(operation, len(encoded), value) + encoded
+        with self._lock:
+            self._pending.append(record)
+            self._appended += 1
+            self._since_snapshot += 1
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{segment:012d}")
+
+    def _segments(self):
+        """Return the numbers of the log segments on disk, oldest first"""
+        return sorted(
+            int(entry[len(SEGMENT_PREFIX) :])
+            for entry in os.listdir(self.directory)
+            if entry.startswith(SEGMENT_PREFIX)
+        )
+
+    def attach(self, store):
+        """Recover store from disk, then journal its mutations from now on"""
+        self._store = store
+        first = self.recover(store)
+        segments = self._segments()
+        self._segment = max(segments[-1] if segments else 0, first) + 1
+        self._file = open(self._segment_path(self._segment), "ab")
+        store.observers.append(self)
+        store.journal = self
+        for target, interval in (
+            (self.flush, self.flush_interval),
+            (self._snapshot_if_changed, self.snapshot_interval),
+        ):
+            thread = threading.Thread(
+                target=self._every, args=(interval, target), daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def _every(self, interval, target):
+        while not self._stop.wait(interval):
+            target()
+
+    def flush(self):
+        """Write buffered records and fsync them as one group"""
+        with self._io_lock:
+            self._write_pending()
+
+    def _write_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+            written = self._appended
+        if pending:
+            self._file.write(b"".join(pending))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        with self._lock:
+            self._durable = max(self._durable, written)
+
+    def sync(self):
+        """Return once every record appended before the call is fsynced
+
+        Without group_commit, return at once and leave the records to the
+        background flush.
+        """
+        if not self.group_commit:
+            return
+        with self._lock:
+            target = self._appended
+            while self._durable < target:
+                if self._flushing:
+                    # Another caller's fsync may cover these records too
+                    self._flushed.wait()
+                    continue
+                self._flushing = True
+                self._lock.release()
+                try:
+                    self.flush()
+                finally:
+                    self._lock.acquire()
+                    self._flushing = False
+                    self._flushed.notify_all()
+
+    def _rotate(self):
+        """Finish the current segment and start the next; return its number"""
+        with self._io_lock:
+            self._write_pending()
+            self._file.close()
+            self._segment += 1
+            self._file = open(self._segment_path(self._segment), "ab")
+            with self._lock:
+                self._since_snapshot = 0
+            return self._segment
+
+    def _snapshot_if_changed(self):
+        if self._since_snapshot:
+            self.snapshot()
+
+    def snapshot(self):
+        """Write a snapshot of the store and drop the log it replaces"""
+        segment = self._rotate()
+        # Taken after the rotation, so it reflects every record in older
+        # segments; newer records are replayed on top of it
+        counters = self._store.items()
+        parts = [SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, segment, len(counters))]
+        for name, value in counters.items():
+            encoded = name.encode()
+            parts.append(SNAPSHOT_ENTRY.pack(len(encoded), value) + encoded)
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        with open(path + ".tmp", "wb") as snapshot:
+            snapshot.write(b"".join(parts))
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(path + ".tmp", path)
+        self._fsync_directory()
+        for old in self._segments():
+            if old < segment:
+                os.remove(self._segment_path(old))
+
+    def _fsync_directory(self):
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def recover(self, store):
+        """Load the snapshot and replay later segments into store
+
+        Returns the first segment number the snapshot does not cover.
+        """
+        first = self._load_snapshot(store)
+        for segment in self._segments():
+            if segment >= first:
+                self._replay(self._segment_path(segment), store)
+        return first
+
+    def _load_snapshot(self, store):
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return 0
+        with open(path, "rb") as snapshot:
+            data = snapshot.read()
+        magic, segment, count = SNAPSHOT_HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a counter snapshot")
+        offset = SNAPSHOT_HEADER.size
+        for _ in range(count):
+            length, value = SNAPSHOT_ENTRY.unpack_from(data, offset)
+            offset += SNAPSHOT_ENTRY.size
+            store.create(data[offset : offset + length].decode(), value)
+            offset += length
+        return segment
+
+    def _replay(self, path, store):
+        with open(path, "rb") as segment:
+            data = segment.read()
+        offset = 0
+        while offset + RECORD.size <= len(data):
+            operation, length, value = RECORD.unpack_from(data, offset)
+            end = offset + RECORD.size + length
+            if end > len(data):
+                # Torn write from a crash mid-flush; nothing after it was
+                # acknowledged as durable
+                break
+            name = data[offset + RECORD.size : end].decode()
+            offset = end
+            if operation == SET:
+                if not store.create(name, value):
+                    store.set(name, value)
+            elif operation == DELETE:
+                store.delete(name)
+            elif operation == CLEAR:
+                store.clear()
+
+    def close(self):
+        """Stop the background threads and flush what is buffered"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        if self._store is not None and self in self._store.observers:
+            self._store.observers.remove(self)
+            self._store.journal = None
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
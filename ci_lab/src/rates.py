@@ -0,0 +1,184 @@
+"""
+Sliding-window Increment Rates
+
+Each counter that has been incremented gets two small rings of time
+buckets: 1-second buckets for windows up to a minute and 1-minute buckets
+for windows up to an hour. Recording an increment adds to the current
+bucket of each ring, first zeroing any buckets the clock has moved past,
+so the cost is O(1) amortized and the memory per counter is fixed. A
+window's count sums the buckets it covers, prorating the oldest one it
+only partly overlaps.
+"""
+
+import heapq
+import math
+import threading
+import time
+from array import array
+
+# One bucket more than a full window, for the partly covered oldest one
+RING_SIZE = 61
+# (bucket width in seconds, ring size), finest first
+RESOLUTIONS = ((1.0, RING_SIZE), (60.0, RING_SIZE))
+MAX_WINDOW = 3600
+# Rings kept before the first sweep for idle ones
+SWEEP_MINIMUM = 1024
+# Range of an array("q") bucket; counts saturate at its ends
+BUCKET_MIN, BUCKET_MAX = -(2**63), 2**63 - 1
+
+
+class Ring:
+    """Fixed-size ring of event counts per time bucket"""
+
+    __slots__ = ("width", "buckets", "last")
+
+    def __init__(self, width, size):
+        self.width = width
+        self.buckets = array("q", bytes(8 * size))
+        # Number of the newest bucket written, counting from the clock's zero
+        self.last = None
+
+    def add(self, now, delta):
+        """Count delta events at time now"""
+        bucket, size = math.floor(now / self.width), len(self.buckets)
+        if self.last is None or bucket - self.last >= size:
+            self.buckets = array("q", bytes(8 * size))
+            self.last = bucket
+        while self.last < bucket:
+            self.last += 1
+            self.buckets[self.last % size] = 0
+        slot = bucket % size
+        # Saturate: the store has already applied the increment, so
+        # counting it must not fail however large delta is
+        total = self.buckets[slot] + delta
+        self.buckets[slot] = min(max(total, BUCKET_MIN), BUCKET_MAX)
+
+    def count(self, start, now):
+        """Estimate the events in (start, now]"""
+        if self.last is None:
+            return 0.0
+        size = len(self.buckets)
+        first = math.floor(start / self.width)
+        newest = min(math.floor(now / self.width), self.last)
+        total = 0.0
+        for bucket in range(max(first, self.last - size + 1), newest + 1):
+            events = self.buckets[bucket % size]
+            if bucket == first:
+                # Only the part of the oldest bucket after start is in the window
+                events *= ((first + 1) * self.width - start) / self.width
+            total += events
+        return total
+
+    def idle(self, now):
+        """Whether every bucket is older than the ring reaches back"""
+        if self.last is None:
+            return True
+        return math.floor(now / self.width) - self.last >= len(self.buckets)
+
+
+class RateShard:
+    """The rings of the counters in one stripe of names, behind its own lock"""
+
+    def __init__(self):
+        # name -> one Ring per entry of RESOLUTIONS
+        self.rings = {}
+        # Sweep idle rings when there are this many, then at twice as many
+        # as survive, so sweeping stays O(1) amortized per new ring
+        self.sweep_at = SWEEP_MINIMUM
+        self.lock = threading.Lock()
+
+    def drop_idle(self, now):
+        """Forget counters with no increments within the longest window"""
+        idle = [name for name, rings in self.rings.items() if rings[-1].idle(now)]
+        for name in idle:
+            del self.rings[name]
+
+
+class CounterRates:
+    """Increments per counter over sliding windows of up to an hour
+
+    An observer of the store for deletes and clears, so the rings of
+    removed counters go with them; increments are reported with record().
+    Names are split into `stripes` shards, each with its own lock, so
+    increments to different counters need not wait for one another.
+    """
+
+    def __init__(self, clock=time.monotonic, stripes=1):
+        self.clock = clock
+        self._shards = [RateShard() for _ in range(stripes)]
+
+    def _shard(self, name):
+        return self._shards[hash(name) % len(self._shards)]
+
+    @property
+    def rings(self):
+        """A copy of every counter's rings, by name"""
+        rings = {}
+        for shard in self._shards:
+            with shard.lock:
+                rings.update(shard.rings)
+        return rings
+
+    def record(self, name, delta=1):
+        """Count an increment of delta to name"""
+        shard = self._shard(name)
+        with shard.lock:
+            now = self.clock()
+            rings = shard.rings.get(name)
+            if rings is None:
+                rings = shard.rings[name] = [Ring(*spec) for spec in RESOLUTIONS]
+                if len(shard.rings) >= shard.sweep_at:
+                    shard.drop_idle(now)
+                    shard.sweep_at = max(SWEEP_MINIMUM, 2 * len(shard.rings))
+            for ring in rings:
+                ring.add(now, delta)
+
+    def _count(self, rings, window, now):
+        # The finest ring that reaches back far enough
+        for ring in rings:
+            if window <= ring.width * (len(ring.buckets) - 1):
+                return ring.count(now - window, now)
+        raise ValueError(f"window cannot exceed {MAX_WINDOW} seconds")
+
+    def count(self, name, window):
+        """Return the estimated increments to name in the last window seconds"""
+        now = self.clock()
+        shard = self._shard(name)
+        with shard.lock:
+            rings = shard.rings.get(name)
+            return 0.0 if rings is None else self._count(rings, window, now)
+
+    def top(self, n, window):
+        """Return the n (name, increments) pairs with the most recent increments
+
+        Scans only counters that have been incremented, and drops the rings
+        of those idle for longer than the longest window on the way.
+        """
+        now = self.clock()
+        counts = []
+        for shard in self._shards:
+            with shard.lock:
+                shard.drop_idle(now)
+                counts.extend(
+                    (self._count(rings, window, now), name)
+                    for name, rings in shard.rings.items()
+                )
+        return [(name, count) for count, name in heapq.nlargest(n, counts) if count > 0]
+
+    def add(self, name, value):
+        """New counters have no increments yet"""
+
+    def update(self, name, old, new):
+        """Increments are reported through record()"""
+
+    def remove(self, name, value):
+        """Forget a deleted counter's rings"""
+        shard = self._shard(name)
+        with shard.lock:
+            shard.rings.pop(name, None)
+
+    def clear(self):
+        """Forget every ring"""
+        for shard in self._shards:
+            with shard.lock:
+                shard.rings.clear()
@@ -0,0 +1,296 @@
+"""
+Cross-process Shared Counter Store
+
+A fixed-size open-addressing hash table of name -> int64 kept in a
+memory-mapped file, so every worker process on a host (e.g. gunicorn
+pre-fork workers pointed at a file under /dev/shm) shares one namespace.
+
+The table is split into stripes. A name hashes to one stripe and probes
+only inside it, so a stripe's lock covers every slot an operation can
+touch. The geometry is fixed when the file is created: a table holds at
+most stripes * slots_per_stripe counters, and a stripe can fill up before
+the table does. Each stripe is guarded by a thread lock (within a process) and an
+fcntl byte-range lock (across processes), making increments atomic.
+"""
+
+import mmap
+import os
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+from src.backends import CounterBackend, check_int64
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+MAGIC = b"CNTRSHM2"
+# magic, stripes, slots per stripe
+HEADER = struct.Struct("<8sII")
+# live counters and the sum of their values as low and high 64-bit words,
+# per stripe: wide enough for any number of int64 counters
+STRIPE_HEADER = struct.Struct("<qQq")
+SUM_WORD = 2**64
+# state, name length, name, value
+SLOT = struct.Struct("<BB62sq")
+NAME_LIMIT = 62
+EMPTY, USED, DELETED = 0, 1, 2
+
+DEFAULT_STRIPES = 64
+DEFAULT_SLOTS_PER_STRIPE = 1024
+
+
+class SharedTableError(Exception):
+    """Raised when a counter cannot be stored in the shared table"""
+
+
+class SharedCounterStore(CounterBackend):
+    """Counter store backed by a shared memory-mapped hash table
+
+    Point operations and the count/total aggregates are O(1); ordered and
+    range queries use the CounterBackend scans, since any process may have
+    changed the table since the last call.
+    """
+
+    def __init__(
+        self, path, stripes=DEFAULT_STRIPES, slots_per_stripe=DEFAULT_SLOTS_PER_STRIPE
+    ):
+        if fcntl is None:  # pragma: no cover
+            raise SharedTableError("Shared counter tables need fcntl (POSIX only)")
+        self.path = path
+        self.stripes = stripes
+        self.slots_per_stripe = slots_per_stripe
+        self._pid = None
+        self._attach()
+
+    def _attach(self):
+        """Open and map the table in this process, creating it if needed"""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(fd, fcntl.LOCK_EX, 1, 0)
+        try:
+            if os.fstat(fd).st_size == 0:
+                os.ftruncate(fd, self._size())
+                os.pwrite(
+                    fd,
+                    HEADER.pack(MAGIC, self.stripes, self.slots_per_stripe),
+                    0,
+                )
+            else:
+                magic, stripes, slots = HEADER.unpack(os.pread(fd, HEADER.size, 0))
+                if magic != MAGIC:
+                    raise SharedTableError(f"{self.path} is not a counter table")
+                # An existing table keeps the geometry it was created with
+                self.stripes, self.slots_per_stripe = stripes, slots
+            self._mm = mmap.mmap(fd, self._size())
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN, 1, 0)
+        self._fd = fd
+        self._locks = [threading.Lock() for _ in range(self.stripes)]
+        self._pid = os.getpid()
+
+    def _size(self):
+        return (
+            HEADER.size
+            + self.stripes * STRIPE_HEADER.size
+            + self.stripes * self.slots_per_stripe * SLOT.size
+        )
+
+    def close(self):
+        """Unmap the table; the file and its counters stay in place"""
+        self._mm.close()
+        os.close(self._fd)
+        self._pid = None
+
+    @contextmanager
+    def _locked(self, stripe):
+        """Hold one stripe against other threads and other processes"""
+        if self._pid != os.getpid():
+            # Forked after attaching: locks and fd state are per process
+            self._attach()
+        with self._locks[stripe]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, 1 + stripe)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, 1 + stripe)
+
+    def _stripe_of(self, encoded):
+        # Python's hash() differs between processes, crc32 does not
+        return zlib.crc32(encoded) % self.stripes
+
+    def _stripe_header(self, stripe):
+        return HEADER.size + stripe * STRIPE_HEADER.size
+
+    def _slot_offset(self, stripe, slot):
+        return (
+            HEADER.size
+            + self.stripes * STRIPE_HEADER.size
+            + (stripe * self.slots_per_stripe + slot) * SLOT.size
+        )
+
+    def _read_stripe_header(self, stripe):
+        """Return a stripe's (count, sum)"""
+        count, low, high = STRIPE_HEADER.unpack_from(
+            self._mm, self._stripe_header(stripe)
+        )
+        return count, high * SUM_WORD + low
+
+    def _write_stripe_header(self, stripe, count, total):
+        high, low = divmod(total, SUM_WORD)
+        STRIPE_HEADER.pack_into(self._mm, self._stripe_header(stripe), count, low, high)
+
+    def _adjust(self, stripe, count, total):
+        """Update a stripe's count and sum"""
+        old_count, old_total = self._read_stripe_header(stripe)
+        self._write_stripe_header(stripe, old_count + count, old_total + total)
+
+    def _find(self, stripe, encoded):
+        """Return (offset of name's slot or None, first reusable slot or None)"""
+        home = (zlib.crc32(encoded) // self.stripes) % self.slots_per_stripe
+        free = None
+        for probe in range(self.slots_per_stripe):
+            offset = self._slot_offset(stripe, (home + probe) % self.slots_per_stripe)
+            state, length, name, _ = SLOT.unpack_from(self._mm, offset)
+            if state == EMPTY:
+                return None, free if free is not None else offset
+            if state == DELETED:
+                if free is None:
+                    free = offset
+            elif name[:length] == encoded:
+                return offset, None
+        return None, free
+
+    def _encode(self, name):
+        """Return name as bytes, or None if it is too long to be stored"""
+        encoded = name.encode()
+        return encoded if len(encoded) <= NAME_LIMIT else None
+
+    def _read(self, offset):
+        return SLOT.unpack_from(self._mm, offset)[3]
+
+    def _write(self, offset, value):
+        struct.pack_into("<q", self._mm, offset + SLOT.size - 8, value)
+
+    def __len__(self):
+        return sum(count for count, _ in self._stripe_totals())
+
+    def _stripe_totals(self):
+        for stripe in range(self.stripes):
+            with self._locked(stripe):
+                yield self._read_stripe_header(stripe)
+
+    def get(self, name):
+        """Return a counter's value, or None if it does not exist"""
+        encoded = self._encode(name)
+        if encoded is None:
+            return None
+        stripe = self._stripe_of(encoded)
+        with self._locked(stripe):
+            offset, _ = self._find(stripe, encoded)
+            return None if offset is None else self._read(offset)
+
+    def create(self, name, value=0):
+        """Create a counter; return False if it already exists"""
+        encoded = self._encode(name)
+        if encoded is None:
+            raise SharedTableError(
+                f"Counter names are limited to {NAME_LIMIT} bytes in shared tables"
+            )
+        stripe = self._stripe_of(encoded)
+        with self._locked(stripe):
+            offset, free = self._find(stripe, encoded)
+            if offset is not None:
+                return False
+            if free is None:
+                raise SharedTableError("Shared counter table is full")
+            check_int64(value)
+            self._adjust(stripe, 1, value)
+            SLOT.pack_into(self._mm, free, USED, len(encoded), encoded, value)
+        return True
+
+    def increment(self, name, delta=1):
+        """Add delta to a counter; return the new value, or None if missing"""
+        encoded = self._encode(name)
+        if encoded is None:
+            return None
+        stripe = self._stripe_of(encoded)
+        with self._locked(stripe):
+            offset, _ = self._find(stripe, encoded)
+            if offset is None:
+                return None
+            value = check_int64(self._read(offset) + delta)
+            self._adjust(stripe, 0, delta)
+            self._write(offset, value)
+        return value
+
+    def set(self, name, value):
+        """Set a counter's value; return it, or None if the counter is missing"""
+        encoded = self._encode(name)
+        if encoded is None:
+            return None
+        stripe = self._stripe_of(encoded)
+        with self._locked(stripe):
+            offset, _ = self._find(stripe, encoded)
+            if offset is None:
+                return None
+            check_int64(value)
+            self._adjust(stripe, 0, value - self._read(offset))
+            self._write(offset, value)
+        return value
+
+    def delete(self, name):
+        """Delete a counter; return its last value, or None if missing"""
+        encoded = self._encode(name)
+        if encoded is None:
+            return None
+        stripe = self._stripe_of(encoded)
+        with self._locked(stripe):
+            offset, _ = self._find(stripe, encoded)
+            if offset is None:
+                return None
+            value = self._read(offset)
+            SLOT.pack_into(self._mm, offset, DELETED, 0, b"", 0)
+            self._adjust(stripe, -1, -value)
+        return value
+
+    def clear(self):
+        """Delete every counter"""
+        for stripe in range(self.stripes):
+            with self._locked(stripe):
+                start = self._slot_offset(stripe, 0)
+                end = self._slot_offset(stripe, self.slots_per_stripe)
+                self._mm[start:end] = bytes(end - start)
+                self._write_stripe_header(stripe, 0, 0)
+
+    def _scan_stripe(self, stripe):
+        for slot in range(self.slots_per_stripe):
+            state, length, name, value = SLOT.unpack_from(
+                self._mm, self._slot_offset(stripe, slot)
+            )
+            if state == USED:
+                yield name[:length].decode(), value
+
+    def items(self):
+        """Return a copy of every counter, each stripe read atomically"""
+        counters = {}
+        for stripe in range(self.stripes):
+            with self._locked(stripe):
+                counters.update(self._scan_stripe(stripe))
+        return counters
+
+    def total(self):
+        """Return the sum of all counter values"""
+        return sum(total for _, total in self._stripe_totals())
+
+    def check(self):
+        """Raise AssertionError if a stripe header disagrees with its slots"""
+        for stripe in range(self.stripes):
+            with self._locked(stripe):
+                values = [value for _, value in self._scan_stripe(stripe)]
+                header = self._read_stripe_header(stripe)
+                if header != (len(values), sum(values)):
+                    raise AssertionError(
+                        f"stripe {stripe} header {header} does not match its slots"
+                    )
@@ -0,0 +1,100 @@
+"""
+Approximate Heavy Hitters with Bounded Memory
+
+Space-Saving (Metwally, Agrawal and El Abbadi, 2005) monitors at most
+`capacity` names. A name that is not monitored takes over the slot of the
+lowest count, inheriting that count as its possible overestimate. With N
+the total of all increments, for every name:
+
+    count - error <= true count <= count,    error <= N / capacity
+
+and any name whose true count exceeds N / capacity is always monitored,
+so the top of the summary holds the heavy hitters.
+"""
+
+import threading
+from src.index import CounterIndex
+
+DEFAULT_CAPACITY = 10_000
+
+
+class SpaceSaving:
+    """Top-k and point estimates over a stream of increments"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.total = 0
+        # name -> estimated count (an upper bound on the true count)
+        self.counts = {}
+        # name -> overestimate inherited when the name took its slot
+        self.errors = {}
+        self.index = CounterIndex()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.counts)
+
+    def increment(self, name, delta=1):
+        """Count delta more occurrences of name; return (count, error)"""
+        if delta < 0:
+            raise ValueError("delta cannot be negative")
+        with self._lock:
+            self.total += delta
+            count = self.counts.get(name)
+            if count is not None:
+                self.counts[name] = count + delta
+                self.index.update(name, count, count + delta)
+                return count + delta, self.errors[name]
+            error = 0
+            if len(self.counts) >= self.capacity:
+                # Evict the lowest count; the newcomer may have had that many
+                ((victim, error),) = self.index.bottom(1)
+                self.index.remove(victim, error)
+                del self.counts[victim], self.errors[victim]
+            self.counts[name] = error + delta
+            self.errors[name] = error
+            self.index.add(name, error + delta)
+            return error + delta, error
+
+    def estimate(self, name):
+        """Return (count, error): the true count is in [count - error, count]"""
+        with self._lock:
+            count = self.counts.get(name)
+            if count is not None:
+                return count, self.errors[name]
+            # Unmonitored: seen at most as often as the smallest count
+            floor = self.min_count()
+            return floor, floor
+
+    def min_count(self):
+        """Return the most any unmonitored name can have been counted"""
+        if len(self.counts) < self.capacity:
+            return 0
+        return self.index.min_value()
+
+    def top(self, n):
+        """Return the n highest (name, count, error) triples, highest first"""
+        with self._lock:
+            return [
+                (name, count, self.errors[name]) for name, count in self.index.top(n)
+            ]
+
+    def summary(self):
+        """Return capacity, monitored names, stream total and the error bound"""
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "monitored": len(self.counts),
+                "total": self.total,
+                "max_error": self.min_count(),
+            }
+
+    def clear(self):
+        """Forget every count"""
+        with self._lock:
+            self.total = 0
+            self.counts.clear()
+            self.errors.clear()
+            self.index.clear()
@@ -0,0 +1,136 @@
+"""
+Consistent Snapshots of the Counters
+
+A snapshot is one point-in-time copy of every counter that later reads
+(paging, top-N, aggregates) run against, so a sequence of them all sees
+the same state while writers carry on. The copy comes from the store's
+items(); for the indexed and dict stores that is one dict copy, atomic
+under the GIL, that takes none of their locks. Copies are only made when
+something changed: a snapshot of a store whose version is the same as an
+open snapshot's shares that snapshot's copy. The sorted name order and
+the aggregates are built on first use and kept with the snapshot.
+
+Snapshots expire after `ttl` seconds without a read, and at most `limit`
+are kept, the least recently read going first.
+"""
+
+import bisect
+import heapq
+import os
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL = 60.0
+DEFAULT_LIMIT = 16
+
+
+class Snapshot:
+    """An immutable view of every counter at one moment"""
+
+    def __init__(self, counters, version=None):
+        # Never modified after this point
+        self.counters = counters
+        self.version = version
+        self._names = None
+        self._summary = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.counters)
+
+    def names(self):
+        """Return every name in order, sorting them on first use"""
+        with self._lock:
+            if self._names is None:
+                self._names = sorted(self.counters)
+            return self._names
+
+    def page(self, after, limit):
+        """Return up to limit (name, value) pairs named after `after`, in order"""
+        names = self.names()
+        start = 0 if after is None else bisect.bisect_right(names, after)
+        return [(name, self.counters[name]) for name in names[start : start + limit]]
+
+    def top(self, n):
+        """Return the n highest (name, value) pairs, highest first"""
+        entries = ((value, name) for name, value in self.counters.items())
+        return [(name, value) for value, name in heapq.nlargest(n, entries)]
+
+    def summary(self):
+        """Return count, total, min, max and mean of the counter values"""
+        with self._lock:
+            if self._summary is None:
+                values = self.counters.values()
+                count, total = len(values), sum(values)
+                self._summary = {
+                    "count": count,
+                    "total": total,
+                    "min": min(values, default=None),
+                    "max": max(values, default=None),
+                    "mean": total / count if count else None,
+                }
+            return self._summary
+
+
+class SnapshotRegistry:
+    """Open snapshots by id, expired by idle time and bounded in number"""
+
+    def __init__(self, ttl=DEFAULT_TTL, limit=DEFAULT_LIMIT, clock=time.monotonic):
+        self.ttl = ttl
+        self.limit = limit
+        self.clock = clock
+        # id -> (snapshot, time of its last read), least recently read first
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._open)
+
+    def _expire(self, now):
+        while self._open:
+            snapshot_id, (_, used) = next(iter(self._open.items()))
+            if now - used < self.ttl and len(self._open) <= self.limit:
+                return
+            del self._open[snapshot_id]
+
+    def create(self, store):
+        """Take a snapshot of store; return (id, snapshot)"""
+        # Read the version before copying, so a reused copy is never older
+        # than the store was when the version was read
+        version = store.versions.version if store.versions is not None else None
+        snapshot = None
+        if version is not None:
+            with self._lock:
+                for opened, _ in self._open.values():
+                    if opened.version == version:
+                        snapshot = opened
+        if snapshot is None:
+            snapshot = Snapshot(store.items(), version)
+        snapshot_id = os.urandom(8).hex()
+        with self._lock:
+            now = self.clock()
+            self._open[snapshot_id] = (snapshot, now)
+            self._expire(now)
+        return snapshot_id, snapshot
+
+    def get(self, snapshot_id):
+        """Return an open snapshot and keep it open, or None if expired"""
+        with self._lock:
+            now = self.clock()
+            self._expire(now)
+            entry = self._open.pop(snapshot_id, None)
+            if entry is None:
+                return None
+            self._open[snapshot_id] = (entry[0], now)
+            return entry[0]
+
+    def release(self, snapshot_id):
+        """Drop a snapshot; return whether it was open"""
+        with self._lock:
+            return self._open.pop(snapshot_id, None) is not None
+
+    def clear(self):
+        """Drop every snapshot"""
+        with self._lock:
+            self._open.clear()
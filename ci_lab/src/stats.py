@@ -0,0 +1,117 @@
+"""
+Running Aggregates over Counter Values
+"""
+
+import math
+
+
+def rank(q, count):
+    """Index of the q-quantile in count sorted values (nearest rank)"""
+    return min(max(math.ceil(q * count) - 1, 0), count - 1)
+
+
+def log_bucket(value):
+    """Bucket number of a value: 0 for 0, k for 2**(k-1) <= |value| < 2**k
+
+    Negative values get negative bucket numbers.
+    """
+    bucket = abs(value).bit_length()
+    return -bucket if value < 0 else bucket
+
+
+def bucket_bounds(bucket):
+    """Return the (lower, upper) values, inclusive, held by a bucket"""
+    if bucket == 0:
+        return 0, 0
+    low, high = 1 << (abs(bucket) - 1), (1 << abs(bucket)) - 1
+    return (low, high) if bucket > 0 else (-high, -low)
+
+
+class CounterStats:
+    """Count and sum of all counter values, updated on every mutation"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+
+    def add(self, name, value):
+        """Account for a new counter"""
+        self.count += 1
+        self.total += value
+
+    def remove(self, name, value):
+        """Account for a removed counter"""
+        self.count -= 1
+        self.total -= value
+
+    def update(self, name, old, new):
+        """Account for a counter changing value"""
+        self.total += new - old
+
+    def clear(self):
+        """Forget every counter"""
+        self.count = 0
+        self.total = 0
+
+    def mean(self):
+        """Return the mean counter value, or None with no counters"""
+        return self.total / self.count if self.count else None
+
+    def check(self, counters):
+        """Recompute the aggregates from counters and compare"""
+        expected = (len(counters), sum(counters.values()))
+        if (self.count, self.total) != expected:
+            raise AssertionError(
+                f"stats (count, total) {(self.count, self.total)} != {expected}"
+            )
+
+
+class ValueHistogram:
+    """Counters per power-of-two range of values, updated on every mutation"""
+
+    def __init__(self):
+        # bucket number (see log_bucket) -> counters whose value falls in it
+        self.counts = {}
+
+    def _move(self, value, step):
+        bucket = log_bucket(value)
+        count = self.counts.get(bucket, 0) + step
+        if count:
+            self.counts[bucket] = count
+        else:
+            del self.counts[bucket]
+
+    def add(self, name, value):
+        """Account for a new counter"""
+        self._move(value, 1)
+
+    def remove(self, name, value):
+        """Account for a removed counter"""
+        self._move(value, -1)
+
+    def update(self, name, old, new):
+        """Move a counter to the bucket of its new value"""
+        if log_bucket(old) != log_bucket(new):
+            self._move(old, -1)
+            self._move(new, 1)
+
+    def clear(self):
+        """Forget every counter"""
+        self.counts.clear()
+
+    def buckets(self):
+        """Return the non-empty buckets, lowest first, with their bounds"""
+        return [
+            dict(zip(("lower", "upper"), bucket_bounds(bucket)), count=count)
+            for bucket, count in sorted(self.counts.items())
+        ]
+
+    def check(self, counters):
+        """Rebuild the histogram from counters and compare"""
+        expected = ValueHistogram()
+        for name, value in counters.items():
+            expected.add(name, value)
+        if self.counts != expected.counts:
+            raise AssertionError(
+                f"histogram {self.counts} does not match counters {expected.counts}"
+            )
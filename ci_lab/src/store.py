@@ -0,0 +1,328 @@
+"""
+Thread-safe Counter Store
+"""
+
+import threading
+from collections import deque
+from contextlib import contextmanager
+from src.backends import CounterBackend, notify, page_through
+from src.index import CounterIndex, NameIndex
+from src.events import CounterEvents
+from src.expiry import CounterExpiry
+from src.rates import CounterRates
+from src.stats import CounterStats, ValueHistogram, rank
+from src.versions import CounterVersions
+
+DEFAULT_STRIPES = 64
+# Queued changes at which a writer applies the queue itself, if no one else is
+DRAIN_AT = 4096
+
+
+class CounterStore(CounterBackend):
+    """Counter values plus their derived structures, safe for threaded servers
+
+    Each name hashes to one of a fixed set of lock stripes, and a write
+    takes only its name's stripe. It does not update the shared indexes and
+    aggregates itself: it queues the change, and the next reader of them
+    applies every queued change under the derived lock before answering, so
+    writes to different stripes never wait for one another or for readers.
+    A reader still sees every write that finished before it started.
+    """
+
+    def __init__(self, stripes=DEFAULT_STRIPES, rates=True):
+        self.values = {}
+        self.index = CounterIndex()
+        self.names = NameIndex()
+        self.stats = CounterStats()
+        self.histogram = ValueHistogram()
+        # Structures derived from values, updated by every mutation
+        self.derived = (self.index, self.names, self.stats, self.histogram)
+        # Objects with the same add/remove/update/clear interface that are
+        # told about every mutation in order, e.g. a CounterJournal
+        self.versions = CounterVersions(stripes=stripes)
+        self.expiry = CounterExpiry()
+        self.events = CounterEvents()
+        self.observers = [self.versions, self.expiry, self.events]
+        if rates:
+            self.rates = CounterRates(stripes=stripes)
+            self.observers.append(self.rates)
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+        self._derived_lock = threading.Lock()
+        # (name, old, new) changes not yet applied to the derived structures,
+        # queued in order for each name as they are made under its stripe
+        self._pending = deque()
+
+    def __len__(self):
+        return len(self.values)
+
+    def __contains__(self, name):
+        return name in self.values
+
+    def _stripe(self, name):
+        return self._stripes[hash(name) % len(self._stripes)]
+
+    @contextmanager
+    def _exclusive(self):
+        """Hold every stripe, then the derived lock, with nothing left queued"""
+        for stripe in self._stripes:
+            stripe.acquire()
+        try:
+            with self._current():
+                yield
+        finally:
+            for stripe in self._stripes:
+                stripe.release()
+
+    @contextmanager
+    def _current(self):
+        """Hold the derived lock with every queued change applied"""
+        with self._derived_lock:
+            self._drain()
+            yield
+
+    def _drain(self):
+        """Apply the queued changes to the derived structures, oldest first
+
+        Called holding the derived lock. Takes only the changes queued when
+        it starts, so writers cannot keep it going.
+        """
+        pending = self._pending
+        for _ in range(len(pending)):
+            name, old, new = pending.popleft()
+            for derived in self.derived:
+                notify(derived, name, old, new)
+
+    def _apply(self, name, old, new):
+        """Queue one change for the derived structures and push it to observers
+
+        Called with the name's stripe held, so the queue and the observers
+        see the changes to any one counter in the order they were made.
+        """
+        self._pending.append((name, old, new))
+        if len(self._pending) >= DRAIN_AT and self._derived_lock.acquire(False):
+            # Bound the queue when nothing reads; skip it if a reader is at it
+            try:
+                self._drain()
+            finally:
+                self._derived_lock.release()
+        for observer in self.observers:
+            notify(observer, name, old, new)
+
+    def get(self, name):
+        """Return a counter's value, or None if it does not exist"""
+        return self.values.get(name)
+
+    def create(self, name, value=0):
+        """Create a counter; return False if it already exists"""
+        self._check_journaled(name, value)
+        with self._stripe(name):
+            if name in self.values:
+                return False
+            self.values[name] = value
+            self._apply(name, None, value)
+        return True
+
+    def increment(self, name, delta=1):
+        """Add delta to a counter; return the new value, or None if missing"""
+        with self._stripe(name):
+            old = self.values.get(name)
+            if old is None:
+                return None
+            new = old + delta
+            self._check_journaled(name, new)
+            self.values[name] = new
+            self._apply(name, old, new)
+        return new
+
+    def set(self, name, value):
+        """Set a counter's value; return it, or None if the counter is missing"""
+        self._check_journaled(name, value)
+        with self._stripe(name):
+            old = self.values.get(name)
+            if old is None:
+                return None
+            self.values[name] = value
+            self._apply(name, old, value)
+        return value
+
+    def delete(self, name):
+        """Delete a counter; return its last value, or None if missing"""
+        with self._stripe(name):
+            old = self.values.pop(name, None)
+            if old is not None:
+                self._apply(name, old, None)
+        return old
+
+    def clear(self):
+        """Delete every counter"""
+        with self._exclusive():
+            self.values.clear()
+            for derived in self.derived:
+                derived.clear()
+            for observer in self.observers:
+                observer.clear()
+
+    def items(self):
+        """Return a point-in-time copy of every counter"""
+        return self.values.copy()
+
+    def page(self, after, limit):
+        """Return up to limit (name, value) pairs named after `after`, in order"""
+        with self._current():
+            names = self.names.after(after, limit)
+        return self._with_values(names)
+
+    def scan(self, after, chunk):
+        """Yield every (name, value) pair named after `after`, in name order"""
+        return page_through(self, after, chunk)
+
+    def _with_values(self, names):
+        """Pair names with their values, skipping any deleted since listed"""
+        pairs = []
+        for name in names:
+            value = self.values.get(name)
+            if value is not None:
+                pairs.append((name, value))
+        return pairs
+
+    def prefix(self, prefix, after, limit):
+        """Return up to limit (name, value) pairs whose name starts with prefix"""
+        with self._current():
+            names = self.names.with_prefix(prefix, after, limit)
+        return self._with_values(names)
+
+    def prefix_summary(self, prefix):
+        """Return the count and total of counters whose name starts with prefix"""
+        with self._current():
+            names = self.names.with_prefix(prefix)
+        values = [value for _, value in self._with_values(names)]
+        return {"count": len(values), "total": sum(values)}
+
+    def top(self, n):
+        """Return the n highest (name, value) pairs"""
+        with self._current():
+            return self.index.top(n)
+
+    def bottom(self, n):
+        """Return the n lowest (name, value) pairs"""
+        with self._current():
+            return self.index.bottom(n)
+
+    def rank(self, name):
+        """Return a counter's 1-based position from the highest, or None"""
+        # The stripe keeps the value and its index entry in step
+        with self._stripe(name):
+            value = self.values.get(name)
+            if value is None:
+                return None
+            with self._current():
+                return self.index.rank(name, value)
+
+    def at_rank(self, rank):
+        """Return the (name, value) pair at a 1-based rank, or None"""
+        with self._current():
+            if not 1 <= rank <= len(self.index):
+                return None
+            return self.index.at_rank(rank)
+
+    def greater_than(self, threshold):
+        """Return (name, value) pairs with value above threshold"""
+        with self._current():
+            return self.index.greater_than(threshold)
+
+    def less_than(self, threshold):
+        """Return (name, value) pairs with value below threshold"""
+        with self._current():
+            return self.index.less_than(threshold)
+
+    def equal_to(self, value):
+        """Return (name, value) pairs holding exactly value"""
+        with self._current():
+            return self.index.equal_to(value)
+
+    def total(self):
+        """Return the sum of all counter values"""
+        with self._current():
+            return self.stats.total
+
+    def summary(self):
+        """Return count, total, min, max and mean of all counter values"""
+        with self._current():
+            return {
+                "count": self.stats.count,
+                "total": self.stats.total,
+                "min": self.index.min_value(),
+                "max": self.index.max_value(),
+                "mean": self.stats.mean(),
+            }
+
+    def distribution(self, quantiles):
+        """Return the count, the value at each quantile and the log2 buckets
+
+        Quantiles are read by position from the value index and buckets from
+        the maintained histogram, so no counter is scanned.
+        """
+        with self._current():
+            count = len(self.index)
+            return {
+                "count": count,
+                "quantiles": {
+                    str(q): self.index.value_at(rank(q, count)) if count else None
+                    for q in quantiles
+                },
+                "buckets": self.histogram.buckets(),
+            }
+
+    def _matching(self, op, operand):
+        """Select a bulk predicate's (name, value) pairs from the indexes
+
+        Called holding every lock, so the pairs are current.
+        """
+        if op == "prefix":
+            return [
+                (name, self.values[name]) for name in self.names.with_prefix(operand)
+            ]
+        queries = {
+            "lt": self.index.less_than,
+            "gt": self.index.greater_than,
+            "eq": self.index.equal_to,
+        }
+        return queries[op](operand)
+
+    def _apply_all(self, changes):
+        """Push (name, old, new) changes to everything derived, holding every lock"""
+        for name, old, new in changes:
+            for derived in self.derived:
+                notify(derived, name, old, new)
+            for observer in self.observers:
+                notify(observer, name, old, new)
+
+    def delete_where(self, op, operand):
+        """Delete every counter a bulk predicate selects, as one atomic step
+
+        The matches come from the value or name index, so the cost follows
+        the number deleted rather than the number of counters.
+        """
+        with self._exclusive():
+            changes = [
+                (name, value, None) for name, value in self._matching(op, operand)
+            ]
+            for name, _, _ in changes:
+                del self.values[name]
+            self._apply_all(changes)
+        return len(changes)
+
+    def reset_where(self, op, operand):
+        """Set every counter a bulk predicate selects to zero, as one atomic step"""
+        with self._exclusive():
+            changes = [(name, value, 0) for name, value in self._matching(op, operand)]
+            for name, _, _ in changes:
+                self.values[name] = 0
+            self._apply_all(changes)
+        return len(changes)
+
+    def check(self):
+        """Raise AssertionError if a derived structure disagrees with values"""
+        with self._exclusive():
+            for derived in self.derived:
+                derived.check(self.values)
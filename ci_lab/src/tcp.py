@@ -0,0 +1,228 @@
+"""
+Counter Protocol over TCP
+
+A compact text protocol for high-volume producers, served on an asyncio
+event loop over the same store as the HTTP routes. Each command is one
+line of space-separated words, and each gets exactly one reply line, in
+order:
+
+    INCR name [delta]   :<new value>, or _ if the counter does not exist
+    GET name            :<value>, or _
+    MGET name ...       *<n> then one :<value> or _ per name, space-separated
+    SET name value      :<value>, or _
+    PING                +PONG
+
+Malformed commands get -ERR <message>. Commands are case-insensitive.
+Clients may pipeline: send any number of commands without waiting, and
+read the replies back in the same order. Every complete line received in
+one read is executed before the replies go out in a single write. When the
+store is journaled, that write waits for the commands' journal fsync on a
+worker thread; the connection stops reading meanwhile, while the loop
+goes on serving other connections, whose waits share fsyncs.
+
+Run on its own, or with the Flask app in the same process so both serve
+the in-memory counters:
+    python -m src.tcp [host] [port] [--http-port 5000]
+"""
+
+import argparse
+import asyncio
+import threading
+from src import counter
+from src.backends import CounterRangeError
+from src.counter import increment, parse_counter_value
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 6380
+# Longest command line accepted before the connection is closed
+MAX_LINE = 64 * 1024
+
+
+class ProtocolError(Exception):
+    """A command the protocol cannot execute"""
+
+
+def _value(value):
+    """Reply element for a counter value or a missing counter"""
+    return "_" if value is None else f":{value}"
+
+
+def _parse_value(word):
+    """Convert a delta or value argument, raising ProtocolError if invalid"""
+    value, error = parse_counter_value(word)
+    if error:
+        raise ProtocolError(error)
+    return value
+
+
+def _incr(name, delta="1"):
+    return _value(increment(name, _parse_value(delta)))
+
+
+def _get(name):
+    return _value(counter.STORE.get(name))
+
+
+def _mget(*names):
+    return " ".join([f"*{len(names)}"] + [_value(counter.STORE.get(n)) for n in names])
+
+
+def _set(name, value):
+    return _value(counter.STORE.set(name, _parse_value(value)))
+
+
+def _ping():
+    return "+PONG"
+
+
+# Command -> (handler, fewest arguments, most arguments or None for any)
+COMMANDS = {
+    "INCR": (_incr, 1, 2),
+    "GET": (_get, 1, 1),
+    "MGET": (_mget, 1, None),
+    "SET": (_set, 2, 2),
+    "PING": (_ping, 0, 0),
+}
+
+
+def execute(line):
+    """Run one command line and return its reply line, without the newline"""
+    words = line.split()
+    if not words:
+        return "-ERR empty command"
+    command, arguments = words[0].upper(), words[1:]
+    if command not in COMMANDS:
+        return f"-ERR unknown command '{words[0]}'"
+    handler, fewest, most = COMMANDS[command]
+    if len(arguments) < fewest or (most is not None and len(arguments) > most):
+        return f"-ERR wrong number of arguments for '{command}'"
+    try:
+        return handler(*arguments)
+    except (ProtocolError, CounterRangeError) as error:
+        return f"-ERR {error}"
+
+
+class CounterProtocol(asyncio.Protocol):
+    """One client connection: split lines, execute them, write the replies"""
+
+    def __init__(self):
+        self.transport = None
+        self.buffer = b""
+        # Reading stops while replies wait for the journal, or while the
+        # client is slow to take them; it resumes when neither holds
+        self.syncing = False
+        self.writing_paused = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        lines = (self.buffer + data).split(b"\n")
+        self.buffer = lines.pop()
+        if len(self.buffer) > MAX_LINE:
+            self.transport.write(b"-ERR line too long\n")
+            self.transport.close()
+            return
+        if not lines:
+            return
+        store = counter.STORE
+        if store.expiry is not None:
+            store.expiry.expire(store)
+        replies = [execute(line.decode("utf-8", "replace")) for line in lines]
+        payload = ("\n".join(replies) + "\n").encode()
+        if store.journal is None:
+            self.transport.write(payload)
+            return
+        self.syncing = True
+        self.transport.pause_reading()
+        asyncio.ensure_future(self.reply_when_durable(store.journal, payload))
+
+    async def reply_when_durable(self, journal, payload):
+        """Write the replies once the journal has fsynced their changes"""
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, journal.sync)
+        except OSError:
+            # The changes may not be durable: acknowledge nothing
+            self.transport.abort()
+            return
+        self.syncing = False
+        if self.transport.is_closing():
+            return
+        self.transport.write(payload)
+        if not self.writing_paused:
+            self.transport.resume_reading()
+
+    def pause_writing(self):
+        # A client pipelining faster than it reads replies: stop reading
+        # until they drain, instead of buffering replies without bound
+        self.writing_paused = True
+        self.transport.pause_reading()
+
+    def resume_writing(self):
+        self.writing_paused = False
+        if not self.syncing:
+            self.transport.resume_reading()
+
+
+async def start_server(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Start listening on the running loop; return the asyncio Server"""
+    loop = asyncio.get_running_loop()
+    return await loop.create_server(CounterProtocol, host, port)
+
+
+def serve_in_thread(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Serve the protocol from a daemon thread; return the bound port
+
+    Port 0 picks a free port.
+    """
+    started = threading.Event()
+    # The bound port, or the error that stopped the server from starting
+    outcome = []
+
+    async def serve():
+        try:
+            server = await start_server(host, port)
+        except OSError as error:
+            outcome.append(error)
+            started.set()
+            return
+        outcome.append(server.sockets[0].getsockname()[1])
+        started.set()
+        await server.serve_forever()
+
+    threading.Thread(target=asyncio.run, args=(serve(),), daemon=True).start()
+    started.wait()
+    if isinstance(outcome[0], OSError):
+        raise outcome[0]
+    return outcome[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("host", nargs="?", default=DEFAULT_HOST)
+    parser.add_argument("port", nargs="?", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--http-port", type=int, help="also serve the HTTP API from this process"
+    )
+    args = parser.parse_args()
+
+    if args.http_port is not None:
+        from werkzeug.serving import run_simple
+
+        threading.Thread(
+            target=run_simple,
+            args=(args.host, args.http_port, counter.app),
+            kwargs={"threaded": True},
+            daemon=True,
+        ).start()
+
+    async def serve():
+        server = await start_server(args.host, args.port)
+        await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Mutation Versions and Cached Query Responses
+"""
+
+import os
+
+# Cached responses kept before the cache is emptied and refilled
+DEFAULT_CACHE_SIZE = 256
+
+
+class CounterVersions:
+    """Version numbers for the whole store and each counter, plus a cache
+
+    An observer: every mutation advances the version and stamps the changed
+    counter with it. ETags combine the version with a random epoch, so tags
+    from before a restart never match tags issued after it. Serialized
+    query responses are cached against the version they were built at and
+    dropped on the next write.
+
+    The version is kept as one count per stripe of names, summed on read,
+    so writers to different stripes share no lock. The store must deliver
+    the changes to one stripe one at a time, as it does under its stripe
+    locks; a counter is stamped with its stripe's count. Each count only
+    grows, so an unchanged sum means no stripe has changed.
+    """
+
+    def __init__(self, cache_size=DEFAULT_CACHE_SIZE, per_counter=True, stripes=1):
+        self.epoch = os.urandom(4).hex()
+        # Changes so far to the names in each stripe
+        self._counts = [0] * stripes
+        # name -> its stripe's count at its last change; without
+        # per_counter, every counter is tagged with the version instead
+        self.per_counter = per_counter
+        self.counters = {}
+        self.cache_size = cache_size
+        # query key -> (version, body)
+        self._cache = {}
+
+    @property
+    def version(self):
+        """Number of changes to the store so far"""
+        return sum(self._counts)
+
+    def _bump(self, name, exists=True):
+        stripe = hash(name) % len(self._counts)
+        self._counts[stripe] = count = self._counts[stripe] + 1
+        if self.per_counter:
+            if exists:
+                self.counters[name] = count
+            else:
+                self.counters.pop(name, None)
+        if self._cache:
+            self._cache.clear()
+
+    def add(self, name, value):
+        """Stamp a new counter"""
+        self._bump(name)
+
+    def remove(self, name, value):
+        """Forget a removed counter"""
+        self._bump(name, exists=False)
+
+    def update(self, name, old, new):
+        """Stamp a changed counter"""
+        self._bump(name)
+
+    def clear(self):
+        """Forget every counter"""
+        for stripe in range(len(self._counts)):
+            self._counts[stripe] += 1
+        self.counters.clear()
+        self._cache.clear()
+
+    def etag(self, name=None):
+        """Return the entity tag for the store or one counter (None if missing)"""
+        if name is None or not self.per_counter:
+            version = self.version
+        else:
+            version = self.counters.get(name)
+        return None if version is None else f"{self.epoch}-{version}"
+
+    def cached(self, key, render):
+        """Return (etag, body) for a query, calling render() only when stale
+
+        The version is read before rendering, so a write racing with render
+        can only make the cached body newer than its tag, never older.
+        """
+        version = self.version
+        entry = self._cache.get(key)
+        if entry is None or entry[0] != version:
+            entry = (version, render())
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[key] = entry
+        return f"{self.epoch}-{version}", entry[1]
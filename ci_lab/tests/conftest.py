@@ -0,0 +1,14 @@
+"""
+Shared pytest configuration for the counter service tests
+"""
+
+import pytest
+from src import app
+
+
+@pytest.fixture(autouse=True)
+def check_consistency():
+    """Verify the derived counter structures after every request"""
+    app.config.update(CHECK_CONSISTENCY=True, PROPAGATE_EXCEPTIONS=True)
+    yield
+    app.config.update(CHECK_CONSISTENCY=False, PROPAGATE_EXCEPTIONS=None)
@@ -0,0 +1,244 @@
+"""
+Test Cases for the ASGI Edition of the Counter API
+"""
+
+import asyncio
+import json
+import pytest
+from src import app as flask_app
+from src.asgi import app as asgi_app
+from http import HTTPStatus
+
+
+class Response:
+    """Status, headers and body collected from an ASGI response"""
+
+    def __init__(self, status, headers, body):
+        self.status_code = status
+        self.headers = headers
+        self.data = body
+
+    def get_json(self):
+        return json.loads(self.data) if self.data else None
+
+
+class AsgiClient:
+    """Minimal test client that calls the ASGI app directly"""
+
+    def request(self, method, path, json_body=None):
+        path, _, query = path.partition("?")
+        body = json.dumps(json_body).encode() if json_body is not None else b""
+        return asyncio.run(self._call(method, path, query, body))
+
+    async def _call(self, method, path, query, body):
+        scope = {
+            "type": "http",
+            "method": method,
+            "path": path,
+            "query_string": query.encode(),
+            "headers": [],
+        }
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        await asgi_app(scope, receive, send)
+        start = sent[0]
+        headers = {key.decode(): value.decode() for key, value in start["headers"]}
+        data = b"".join(message.get("body", b"") for message in sent[1:])
+        return Response(start["status"], headers, data)
+
+    def get(self, path):
+        return self.request("GET", path)
+
+    def post(self, path, json=None):
+        return self.request("POST", path, json)
+
+    def put(self, path):
+        return self.request("PUT", path)
+
+    def delete(self, path):
+        return self.request("DELETE", path)
+
+    def patch(self, path):
+        return self.request("PATCH", path)
+
+
+@pytest.fixture()
+def client():
+    """Fixture for ASGI test client with no counters"""
+    client = AsgiClient()
+    client.post("/counters/reset")
+    return client
+
+
+# Requests replayed against both apps; their responses must agree
+SCENARIO = [
+    ("post", "/counters/a"),
+    ("post", "/counters/a"),
+    ("post", "/counters/b"),
+    ("post", "/counters/bad@name"),
+    ("put", "/counters/a"),
+    ("put", "/counters/b/set/7"),
+    ("put", "/counters/b/set/-1"),
+    ("put", "/counters/b/set/x"),
+    ("put", "/counters/missing/set/1"),
+    ("post", "/counters/c"),
+    ("post", "/counters/c/reset"),
+    ("post", "/counters/missing/reset"),
+    ("get", "/counters"),
+    ("get", "/counters?limit=2"),
+    ("get", "/counters?limit=0"),
+    ("get", "/counters/a"),
+    ("get", "/counters/missing"),
+    ("get", "/counters/total"),
+    ("get", "/counters/count"),
+    ("get", "/counters/stats"),
+    ("get", "/counters/distribution"),
+    ("get", "/counters/distribution?q=0,1"),
+    ("get", "/counters/distribution?q=2"),
+    ("get", "/counters/top/2"),
+    ("get", "/counters/a/rank"),
+    ("get", "/counters/snapshot/nope"),
+    ("get", "/counters/snapshot/nope/stats"),
+    ("get", "/counters/snapshot/nope/top/3"),
+    ("delete", "/counters/snapshot/nope"),
+    ("get", "/counters/missing/rank"),
+    ("get", "/counters/rank/1"),
+    ("get", "/counters/rank/0"),
+    ("get", "/counters/rank/99"),
+    ("get", "/counters/bottom/1"),
+    ("get", "/counters/greater/0"),
+    ("get", "/counters/less/7"),
+    ("get", "/counters/equal/7"),
+    ("post", "/counters/prefix"),
+    ("post", "/counters/prefix/reset"),
+    ("get", "/counters/prefix/a"),
+    ("get", "/counters/prefix/a?limit=1"),
+    ("get", "/counters/prefix/p?limit=x"),
+    ("get", "/counters/prefix/p/stats"),
+    ("get", "/counters/a/rate"),
+    ("get", "/counters/a/rate?window=1h"),
+    ("get", "/counters/a/rate?window=2h"),
+    ("get", "/counters/missing/rate"),
+    ("get", "/counters/rate/top/1?window=5m"),
+    ("post", "/counters/bulk/reset?gt=6"),
+    ("post", "/counters/bulk/delete?prefix=prefix"),
+    ("post", "/counters/bulk/delete?lt=x"),
+    ("post", "/counters/bulk/delete"),
+    ("post", "/counters/bulk/delete?prefix="),
+    ("delete", "/counters/c"),
+    ("delete", "/counters/c"),
+    ("put", "/counters/missing"),
+    ("patch", "/counters/a"),
+    ("get", "/counters/reset"),
+    ("post", "/counters/reset"),
+    ("get", "/counters/top/1"),
+    ("delete", "/approx"),
+    ("put", "/approx/a"),
+    ("put", "/approx/a"),
+    ("put", "/approx/b"),
+    ("put", "/approx/bad@name"),
+    ("get", "/approx/a"),
+    ("get", "/approx/missing"),
+    ("get", "/approx/top/1"),
+    ("get", "/approx"),
+    ("post", "/approx"),
+    ("delete", "/approx"),
+    ("get", "/approx"),
+]
+
+
+def run_scenario(client):
+    """Replay SCENARIO and return (status, json) for each request"""
+    client.post("/counters/reset")
+    results = []
+    for method, path in SCENARIO:
+        response = getattr(client, method)(path)
+        # Bodies of 204s are empty and Flask's 405 page is HTML
+        status = response.status_code
+        body = None if status in (204, 405) else response.get_json()
+        results.append((status, body))
+    return results
+
+
+def test_matches_flask_app():
+    """It should answer every request exactly like the Flask app"""
+    assert run_scenario(AsgiClient()) == run_scenario(flask_app.test_client())
+
+
+class TestAsgiApp:
+    """Test cases for the ASGI counter app"""
+
+    def test_create_and_increment(self, client):
+        """It should create and increment a counter"""
+        response = client.post("/counters/test_counter")
+        assert response.status_code == HTTPStatus.CREATED
+        assert response.headers["content-type"] == "application/json"
+        assert client.put("/counters/test_counter").get_json() == {"test_counter": 1}
+
+    def test_delete_has_no_body(self, client):
+        """It should send an empty 204 response"""
+        client.post("/counters/a")
+        response = client.delete("/counters/a")
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        assert response.data == b""
+
+    def test_unknown_path(self, client):
+        """It should return 404 for paths no route matches"""
+        assert client.get("/nowhere").status_code == HTTPStatus.NOT_FOUND
+        assert client.get("/counters/top/x/y").status_code == HTTPStatus.NOT_FOUND
+
+    def test_batch(self, client):
+        """It should apply a batch of operations"""
+        response = client.post(
+            "/counters/batch",
+            json=[{"op": "create", "name": "a"}, {"op": "increment", "name": "a"}],
+        )
+        assert [r["status"] for r in response.get_json()["results"]] == [201, 200]
+        assert client.post("/counters/batch", json={}).status_code == 400
+        assert client.request("POST", "/counters/batch").status_code == 400
+
+    def test_snapshot(self, client):
+        """It should page through a snapshot taken before later writes"""
+        client.post("/counters/a")
+        snapshot_id = client.post("/counters/snapshot").get_json()["id"]
+        client.put("/counters/a")
+        response = client.get(f"/counters/snapshot/{snapshot_id}")
+        assert response.get_json() == {"counters": {"a": 0}, "next": None}
+        response = client.delete(f"/counters/snapshot/{snapshot_id}")
+        assert response.status_code == HTTPStatus.NO_CONTENT
+
+    def test_ndjson_stream(self, client):
+        """It should stream counters as NDJSON"""
+        client.post("/counters/a")
+        client.post("/counters/b")
+        response = client.get("/counters?format=ndjson")
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert response.data.splitlines() == [b'{"a": 0}', b'{"b": 0}']
+
+    def test_shares_the_flask_store(self, client):
+        """It should see counters written through the Flask app"""
+        flask_app.test_client().post("/counters/shared")
+        assert client.get("/counters/shared").get_json() == {"shared": 0}
+
+
+def test_lifespan_and_other_scopes():
+    """It should complete lifespan events and ignore other scope types"""
+    messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message["type"])
+
+    asyncio.run(asgi_app({"type": "lifespan"}, receive, send))
+    asyncio.run(asgi_app({"type": "websocket"}, receive, send))
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
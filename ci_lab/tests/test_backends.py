@@ -0,0 +1,362 @@
+"""
+Conformance Tests for Every Counter Storage Backend
+
+Each test runs once per backend; any new backend should be added to
+BACKEND_FACTORIES and pass this file unchanged.
+"""
+
+import threading
+import pytest
+from src import app
+from src import counter
+from src.backends import (
+    INT64_MAX,
+    CounterBackend,
+    CounterRangeError,
+    DictCounterStore,
+    SQLiteCounterStore,
+)
+from src.compact import CompactCounterStore
+from src.counter import create_store
+from src.persistence import CounterJournal
+from src.shm import SharedCounterStore
+from src.store import CounterStore
+from http import HTTPStatus
+
+BACKEND_FACTORIES = {
+    "indexed": lambda tmp_path: CounterStore(),
+    "dict": lambda tmp_path: DictCounterStore(),
+    "compact": lambda tmp_path: CompactCounterStore(),
+    "sqlite": lambda tmp_path: SQLiteCounterStore(),
+    "sqlite-file": lambda tmp_path: SQLiteCounterStore(str(tmp_path / "c.db")),
+    "shm": lambda tmp_path: SharedCounterStore(str(tmp_path / "c.shm"), stripes=4),
+}
+
+
+@pytest.fixture(params=list(BACKEND_FACTORIES))
+def store(request, tmp_path):
+    """One instance of each backend"""
+    return BACKEND_FACTORIES[request.param](tmp_path)
+
+
+def fill(store, counters):
+    """Create every counter in a dict"""
+    for name, value in counters.items():
+        assert store.create(name, value)
+
+
+class TestBackendConformance:
+    """The behaviour every CounterBackend must share"""
+
+    def test_is_a_backend(self, store):
+        """It should implement the CounterBackend interface"""
+        assert isinstance(store, CounterBackend)
+
+    def test_point_operations(self, store):
+        """It should create, read, update and delete single counters"""
+        assert store.create("a")
+        assert not store.create("a")
+        assert store.get("a") == 0
+        assert "a" in store
+        assert store.increment("a", 5) == 5
+        assert store.increment("a") == 6
+        assert store.set("a", 2) == 2
+        assert store.delete("a") == 2
+        assert "a" not in store
+        assert len(store) == 0
+
+    def test_missing_counters_are_none(self, store):
+        """It should report a missing counter as None everywhere"""
+        assert store.get("nope") is None
+        assert store.increment("nope") is None
+        assert store.set("nope", 3) is None
+        assert store.delete("nope") is None
+        assert store.items() == {}
+
+    def test_clear_and_items(self, store):
+        """It should copy out every counter and clear them all"""
+        fill(store, {"a": 1, "b": 2})
+        items = store.items()
+        store.increment("a")
+        assert items == {"a": 1, "b": 2}
+        store.clear()
+        assert store.items() == {}
+        assert len(store) == 0
+
+    def test_page(self, store):
+        """It should page through counters in name order"""
+        fill(store, {"b": 2, "d": 4, "a": 1, "c": 3})
+        assert store.page(None, 2) == [("a", 1), ("b", 2)]
+        assert store.page("b", 10) == [("c", 3), ("d", 4)]
+        assert store.page("bb", 1) == [("c", 3)]
+        assert store.page("d", 10) == []
+
+    def test_scan(self, store, monkeypatch):
+        """It should stream every counter in name order from one store pass"""
+        fill(store, {f"c{number:02}": number for number in range(10)})
+        pages, items = [], []
+        monkeypatch.setattr(store, "page", lambda *args: pages.append(args) or [])
+        real_items = store.items
+        monkeypatch.setattr(store, "items", lambda: items.append(1) or real_items())
+        list(store.scan(None, 3))
+        # Indexed backends page through the store; scan backends snapshot once
+        assert (len(pages), len(items)) in [(1, 0), (0, 1)]
+        monkeypatch.undo()
+        assert list(store.scan(None, 3)) == [(f"c{n:02}", n) for n in range(10)]
+        assert list(store.scan("c07", 2)) == [("c08", 8), ("c09", 9)]
+        assert list(store.scan("c09", 2)) == []
+
+    def test_prefix_queries(self, store):
+        """It should page and aggregate the counters under a name prefix"""
+        fill(store, {"svc_a_x": 1, "svc_a_y": 2, "svc_b_x": 4, "svc": 8, "t": 16})
+        assert store.prefix("svc_a", None, 10) == [("svc_a_x", 1), ("svc_a_y", 2)]
+        assert store.prefix("svc", None, 2) == [("svc", 8), ("svc_a_x", 1)]
+        assert store.prefix("svc", "svc_a_x", 10) == [("svc_a_y", 2), ("svc_b_x", 4)]
+        assert store.prefix("svc_a", "a", 1) == [("svc_a_x", 1)]
+        assert store.prefix("svc_a", "z", 1) == []
+        assert store.prefix("u", None, 10) == []
+        assert store.prefix_summary("svc_") == {"count": 3, "total": 7}
+        assert store.prefix_summary("nothing") == {"count": 0, "total": 0}
+
+    def test_ordered_queries(self, store):
+        """It should rank counters by value, ties broken by name"""
+        fill(store, {"a": 3, "b": 1, "c": 7, "d": 3})
+        assert store.top(3) == [("c", 7), ("d", 3), ("a", 3)]
+        assert store.bottom(2) == [("b", 1), ("a", 3)]
+        assert store.top(0) == []
+        assert len(store.top(10)) == 4
+
+    def test_range_queries(self, store):
+        """It should filter strictly above, strictly below and equal"""
+        fill(store, {"a": 3, "b": 1, "c": 7, "d": 3})
+        assert sorted(store.greater_than(3)) == [("c", 7)]
+        assert sorted(store.less_than(3)) == [("b", 1)]
+        assert sorted(store.equal_to(3)) == [("a", 3), ("d", 3)]
+        assert store.equal_to(100) == []
+
+    def test_aggregates(self, store):
+        """It should total and summarize every counter"""
+        assert store.total() == 0
+        assert store.summary()["mean"] is None
+        fill(store, {"a": 3, "b": 1, "c": 8})
+        assert store.total() == 12
+        assert store.summary() == {
+            "count": 3,
+            "total": 12,
+            "min": 1,
+            "max": 8,
+            "mean": 4.0,
+        }
+        store.check()
+
+    def test_rank(self, store):
+        """It should rank counters from the highest, ties as in top()"""
+        fill(store, {"a": 3, "b": 1, "c": 7, "d": 3})
+        assert [store.rank(name) for name in "abcd"] == [3, 4, 1, 2]
+        assert store.rank("missing") is None
+        assert [store.at_rank(k) for k in range(1, 5)] == store.top(4)
+        assert store.at_rank(0) is None
+        assert store.at_rank(5) is None
+
+    def test_bulk_delete_and_reset(self, store):
+        """It should delete or reset exactly the counters a predicate selects"""
+        fill(store, {"tmp_a": 1, "tmp_b": 7, "keep": 3, "big": 9, "zero": 0})
+        assert store.delete_where("lt", 2) == 2
+        assert store.items() == {"tmp_b": 7, "keep": 3, "big": 9}
+        assert store.reset_where("prefix", "tmp_") == 1
+        assert store.reset_where("gt", 5) == 1
+        assert store.items() == {"tmp_b": 0, "keep": 3, "big": 0}
+        assert store.delete_where("eq", 0) == 2
+        assert store.delete_where("prefix", "nothing") == 0
+        assert store.items() == {"keep": 3}
+        assert store.total() == 3
+        store.check()
+
+    def test_distribution(self, store):
+        """It should report quantiles and power-of-two buckets"""
+        fill(store, {"a": 0, "b": 3, "c": 2, "d": 9})
+        assert store.distribution([0.25, 0.5, 1]) == {
+            "count": 4,
+            "quantiles": {"0.25": 0, "0.5": 2, "1": 9},
+            "buckets": [
+                {"lower": 0, "upper": 0, "count": 1},
+                {"lower": 2, "upper": 3, "count": 2},
+                {"lower": 8, "upper": 15, "count": 1},
+            ],
+        }
+
+    def test_concurrent_increments(self, store):
+        """It should not lose increments made from several threads"""
+        store.create("hot")
+        threads = [
+            threading.Thread(
+                target=lambda: [store.increment("hot") for _ in range(300)]
+            )
+            for _ in range(6)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert store.get("hot") == 1800
+
+    def test_serves_the_routes(self, store, monkeypatch):
+        """It should run the HTTP API unchanged"""
+        monkeypatch.setattr(counter, "STORE", store)
+        client = app.test_client()
+        client.post("/counters/a")
+        client.post("/counters/b")
+        client.put("/counters/a")
+        client.put("/counters/b/set/5")
+        assert client.get("/counters").get_json() == {"a": 1, "b": 5}
+        assert client.get("/counters/top/1").get_json() == {"b": 5}
+        assert client.get("/counters/greater/1").get_json() == {"b": 5}
+        assert client.get("/counters/total").get_json() == {"total": 6}
+        assert client.get("/counters/count").get_json() == {"count": 2}
+        assert client.delete("/counters/a").status_code == HTTPStatus.NO_CONTENT
+
+
+# Backends that store int64s, and so must refuse anything larger
+INT64_BACKENDS = ["compact", "sqlite", "sqlite-file", "shm"]
+
+
+@pytest.fixture(params=INT64_BACKENDS)
+def int64_store(request, tmp_path):
+    """One instance of each backend limited to int64 values"""
+    return BACKEND_FACTORIES[request.param](tmp_path)
+
+
+class TestInt64Backends:
+    """Test cases for values beyond what an int64 backend can hold"""
+
+    def test_refuses_values_beyond_int64(self, int64_store):
+        """It should raise CounterRangeError and leave the counters unchanged"""
+        with pytest.raises(CounterRangeError):
+            int64_store.create("a", INT64_MAX + 1)
+        assert int64_store.get("a") is None
+        int64_store.create("a", INT64_MAX)
+        with pytest.raises(CounterRangeError):
+            int64_store.increment("a")
+        int64_store.create("b", -INT64_MAX)
+        with pytest.raises(CounterRangeError):
+            int64_store.increment("b", -2)
+        with pytest.raises(CounterRangeError):
+            int64_store.set("b", -INT64_MAX - 2)
+        assert int64_store.items() == {"a": INT64_MAX, "b": -INT64_MAX}
+        assert isinstance(int64_store.get("a"), int)
+
+    def test_aggregates_past_int64(self, int64_store):
+        """It should total values exactly even when the sum passes int64"""
+        int64_store.create("a", INT64_MAX)
+        int64_store.create("b", INT64_MAX)
+        int64_store.create("c", -1)
+        assert int64_store.total() == 2 * INT64_MAX - 1
+        assert int64_store.summary()["total"] == 2 * INT64_MAX - 1
+        assert int64_store.prefix_summary("") == {
+            "count": 3,
+            "total": 2 * INT64_MAX - 1,
+        }
+
+    def test_operands_beyond_int64(self, int64_store):
+        """It should compare with operands of any size instead of raising"""
+        fill(int64_store, {"a": INT64_MAX, "b": 0, "c": -INT64_MAX})
+        huge = 2**64
+        assert int64_store.greater_than(huge) == []
+        assert sorted(int64_store.greater_than(-huge)) == sorted(
+            int64_store.items().items()
+        )
+        assert len(int64_store.less_than(huge)) == 3
+        assert int64_store.less_than(-huge) == []
+        assert int64_store.equal_to(huge) == []
+        assert int64_store.at_rank(huge) is None
+        assert len(int64_store.top(huge)) == 3
+        assert int64_store.delete_where("gt", huge) == 0
+        assert int64_store.reset_where("lt", huge) == 3
+        assert int64_store.items() == {"a": 0, "b": 0, "c": 0}
+
+    def test_answers_bad_request(self, int64_store, monkeypatch):
+        """It should answer 400 over HTTP and per operation in a batch"""
+        monkeypatch.setattr(counter, "STORE", int64_store)
+        client = app.test_client()
+        client.post("/counters/a")
+        response = client.put(f"/counters/a/set/{INT64_MAX + 1}")
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        client.put(f"/counters/a/set/{INT64_MAX}")
+        response = client.post(
+            "/counters/batch",
+            json={
+                "operations": [
+                    {"op": "increment", "name": "a"},
+                    {"op": "create", "name": "b"},
+                ]
+            },
+        )
+        results = response.get_json()["results"]
+        assert results[0]["status"] == HTTPStatus.BAD_REQUEST
+        assert results[1]["status"] == HTTPStatus.CREATED
+        assert client.get("/counters/a").get_json() == {"a": INT64_MAX}
+        assert client.get("/counters/total").get_json() == {"total": INT64_MAX}
+        response = client.get(f"/counters/greater/{2**64}")
+        assert response.status_code == HTTPStatus.OK
+        assert response.get_json() == {}
+
+
+class TestCreateStore:
+    """Test cases for selecting a backend from the environment"""
+
+    def test_default_is_indexed(self):
+        """It should use the indexed store by default"""
+        assert isinstance(create_store({}), CounterStore)
+
+    def test_selects_by_name(self, tmp_path):
+        """It should build the backend named by COUNTER_BACKEND"""
+        assert isinstance(create_store({"COUNTER_BACKEND": "dict"}), DictCounterStore)
+        sqlite = create_store(
+            {"COUNTER_BACKEND": "sqlite", "COUNTER_SQLITE_PATH": str(tmp_path / "db")}
+        )
+        assert isinstance(sqlite, SQLiteCounterStore)
+        shm = create_store({"COUNTER_SHM_PATH": str(tmp_path / "shm")})
+        assert isinstance(shm, SharedCounterStore)
+
+    def test_rate_tracking(self):
+        """It should track rates by default except on the compact store"""
+        assert create_store({}).rates is not None
+        assert create_store({"COUNTER_BACKEND": "compact"}).rates is None
+        compact = create_store({"COUNTER_BACKEND": "compact", "COUNTER_RATES": "1"})
+        assert compact.rates in compact.observers
+        indexed = create_store({"COUNTER_RATES": "0"})
+        assert indexed.rates is None
+        assert indexed.create("a") and indexed.increment("a") == 1
+
+    def test_rejects_unknown_backend(self):
+        """It should refuse a backend name it does not know"""
+        with pytest.raises(ValueError):
+            create_store({"COUNTER_BACKEND": "redis"})
+
+    def test_journals_in_memory_backends(self, tmp_path, monkeypatch):
+        """It should attach a journal when COUNTER_DATA_DIR is set"""
+        closers = []
+        monkeypatch.setattr("atexit.register", closers.append)
+        store = create_store(
+            {"COUNTER_BACKEND": "dict", "COUNTER_DATA_DIR": str(tmp_path / "data")}
+        )
+        assert isinstance(store.observers[-1], CounterJournal)
+        assert store.journal.group_commit
+        closers[0]()
+
+    def test_durability_modes(self, tmp_path, monkeypatch):
+        """It should pick the journal's durability from COUNTER_DURABILITY"""
+        closers = []
+        monkeypatch.setattr("atexit.register", closers.append)
+        environ = {"COUNTER_DATA_DIR": str(tmp_path), "COUNTER_DURABILITY": "interval"}
+        assert not create_store(environ).journal.group_commit
+        closers[0]()
+        with pytest.raises(ValueError):
+            create_store({**environ, "COUNTER_DURABILITY": "sometimes"})
+
+    def test_refuses_to_journal_sqlite(self, tmp_path):
+        """It should refuse COUNTER_DATA_DIR for backends without observers"""
+        with pytest.raises(ValueError):
+            create_store(
+                {"COUNTER_BACKEND": "sqlite", "COUNTER_DATA_DIR": str(tmp_path)}
+            )
@@ -0,0 +1,118 @@
+"""
+Test Cases for the Batch Counter Endpoint
+"""
+
+import pytest
+from src import app
+from http import HTTPStatus
+
+
+@pytest.fixture()
+def client():
+    """Fixture for Flask test client with no counters"""
+    client = app.test_client()
+    client.post("/counters/reset")
+    return client
+
+
+class TestBatchEndpoint:
+    """Test cases for POST /counters/batch"""
+
+    def test_applies_operations_in_order(self, client):
+        """It should apply every operation and report each result"""
+        response = client.post(
+            "/counters/batch",
+            json=[
+                {"op": "create", "name": "a"},
+                {"op": "create", "name": "b"},
+                {"op": "increment", "name": "a", "delta": 5},
+                {"op": "increment", "name": "a"},
+                {"op": "set", "name": "b", "value": 9},
+                {"op": "reset", "name": "b"},
+                {"op": "delete", "name": "b"},
+            ],
+        )
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.get_json()["results"] == [
+            {"op": "create", "name": "a", "status": 201, "value": 0},
+            {"op": "create", "name": "b", "status": 201, "value": 0},
+            {"op": "increment", "name": "a", "status": 200, "value": 5},
+            {"op": "increment", "name": "a", "status": 200, "value": 6},
+            {"op": "set", "name": "b", "status": 200, "value": 9},
+            {"op": "reset", "name": "b", "status": 200, "value": 0},
+            {"op": "delete", "name": "b", "status": 204},
+        ]
+        assert client.get("/counters").get_json() == {"a": 6}
+
+    def test_accepts_operations_key(self, client):
+        """It should accept the list wrapped in an 'operations' object"""
+        response = client.post(
+            "/counters/batch", json={"operations": [{"op": "create", "name": "x"}]}
+        )
+        assert response.get_json()["results"][0]["status"] == HTTPStatus.CREATED
+
+    def test_reports_per_operation_errors(self, client):
+        """It should reuse the single-route validation for each operation"""
+        client.post("/counters/a")
+        results = client.post(
+            "/counters/batch",
+            json=[
+                {"op": "create", "name": "bad@name"},
+                {"op": "create", "name": "a"},
+                {"op": "set", "name": "a", "value": -1},
+                {"op": "set", "name": "a", "value": "ten"},
+                {"op": "increment", "name": "a", "delta": -2},
+                {"op": "increment", "name": "missing"},
+                {"op": "set", "name": "missing", "value": 1},
+                {"op": "reset", "name": "missing"},
+                {"op": "delete", "name": "missing"},
+                {"op": "explode", "name": "a"},
+                "not an operation",
+            ],
+        ).get_json()["results"]
+
+        assert [result["status"] for result in results] == [
+            400,
+            409,
+            400,
+            400,
+            400,
+            404,
+            404,
+            404,
+            404,
+            400,
+            400,
+        ]
+        assert results[0]["error"].startswith("Invalid counter name")
+        assert results[2]["error"] == "Counter value cannot be negative"
+        assert results[3]["error"] == "Invalid counter value"
+        assert client.get("/counters/a").get_json() == {"a": 0}
+
+    @pytest.mark.parametrize(
+        "operation",
+        [
+            {"op": "set", "name": "a", "value": 1.9},
+            {"op": "set", "name": "a", "value": True},
+            {"op": "set", "name": "a", "value": None},
+            {"op": "increment", "name": "a", "delta": 2.5},
+            {"op": "increment", "name": "a", "delta": True},
+            {"op": "increment", "name": "a", "delta": [1]},
+        ],
+    )
+    def test_rejects_non_integer_values(self, client, operation):
+        """It should refuse floats and bools as the single routes do"""
+        client.post("/counters/a")
+        result = client.post("/counters/batch", json=[operation]).get_json()
+        assert result["results"][0]["status"] == HTTPStatus.BAD_REQUEST
+        assert result["results"][0]["error"] == "Invalid counter value"
+        assert client.get("/counters/a").get_json() == {"a": 0}
+        assert client.put("/counters/a/set/1.9").status_code == 400
+
+    def test_rejects_malformed_body(self, client):
+        """It should return 400 when the body is not a list of operations"""
+        response = client.post("/counters/batch", json={"op": "create"})
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        response = client.post("/counters/batch", data="nonsense")
+        assert response.status_code == HTTPStatus.BAD_REQUEST
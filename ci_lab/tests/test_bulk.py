@@ -0,0 +1,60 @@
+"""
+Test Cases for Bulk Delete and Reset by Predicate
+"""
+
+import pytest
+from src import app
+from http import HTTPStatus
+
+
+@pytest.fixture()
+def client():
+    """Fixture for Flask test client with a few counters"""
+    client = app.test_client()
+    client.post("/counters/reset")
+    for name, value in {"tmp_1": 1, "tmp_2": 5, "hits": 5, "errors": 20}.items():
+        client.post(f"/counters/{name}")
+        client.put(f"/counters/{name}/set/{value}")
+    return client
+
+
+class TestBulkRoutes:
+    """Test cases for /counters/bulk/delete and /counters/bulk/reset"""
+
+    @pytest.mark.parametrize(
+        "query, remaining",
+        [
+            ("lt=5", {"tmp_2": 5, "hits": 5, "errors": 20}),
+            ("gt=5", {"tmp_1": 1, "tmp_2": 5, "hits": 5}),
+            ("eq=5", {"tmp_1": 1, "errors": 20}),
+            ("prefix=tmp_", {"hits": 5, "errors": 20}),
+        ],
+    )
+    def test_bulk_delete(self, client, query, remaining):
+        """It should delete only the counters the predicate selects"""
+        result = client.post(f"/counters/bulk/delete?{query}")
+        assert result.status_code == HTTPStatus.OK
+        assert result.get_json() == {"deleted": 4 - len(remaining)}
+        assert client.get("/counters").get_json() == remaining
+        assert client.get("/counters/total").get_json() == {
+            "total": sum(remaining.values())
+        }
+
+    def test_bulk_reset(self, client):
+        """It should set the selected counters to zero and keep them"""
+        result = client.post("/counters/bulk/reset?prefix=tmp_")
+        assert result.get_json() == {"reset": 2}
+        assert client.get("/counters").get_json() == {
+            "tmp_1": 0,
+            "tmp_2": 0,
+            "hits": 5,
+            "errors": 20,
+        }
+        assert client.get("/counters/top/1").get_json() == {"errors": 20}
+
+    @pytest.mark.parametrize("query", ["", "lt=x", "lt=1&gt=2", "value=3", "prefix="])
+    def test_invalid_predicate(self, client, query):
+        """It should refuse anything but exactly one valid predicate"""
+        result = client.post(f"/counters/bulk/delete?{query}")
+        assert result.status_code == HTTPStatus.BAD_REQUEST
+        assert len(client.get("/counters").get_json()) == 4
@@ -0,0 +1,254 @@
+"""
+Test Cases for the Hash-partitioned Counter Cluster
+"""
+
+from collections import Counter
+import pytest
+from src import app
+from src.cluster import (
+    HashRing,
+    NodeUnavailable,
+    Router,
+    create_router,
+    free_port,
+    node_environment,
+    start_nodes,
+    stop_nodes,
+)
+from http import HTTPStatus
+
+NODES = 3
+
+
+@pytest.fixture(scope="module")
+def urls():
+    """URLs of node processes running for this module's tests"""
+    processes, urls = start_nodes(NODES)
+    yield urls
+    stop_nodes(processes)
+
+
+@pytest.fixture()
+def router(urls):
+    """Test client of a router over the nodes, with no counters"""
+    client = create_router(urls).test_client()
+    client.post("/counters/reset")
+    return client
+
+
+@pytest.fixture()
+def single():
+    """Test client of one in-process service with no counters, for comparison"""
+    client = app.test_client()
+    client.post("/counters/reset")
+    return client
+
+
+def fill(*clients):
+    """Create the same counters with the same values through every client"""
+    for number in range(40):
+        for client in clients:
+            client.post(f"/counters/c{number:02}")
+            client.put(f"/counters/c{number:02}/set/{number * 7 % 11}")
+
+
+class TestHashRing:
+    """Test cases for placing names on nodes"""
+
+    def test_spread(self):
+        """It should give every node a similar share of the names"""
+        ring = HashRing(["a", "b", "c", "d"])
+        shares = Counter(ring.node_for(f"name{i}") for i in range(20_000))
+        assert set(shares) == {"a", "b", "c", "d"}
+        assert max(shares.values()) < 1.3 * min(shares.values())
+
+    def test_stable_across_rings(self):
+        """It should place names the same way in every ring of the same nodes"""
+        first, second = HashRing(["a", "b", "c"]), HashRing(["a", "b", "c"])
+        assert all(
+            first.node_for(f"n{i}") == second.node_for(f"n{i}") for i in range(1000)
+        )
+
+    def test_adding_a_node_moves_few_names(self):
+        """It should only move names onto the new node, about 1/n of them"""
+        before, after = HashRing(["a", "b", "c"]), HashRing(["a", "b", "c", "d"])
+        names = [f"name{i}" for i in range(10_000)]
+        moved = [
+            name for name in names if before.node_for(name) != after.node_for(name)
+        ]
+        assert all(after.node_for(name) == "d" for name in moved)
+        assert 0.15 < len(moved) / len(names) < 0.35
+
+    def test_needs_a_node(self):
+        """It should refuse an empty ring"""
+        with pytest.raises(ValueError):
+            HashRing([])
+
+
+class TestRouting:
+    """Test cases for single-counter requests through the router"""
+
+    def test_counter_lifecycle(self, router):
+        """It should create, increment, set, reset and delete through the owner"""
+        assert router.post("/counters/hits").get_json() == {"hits": 0}
+        assert router.post("/counters/hits").status_code == 409
+        assert router.put("/counters/hits").get_json() == {"hits": 1}
+        assert router.put("/counters/hits/set/9").get_json() == {"hits": 9}
+        assert router.get("/counters/hits").get_json() == {"hits": 9}
+        assert router.post("/counters/hits/reset").get_json() == {"hits": 0}
+        assert router.delete("/counters/hits").status_code == 204
+        assert router.get("/counters/hits").status_code == 404
+
+    def test_owner_holds_the_counter(self, router, urls):
+        """It should keep each counter on exactly the node the ring names"""
+        for name in ("a", "b", "c", "d", "e", "f"):
+            router.post(f"/counters/{name}")
+        ring = Router(urls).ring
+        for name in ("a", "b", "c", "d", "e", "f"):
+            owner = int(ring.node_for(name).split("-")[1])
+            for number, url in enumerate(urls):
+                status, _ = Router([url]).send_json(
+                    "node-0", "GET", f"/counters/{name}"
+                )
+                assert status == (200 if number == owner else 404)
+
+    def test_errors_and_etags_pass_through(self, router):
+        """It should relay the node's errors and conditional responses"""
+        assert router.post("/counters/bad-name").status_code == 400
+        router.post("/counters/hits")
+        response = router.get("/counters/hits")
+        assert response.headers["ETag"]
+        cached = router.get(
+            "/counters/hits", headers={"If-None-Match": response.headers["ETag"]}
+        )
+        assert cached.status_code == 304
+
+    def test_cluster_description(self, router, urls):
+        """It should list the nodes in ring order"""
+        assert router.get("/cluster").get_json()["nodes"] == urls
+
+
+class TestScatterGather:
+    """Test cases for queries answered by every node together"""
+
+    @pytest.mark.parametrize(
+        "path",
+        [
+            "/counters",
+            "/counters/total",
+            "/counters/count",
+            "/counters/stats",
+            "/counters/top/5",
+            "/counters/bottom/5",
+            "/counters/greater/6",
+            "/counters/less/3",
+            "/counters/equal/4",
+            "/counters?limit=7",
+            "/counters?limit=7&after=c10",
+            "/counters/prefix/c1?limit=4",
+            "/counters/prefix/c1/stats",
+            "/counters?limit=0",
+        ],
+    )
+    def test_matches_a_single_process(self, router, single, path):
+        """It should answer exactly as one process holding every counter"""
+        fill(router, single)
+        expected = single.get(path)
+        response = router.get(path)
+        assert response.status_code == expected.status_code
+        assert response.get_json() == expected.get_json()
+
+    def test_ndjson(self, router, single):
+        """It should stream every counter in name order"""
+        fill(router, single)
+        path = "/counters?format=ndjson&after=c05"
+        assert router.get(path).get_data() == single.get(path).get_data()
+
+    def test_empty_cluster(self, router):
+        """It should report no counters for top and bottom"""
+        assert router.get("/counters/top/3").status_code == 404
+        assert router.get("/counters/stats").get_json()["count"] == 0
+
+    def test_bulk_and_reset(self, router, single):
+        """It should apply bulk operations and resets on every node"""
+        fill(router, single)
+        for path in ("/counters/bulk/delete?lt=3", "/counters/bulk/reset?gt=8"):
+            assert router.post(path).get_json() == single.post(path).get_json()
+        assert router.get("/counters").get_json() == single.get("/counters").get_json()
+        router.post("/counters/reset")
+        assert router.get("/counters/count").get_json() == {"count": 0}
+
+    @pytest.mark.parametrize(
+        "method, path",
+        [
+            ("get", "/counters/distribution"),
+            ("get", "/counters/stream"),
+            ("post", "/counters/snapshot"),
+            ("get", "/counters/snapshot/abc"),
+            ("get", "/counters/snapshot/abc/top/3"),
+            ("delete", "/counters/snapshot/abc"),
+            ("get", "/counters/rank/1"),
+            ("get", "/counters/c01/rank"),
+            ("get", "/counters/rate/top/3"),
+            ("get", "/approx"),
+            ("put", "/approx/a"),
+            ("get", "/approx/top/3"),
+        ],
+    )
+    def test_unmergeable_queries(self, router, method, path):
+        """It should answer 501 rather than one node's share of the answer"""
+        fill(router)
+        response = getattr(router, method)(path)
+        assert response.status_code == HTTPStatus.NOT_IMPLEMENTED
+        assert "not served by the cluster" in response.get_json()["error"]
+        assert router.get("/counters/count").get_json() == {"count": 40}
+
+    def test_batch(self, router, single):
+        """It should split a batch by node and return results in order"""
+        operations = [
+            {"op": "create", "name": "a"},
+            {"op": "create", "name": "b"},
+            {"op": "increment", "name": "a", "delta": 5},
+            {"op": "unknown", "name": "a"},
+            "not an operation",
+            {"op": "set", "name": "missing", "value": 1},
+            {"op": "increment", "name": "b"},
+            {"op": "delete", "name": "a"},
+        ]
+        response = router.post("/counters/batch", json={"operations": operations})
+        expected = single.post("/counters/batch", json={"operations": operations})
+        assert response.get_json() == expected.get_json()
+        assert router.post("/counters/batch", json={}).status_code == 400
+
+
+class TestNodes:
+    """Test cases for launching nodes and losing them"""
+
+    def test_unreachable_node(self, urls):
+        """It should answer 502 when a node cannot be reached"""
+        client = create_router(urls + [f"http://127.0.0.1:{free_port()}"]).test_client()
+        response = client.get("/counters/total")
+        assert response.status_code == 502
+        assert "unavailable" in response.get_json()["error"]
+        with pytest.raises(NodeUnavailable):
+            Router([f"http://127.0.0.1:{free_port()}"]).send("node-0", "GET", "/")
+
+    def test_node_environment(self, tmp_path):
+        """It should give each node its own journal and no shared store paths"""
+        environ = {"COUNTER_DATA_DIR": "/shared", "COUNTER_SQLITE_PATH": "x.db"}
+        node = node_environment(2, str(tmp_path), environ)
+        assert node["COUNTER_DATA_DIR"] == str(tmp_path / "node-2")
+        assert "COUNTER_SQLITE_PATH" not in node
+        assert "COUNTER_DATA_DIR" not in node_environment(0, None, environ)
+        with pytest.raises(ValueError):
+            node_environment(0, None, {"COUNTER_SHM_PATH": "/dev/shm/c"})
+
+    def test_router_needs_nodes(self, monkeypatch):
+        """It should read the nodes from the environment, and need at least one"""
+        monkeypatch.setenv("COUNTER_CLUSTER_NODES", "http://127.0.0.1:1,")
+        assert create_router().extensions["cluster"].urls == {
+            "node-0": "http://127.0.0.1:1"
+        }
+        monkeypatch.delenv("COUNTER_CLUSTER_NODES")
+        with pytest.raises(ValueError):
+            create_router()
@@ -0,0 +1,79 @@
+"""
+Test Cases for the Compact Counter Store
+"""
+
+import random
+import pytest
+from src.backends import CounterRangeError
+from src.compact import CompactCounterStore
+
+
+class TestCompactCounterStore:
+    """Test cases for CompactCounterStore internals"""
+
+    def test_matches_a_dict_under_churn(self):
+        """It should agree with a dict through random creates and deletes"""
+        rng = random.Random(3)
+        store, expected = CompactCounterStore(), {}
+        for _ in range(5_000):
+            name = f"n{rng.randrange(500)}"
+            if rng.random() < 0.4:
+                assert (store.delete(name) is not None) == (name in expected)
+                expected.pop(name, None)
+            elif store.create(name, rng.randrange(100)):
+                expected[name] = store.get(name)
+            else:
+                expected[name] = store.increment(name)
+        assert store.items() == expected
+        store.check()
+
+    def test_reuses_deleted_slots(self):
+        """It should put new counters in the slots of deleted ones"""
+        store = CompactCounterStore()
+        for i in range(100):
+            store.create(f"c{i}")
+        for i in range(50):
+            store.delete(f"c{i}")
+        for i in range(50):
+            store.create(f"d{i}")
+        assert len(store._spans) == 100
+        assert len(store._free) == 0
+        store.check()
+
+    def test_compacts_deleted_names(self):
+        """It should drop deleted names once they are half of the name bytes"""
+        store = CompactCounterStore()
+        for i in range(100):
+            store.create(f"counter{i:03}")
+        for i in range(60):
+            store.delete(f"counter{i:03}")
+        live = 40 * len("counter000")
+        assert len(store._names) - store._garbage == live
+        assert store._garbage * 2 <= len(store._names)
+        assert store.items() == {f"counter{i:03}": 0 for i in range(60, 100)}
+
+    def test_unicode_names(self):
+        """It should store names as UTF-8 and give them back unchanged"""
+        store = CompactCounterStore()
+        store.create("zähler", 2)
+        assert store.get("zähler") == 2
+        assert store.items() == {"zähler": 2}
+
+    def test_int64_limit(self):
+        """It should refuse values that do not fit in int64 and stay intact"""
+        store = CompactCounterStore()
+        store.create("a", 2**63 - 1)
+        with pytest.raises(CounterRangeError):
+            store.increment("a")
+        with pytest.raises(CounterRangeError):
+            store.create("b", 2**63)
+        assert store.items() == {"a": 2**63 - 1}
+        store.check()
+
+    def test_check_detects_drift(self):
+        """It should raise when the running total disagrees with the values"""
+        store = CompactCounterStore()
+        store.create("a", 1)
+        store._total += 1
+        with pytest.raises(AssertionError):
+            store.check()
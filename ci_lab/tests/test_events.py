@@ -0,0 +1,165 @@
+"""
+Test Cases for Streaming Counter Changes
+"""
+
+import asyncio
+import json
+import pytest
+from src import app, counter
+from src.asgi import app as asgi_app
+from src.backends import SQLiteCounterStore
+from src.events import CounterEvents, Subscription
+from http import HTTPStatus
+
+
+@pytest.fixture()
+def client():
+    """Fixture for Flask test client with no counters"""
+    client = app.test_client()
+    client.post("/counters/reset")
+    return client
+
+
+def parse(chunk):
+    """Return the (event, data) pairs in a chunk of server-sent events"""
+    events = []
+    for block in chunk.decode().strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+class TestSubscription:
+    """Test cases for Subscription"""
+
+    def test_starts_stale(self):
+        """It should ask for a snapshot before any change"""
+        subscription = Subscription()
+        subscription.offer("a", 1)
+        assert subscription.take(0) == (True, {})
+        assert subscription.take(0) == (False, {})
+
+    def test_coalesces_per_counter(self):
+        """It should keep only the latest value of each counter"""
+        subscription = Subscription()
+        subscription.take(0)
+        for value in range(1, 100):
+            subscription.offer("a", value)
+        subscription.offer("b", 1)
+        subscription.offer("b", None)
+        assert subscription.take(0) == (False, {"a": 99, "b": None})
+
+    def test_overflow_resyncs(self):
+        """It should drop its queue and go stale past capacity"""
+        subscription = Subscription(capacity=2)
+        subscription.take(0)
+        subscription.offer("a", 1)
+        subscription.offer("b", 1)
+        subscription.offer("a", 2)
+        subscription.offer("c", 1)
+        assert subscription.take(0) == (True, {})
+
+    def test_filters(self):
+        """It should match the listed names or the prefix"""
+        subscription = Subscription(names=["a"], prefix="api_")
+        assert subscription.matches("a")
+        assert subscription.matches("api_hits")
+        assert not subscription.matches("b")
+        assert Subscription().matches("anything")
+
+
+class TestCounterEvents:
+    """Test cases for CounterEvents"""
+
+    def test_publishes_to_matching_subscribers(self):
+        """It should queue changes only for subscribers that want them"""
+        events = CounterEvents()
+        everything, only_b = events.subscribe(), events.subscribe(names=["b"])
+        for subscription in (everything, only_b):
+            subscription.take(0)
+        events.add("a", 0)
+        events.update("b", 0, 5)
+        assert everything.take(0) == (False, {"a": 0, "b": 5})
+        assert only_b.take(0) == (False, {"b": 5})
+        events.clear()
+        assert only_b.take(0) == (True, {})
+        events.unsubscribe(everything)
+        assert len(events) == 1
+
+
+class TestStreamRoute:
+    """Test cases for GET /counters/stream"""
+
+    def test_snapshot_then_changes(self, client):
+        """It should send a resync, then coalesced changes and deletes"""
+        client.post("/counters/a")
+        client.post("/counters/b")
+        response = client.get("/counters/stream", buffered=False)
+        assert response.status_code == HTTPStatus.OK
+        assert response.mimetype == "text/event-stream"
+        chunks = iter(response.response)
+        assert parse(next(chunks)) == [("resync", {"a": 0, "b": 0})]
+        client.put("/counters/a")
+        client.put("/counters/a")
+        client.delete("/counters/b")
+        assert parse(next(chunks)) == [
+            ("change", {"name": "a", "value": 2}),
+            ("delete", {"name": "b"}),
+        ]
+        client.post("/counters/reset")
+        assert parse(next(chunks)) == [("resync", {})]
+        response.close()
+        assert len(counter.STORE.events) == 0
+
+    def test_filtered(self, client):
+        """It should stream only the named counters and the prefix"""
+        for name in ("a", "b", "api_hits"):
+            client.post(f"/counters/{name}")
+        response = client.get("/counters/stream?name=a&prefix=api_", buffered=False)
+        chunks = iter(response.response)
+        assert parse(next(chunks)) == [("resync", {"a": 0, "api_hits": 0})]
+        client.put("/counters/b")
+        client.put("/counters/api_hits")
+        assert parse(next(chunks)) == [("change", {"name": "api_hits", "value": 1})]
+        response.close()
+
+    def test_unsupported_backend(self, client, monkeypatch):
+        """It should refuse to stream where other processes may write"""
+        monkeypatch.setattr(counter, "STORE", SQLiteCounterStore())
+        response = client.get("/counters/stream")
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_asgi_stream(client):
+    """It should stream over ASGI and unsubscribe when the client leaves"""
+    client.post("/counters/a")
+
+    async def run():
+        left = asyncio.Event()
+        bodies = []
+        requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            if requests:
+                return requests.pop(0)
+            await left.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message.get("more_body"):
+                bodies.append(message["body"])
+                if len(bodies) == 1:
+                    counter.STORE.increment("a", 3)
+                else:
+                    left.set()
+
+        scope = {"type": "http", "method": "GET", "path": "/counters/stream"}
+        await asyncio.wait_for(asgi_app(scope, receive, send), 5)
+        return bodies
+
+    bodies = asyncio.run(run())
+    assert [parse(body) for body in bodies] == [
+        [("resync", {"a": 0})],
+        [("change", {"name": "a", "value": 3})],
+    ]
+    assert len(counter.STORE.events) == 0
@@ -0,0 +1,163 @@
+"""
+Test Cases for Counter Expiry
+"""
+
+import random
+import time
+import pytest
+from src import app
+from src.counter import STORE
+from src.expiry import CounterExpiry, TimingWheel
+from src.store import CounterStore
+from http import HTTPStatus
+
+
+class FakeClock:
+    """A clock that only moves when told to"""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture()
+def client():
+    """Fixture for Flask test client with no counters"""
+    client = app.test_client()
+    client.post("/counters/reset")
+    return client
+
+
+@pytest.fixture()
+def later():
+    """Gives the store an expiry on a fake clock; yields a function to move it"""
+    clock = FakeClock(time.monotonic())
+    position = STORE.observers.index(STORE.expiry)
+    original = STORE.expiry
+    STORE.expiry = STORE.observers[position] = CounterExpiry(clock=clock)
+
+    def advance(seconds):
+        clock.now += seconds
+
+    yield advance
+    STORE.expiry = STORE.observers[position] = original
+
+
+class TestTimingWheel:
+    """Test cases for TimingWheel"""
+
+    @pytest.mark.parametrize("levels", [1, 2, 3])
+    def test_entries_come_due_on_time(self, levels):
+        """It should return each entry in the advance that reaches its deadline"""
+        rng = random.Random(levels)
+        wheel = TimingWheel(bits=3, levels=levels, now=rng.randrange(100))
+        expected = {}
+        for key in range(2_000):
+            if rng.random() < 0.5:
+                deadline = wheel.now + rng.randrange(-3, 700)
+                wheel.schedule(key, deadline)
+                expected[key] = max(deadline, wheel.now + 1)
+            before, target = wheel.now, wheel.now + rng.randrange(1, 5)
+            due = {key for key, _ in wheel.advance(target)}
+            assert due == {key for key, at in expected.items() if before < at <= target}
+            for key in due:
+                del expected[key]
+        assert wheel.pending == len(expected)
+
+    def test_idle_wheel_jumps(self):
+        """It should skip straight to the target when nothing is scheduled"""
+        wheel = TimingWheel()
+        assert wheel.advance(10**9) == []
+        assert wheel.now == 10**9
+
+
+class TestCounterExpiry:
+    """Test cases for CounterExpiry"""
+
+    def test_expires_after_ttl(self):
+        """It should report a counter once its TTL has passed, never before"""
+        clock = FakeClock()
+        expiry = CounterExpiry(tick=1.0, clock=clock)
+        expiry.set_ttl("a", 2.5)
+        clock.now = 2.9
+        assert expiry.due() == []
+        clock.now = 3.0
+        assert expiry.due() == ["a"]
+
+    def test_refresh_on_update(self):
+        """It should push the deadline out whenever the counter changes"""
+        clock = FakeClock()
+        expiry = CounterExpiry(clock=clock)
+        expiry.set_ttl("a", 5)
+        clock.now = 4
+        expiry.update("a", 0, 1)
+        clock.now = 8
+        assert expiry.due() == []
+        clock.now = 9
+        assert expiry.due() == ["a"]
+
+    def test_forgets_removed_counters(self):
+        """It should not report counters that were deleted or cleared"""
+        clock = FakeClock()
+        expiry = CounterExpiry(clock=clock)
+        expiry.set_ttl("a", 1)
+        expiry.set_ttl("b", 1)
+        expiry.remove("a", 0)
+        clock.now = 2
+        assert expiry.due() == ["b"]
+        expiry.set_ttl("c", 1)
+        expiry.clear()
+        clock.now = 4
+        assert expiry.due() == []
+
+    def test_expired_counters_leave_indexes(self):
+        """It should delete expired counters from the store and its indexes"""
+        store = CounterStore()
+        clock = FakeClock()
+        store.expiry = CounterExpiry(clock=clock)
+        store.observers[-1] = store.expiry
+        for name, value in (("a", 5), ("b", 7)):
+            store.create(name, value)
+        store.expiry.set_ttl("b", 10)
+        clock.now = 10
+        assert store.expiry.expire(store) == 1
+        assert store.top(5) == [("a", 5)]
+        assert store.total() == 5
+        store.check()
+
+
+class TestTtlRoutes:
+    """Test cases for ?ttl= on counter creation"""
+
+    def test_counter_expires(self, client, later):
+        """It should delete a counter ttl seconds after its last change"""
+        assert client.post("/counters/a?ttl=10").status_code == HTTPStatus.CREATED
+        client.post("/counters/b")
+        later(6)
+        client.put("/counters/a")
+        later(6)
+        assert client.get("/counters/a").get_json() == {"a": 1}
+        later(11)
+        assert client.get("/counters/a").status_code == HTTPStatus.NOT_FOUND
+        assert client.get("/counters").get_json() == {"b": 0}
+
+    def test_batch_create_with_ttl(self, client, later):
+        """It should accept a ttl on batch creates"""
+        client.post(
+            "/counters/batch",
+            json=[
+                {"op": "create", "name": "a", "ttl": 1},
+                {"op": "create", "name": "b"},
+            ],
+        )
+        later(2)
+        assert client.get("/counters").get_json() == {"b": 0}
+
+    @pytest.mark.parametrize("ttl", ["abc", "0", "-5", "inf", "nan"])
+    def test_invalid_ttl(self, client, ttl):
+        """It should refuse a ttl that is not a positive number"""
+        result = client.post(f"/counters/a?ttl={ttl}")
+        assert result.status_code == HTTPStatus.BAD_REQUEST
+        assert client.get("/counters/a").status_code == HTTPStatus.NOT_FOUND
@@ -0,0 +1,127 @@
+"""
+Test Cases for the Ordered Counter Index
+"""
+
+import pytest
+from src import app
+from src.index import CounterIndex
+from http import HTTPStatus
+
+
+@pytest.fixture()
+def client():
+    """Fixture for Flask test client with no counters"""
+    client = app.test_client()
+    client.post("/counters/reset")
+    return client
+
+
+class TestCounterIndex:
+    """Test cases for CounterIndex"""
+
+    def test_top_and_bottom(self):
+        """It should return counters ordered by value"""
+        index = CounterIndex()
+        for name, value in {"a": 3, "b": 1, "c": 7, "d": 5}.items():
+            index.add(name, value)
+        assert index.top(2) == [("c", 7), ("d", 5)]
+        assert index.bottom(2) == [("b", 1), ("a", 3)]
+
+    def test_rank(self):
+        """It should find positions from the highest, ties as in top()"""
+        index = CounterIndex()
+        for name, value in {"a": 3, "b": 1, "c": 7, "d": 3}.items():
+            index.add(name, value)
+        ranks = {name: index.rank(name, value) for name, value in index.top(4)}
+        assert ranks == {"c": 1, "d": 2, "a": 3, "b": 4}
+        assert [index.at_rank(k) for k in range(1, 5)] == index.top(4)
+
+    def test_n_larger_than_index(self):
+        """It should return everything when n exceeds the size"""
+        index = CounterIndex()
+        index.add("a", 1)
+        assert index.top(5) == [("a", 1)]
+        assert index.bottom(5) == [("a", 1)]
+        assert index.top(0) == []
+
+    def test_update_and_remove(self):
+        """It should reorder on update and forget removed counters"""
+        index = CounterIndex()
+        index.add("a", 1)
+        index.add("b", 2)
+        index.update("a", 1, 9)
+        assert index.top(1) == [("a", 9)]
+        index.remove("a", 9)
+        assert index.top(2) == [("b", 2)]
+        index.clear()
+        assert len(index) == 0
+
+    def test_range_queries(self):
+        """It should answer strict greater/less and exact matches"""
+        index = CounterIndex()
+        for name, value in {"a": 1, "b": 5, "c": 5, "d": 9}.items():
+            index.add(name, value)
+        assert index.greater_than(5) == [("d", 9)]
+        assert index.less_than(5) == [("a", 1)]
+        assert sorted(index.equal_to(5)) == [("b", 5), ("c", 5)]
+        assert index.equal_to(2) == []
+
+    def test_buckets_follow_updates(self):
+        """It should move names between value buckets"""
+        index = CounterIndex()
+        index.add("a", 5)
+        index.update("a", 5, 6)
+        assert index.equal_to(5) == []
+        assert index.equal_to(6) == [("a", 6)]
+        index.remove("a", 6)
+        assert index.equal_to(6) == []
+
+
+class TestIndexedRoutes:
+    """Test cases for the top/bottom routes staying in sync with mutations"""
+
+    def test_top_follows_mutations(self, client):
+        """It should reflect increments, sets, resets and deletes"""
+        for name in ("a", "b", "c"):
+            client.post(f"/counters/{name}")
+        client.put("/counters/a/set/10")
+        client.put("/counters/b/set/5")
+        client.put("/counters/c")
+
+        response = client.get("/counters/top/2")
+        assert response.status_code == HTTPStatus.OK
+        assert response.get_json() == {"a": 10, "b": 5}
+
+        client.post("/counters/a/reset")
+        client.delete("/counters/b")
+        response = client.get("/counters/top/2")
+        assert response.get_json() == {"c": 1, "a": 0}
+
+    def test_bottom_follows_mutations(self, client):
+        """It should return the lowest counters after updates"""
+        client.post("/counters/a")
+        client.post("/counters/b")
+        client.put("/counters/a")
+
+        response = client.get("/counters/bottom/1")
+        assert response.get_json() == {"b": 0}
+
+    def test_filters_follow_mutations(self, client):
+        """It should answer the threshold routes from the current values"""
+        for name in ("a", "b", "c"):
+            client.post(f"/counters/{name}")
+        client.put("/counters/a/set/10")
+        client.put("/counters/b/set/3")
+        client.put("/counters/b/set/10")
+
+        assert client.get("/counters/greater/3").get_json() == {"a": 10, "b": 10}
+        assert client.get("/counters/less/10").get_json() == {"c": 0}
+        assert client.get("/counters/equal/10").get_json() == {"a": 10, "b": 10}
+        assert client.get("/counters/equal/3").get_json() == {}
+
+    def test_empty_after_reset(self, client):
+        """It should report no counters once everything is reset"""
+        client.post("/counters/a")
+        client.post("/counters/reset")
+        response = client.get("/counters/top/1")
+        assert response.status_code == HTTPStatus.NOT_FOUND
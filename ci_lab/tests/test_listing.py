@@ -0,0 +1,96 @@
+"""
+Test Cases for Paginated and Streaming Counter Listings
+"""
+
+import json
+import pytest
+from src import app
+from src.index import NameIndex
+from http import HTTPStatus
+
+
+@pytest.fixture()
+def client():
+    """Fixture for Flask test client with counters c00..c24"""
+    client = app.test_client()
+    client.post("/counters/reset")
+    client.post(
+        "/counters/batch",
+        json=[{"op": "create", "name": f"c{i:02d}"} for i in range(25)],
+    )
+    return client
+
+
+class TestNameIndex:
+    """Test cases for NameIndex"""
+
+    def test_pages_in_name_order(self):
+        """It should return names strictly after the cursor"""
+        index = NameIndex()
+        for name in ("b", "d", "a", "c"):
+            index.add(name, 0)
+        assert index.after(None, 2) == ["a", "b"]
+        assert index.after("b", 5) == ["c", "d"]
+        assert index.after("bb", 1) == ["c"]
+        index.remove("c", 0)
+        index.update("d", 0, 1)
+        assert index.after("b", 5) == ["d"]
+        index.clear()
+        assert len(index) == 0
+
+
+class TestListing:
+    """Test cases for GET /counters paging and streaming"""
+
+    def test_unpaged_listing_is_unchanged(self, client):
+        """It should still return every counter when no paging is asked for"""
+        response = client.get("/counters")
+        assert response.status_code == HTTPStatus.OK
+        assert len(response.get_json()) == 25
+
+    def test_walks_every_page(self, client):
+        """It should return each counter exactly once across the pages"""
+        seen = []
+        after = None
+        while True:
+            query = "/counters?limit=10" + (f"&after={after}" if after else "")
+            body = client.get(query).get_json()
+            seen.extend(body["counters"])
+            after = body["next"]
+            if after is None:
+                break
+        assert seen == [f"c{i:02d}" for i in range(25)]
+
+    def test_cursor_survives_deletes(self, client):
+        """It should resume after the cursor even if that counter is gone"""
+        body = client.get("/counters?limit=5").get_json()
+        client.delete(f"/counters/{body['next']}")
+        body = client.get(f"/counters?limit=2&after={body['next']}").get_json()
+        assert list(body["counters"]) == ["c05", "c06"]
+
+    def test_default_limit(self, client):
+        """It should use the default page size when only a cursor is given"""
+        body = client.get("/counters?after=c20").get_json()
+        assert list(body["counters"]) == ["c21", "c22", "c23", "c24"]
+        assert body["next"] is None
+
+    @pytest.mark.parametrize("limit", ["0", "-1", "abc", "100000"])
+    def test_rejects_bad_limit(self, client, limit):
+        """It should return 400 for a limit outside the allowed range"""
+        response = client.get(f"/counters?limit={limit}")
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    def test_ndjson_stream(self, client, monkeypatch):
+        """It should stream one JSON object per line across store chunks"""
+        monkeypatch.setattr("src.counter.STREAM_CHUNK", 4)
+        client.put("/counters/c03/set/3")
+        response = client.get("/counters?format=ndjson")
+        assert response.mimetype == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.data.splitlines()]
+        assert len(lines) == 25
+        assert lines[3] == {"c03": 3}
+
+    def test_ndjson_stream_after_cursor(self, client):
+        """It should start the stream after the given cursor"""
+        response = client.get("/counters?format=ndjson&after=c22")
+        assert response.data.splitlines() == [b'{"c23": 0}', b'{"c24": 0}']
@@ -0,0 +1,94 @@
+"""
+Test Cases for Request Metrics
+"""
+
+import pytest
+from src import app
+from src.counter import METRICS
+from src.metrics import Histogram, RequestMetrics
+from http import HTTPStatus
+
+
+@pytest.fixture()
+def client():
+    """Fixture for Flask test client with no counters and no metrics"""
+    client = app.test_client()
+    client.post("/counters/reset")
+    METRICS.reset()
+    return client
+
+
+class TestRequestMetrics:
+    """Test cases for the metrics registry"""
+
+    def test_histogram_buckets(self):
+        """It should count each value in the first bucket that holds it"""
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+        assert list(histogram.cumulative()) == [("0.1", 2), ("1.0", 3), ("+Inf", 4)]
+        assert histogram.count() == 4
+        assert histogram.sum == pytest.approx(3.65)
+
+    def test_render(self):
+        """It should render counters, errors, histograms and gauges"""
+        metrics = RequestMetrics(bounds=(0.5,))
+        metrics.observe("/counters/<name>", "GET", 200, 0.25)
+        metrics.observe("/counters/<name>", "GET", 404, 1.0)
+        text = metrics.render({"things": ("Things", 7)})
+        lines = text.splitlines()
+        assert (
+            'counter_http_requests_total{route="/counters/<name>",method="GET",'
+            'status="404"} 1'
+        ) in lines
+        assert 'counter_http_errors_total{status="404"} 1' in lines
+        assert (
+            "counter_http_request_duration_seconds_bucket"
+            '{route="/counters/<name>",method="GET",le="0.5"} 1'
+        ) in lines
+        assert (
+            "counter_http_request_duration_seconds_count"
+            '{route="/counters/<name>",method="GET"} 2'
+        ) in lines
+        assert lines[-3:] == ["# HELP things Things", "# TYPE things gauge", "things 7"]
+
+    def test_label_escaping(self):
+        """It should escape quotes, backslashes and newlines in labels"""
+        metrics = RequestMetrics()
+        metrics.observe('a"b\\c\nd', "GET", 200, 0.0)
+        assert 'route="a\\"b\\\\c\\nd"' in metrics.render()
+
+
+class TestMetricsEndpoint:
+    """Test cases for GET /metrics"""
+
+    def test_records_routes(self, client):
+        """It should count requests per route template and status"""
+        client.post("/counters/a")
+        client.get("/counters/a")
+        client.get("/counters/missing")
+        result = client.get("/metrics")
+        assert result.status_code == HTTPStatus.OK
+        assert result.mimetype == "text/plain"
+        text = result.get_data(as_text=True)
+        assert (
+            'counter_http_requests_total{route="/counters/<name>",method="POST",'
+            'status="201"} 1'
+        ) in text
+        assert 'counter_http_errors_total{status="404"} 1' in text
+        assert "counter_counters 1" in text
+
+    def test_unmatched_paths(self, client):
+        """It should file requests that match no route under one label"""
+        client.get("/nowhere")
+        text = client.get("/metrics").get_data(as_text=True)
+        assert 'route="unmatched",method="GET",status="404"' in text
+
+    def test_disabled(self, client):
+        """It should record nothing when METRICS_ENABLED is off"""
+        app.config["METRICS_ENABLED"] = False
+        try:
+            client.post("/counters/a")
+        finally:
+            app.config["METRICS_ENABLED"] = True
+        assert METRICS.requests == {}
@@ -0,0 +1,241 @@
+"""
+Test Cases for the Counter Journal and Snapshots
+"""
+
+import os
+import threading
+import time
+import pytest
+from src import app, counter
+from src.backends import CounterRangeError, DictCounterStore
+from src.persistence import (
+    MAX_NAME_BYTES,
+    SEGMENT_PREFIX,
+    SNAPSHOT_FILE,
+    CounterJournal,
+)
+from src.store import CounterStore
+from http import HTTPStatus
+
+
+@pytest.fixture()
+def journal_dir(tmp_path):
+    """Directory for journal files"""
+    return str(tmp_path / "data")
+
+
+def open_store(directory, **options):
+    """Return a recovered store and its journal (no background ticks)"""
+    options.setdefault("flush_interval", 3600)
+    options.setdefault("snapshot_interval", 3600)
+    store = CounterStore()
+    journal = CounterJournal(directory, **options).attach(store)
+    return store, journal
+
+
+def on_disk(directory):
+    """Return the counters a fresh process would recover from directory"""
+    store = CounterStore()
+    CounterJournal(directory).recover(store)
+    return store.items()
+
+
+def segment_files(directory):
+    """Return the log segment file names in directory"""
+    return sorted(f for f in os.listdir(directory) if f.startswith(SEGMENT_PREFIX))
+
+
+class TestCounterJournal:
+    """Test cases for CounterJournal"""
+
+    def test_replays_log_after_restart(self, journal_dir):
+        """It should rebuild every counter from the log"""
+        store, journal = open_store(journal_dir)
+        store.create("a")
+        store.increment("a", 5)
+        store.create("b", 2)
+        store.create("gone")
+        store.delete("gone")
+        store.set("b", 7)
+        journal.close()
+
+        recovered, journal = open_store(journal_dir)
+        assert recovered.items() == {"a": 5, "b": 7}
+        recovered.check()
+        journal.close()
+
+    def test_replays_clear(self, journal_dir):
+        """It should replay a reset of every counter"""
+        store, journal = open_store(journal_dir)
+        store.create("a")
+        store.clear()
+        store.create("b")
+        journal.close()
+
+        recovered, journal = open_store(journal_dir)
+        assert recovered.items() == {"b": 0}
+        journal.close()
+
+    def test_snapshot_truncates_log(self, journal_dir):
+        """It should load the snapshot and replay only the newer segment"""
+        store, journal = open_store(journal_dir)
+        for i in range(50):
+            store.create(f"c{i}", i)
+        journal.snapshot()
+        store.increment("c1", 10)
+        store.delete("c2")
+        journal.close()
+
+        assert os.path.exists(os.path.join(journal_dir, SNAPSHOT_FILE))
+        assert len(segment_files(journal_dir)) == 1
+
+        recovered, journal = open_store(journal_dir)
+        expected = {f"c{i}": i for i in range(50)}
+        expected["c1"] = 11
+        del expected["c2"]
+        assert recovered.items() == expected
+        journal.close()
+
+    def test_repeated_restarts_keep_state(self, journal_dir):
+        """It should survive snapshot, restart, more writes and restart"""
+        store, journal = open_store(journal_dir)
+        store.create("a", 1)
+        journal.snapshot()
+        journal.close()
+
+        store, journal = open_store(journal_dir)
+        store.increment("a")
+        journal.snapshot()
+        store.increment("a")
+        journal.close()
+
+        store, journal = open_store(journal_dir)
+        assert store.items() == {"a": 3}
+        journal.close()
+
+    def test_ignores_torn_tail(self, journal_dir):
+        """It should stop replaying at a partially written record"""
+        store, journal = open_store(journal_dir)
+        store.create("a", 4)
+        journal.close()
+        last = segment_files(journal_dir)[-1]
+        with open(os.path.join(journal_dir, last), "ab") as segment:
+            segment.write(b"\x01\x05\x00")
+
+        recovered, journal = open_store(journal_dir)
+        assert recovered.items() == {"a": 4}
+        journal.close()
+
+    def test_background_flush_and_snapshot(self, journal_dir):
+        """It should flush and snapshot on its own timers"""
+        store, journal = open_store(
+            journal_dir, flush_interval=0.01, snapshot_interval=0.02
+        )
+        store.create("a", 9)
+        for _ in range(200):
+            if os.path.exists(os.path.join(journal_dir, SNAPSHOT_FILE)):
+                break
+            time.sleep(0.01)
+        journal.close()
+
+        recovered, journal = open_store(journal_dir)
+        assert recovered.items() == {"a": 9}
+        journal.close()
+
+    def test_sync_waits_for_fsync(self, journal_dir):
+        """It should only return once the records are on disk"""
+        store, journal = open_store(journal_dir)
+        store.create("a", 3)
+        assert on_disk(journal_dir) == {}
+        journal.sync()
+        assert on_disk(journal_dir) == {"a": 3}
+        assert store.journal is journal
+        journal.close()
+        assert store.journal is None
+
+    def test_concurrent_syncs_share_fsyncs(self, journal_dir, monkeypatch):
+        """It should cover every waiting writer with as few fsyncs as possible"""
+        store, journal = open_store(journal_dir)
+        fsyncs = []
+        real_fsync = os.fsync
+
+        def slow_fsync(fd):
+            fsyncs.append(fd)
+            time.sleep(0.01)
+            real_fsync(fd)
+
+        monkeypatch.setattr(os, "fsync", slow_fsync)
+        barrier = threading.Barrier(16)
+
+        def writer(number):
+            barrier.wait()
+            store.create(f"c{number}", number)
+            journal.sync()
+            assert on_disk(journal_dir)[f"c{number}"] == number
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(on_disk(journal_dir)) == 16
+        assert len(fsyncs) < 16
+        journal.close()
+
+    def test_interval_mode_does_not_wait(self, journal_dir):
+        """It should leave the records to the background flush"""
+        store, journal = open_store(journal_dir, group_commit=False)
+        store.create("a")
+        journal.sync()
+        assert on_disk(journal_dir) == {}
+        journal.close()
+        assert on_disk(journal_dir) == {"a": 0}
+
+    def test_requests_are_acknowledged_after_fsync(self, journal_dir, monkeypatch):
+        """It should not answer a write until its record is durable"""
+        store, journal = open_store(journal_dir)
+        monkeypatch.setattr(counter, "STORE", store)
+        client = app.test_client()
+        client.post("/counters/a")
+        client.put("/counters/a")
+        assert on_disk(journal_dir) == {"a": 1}
+        journal.close()
+
+    @pytest.mark.parametrize("store_class", [CounterStore, DictCounterStore])
+    def test_refuses_what_it_cannot_record(self, journal_dir, store_class):
+        """It should refuse a change before making it if no record can hold it"""
+        store = store_class()
+        journal = CounterJournal(journal_dir, flush_interval=3600).attach(store)
+        with pytest.raises(CounterRangeError):
+            store.create("big", 2**64)
+        with pytest.raises(CounterRangeError):
+            store.create("x" * (MAX_NAME_BYTES + 1))
+        store.create("a", 2**63 - 1)
+        with pytest.raises(CounterRangeError):
+            store.increment("a")
+        with pytest.raises(CounterRangeError):
+            store.set("a", -(2**63) - 1)
+        journal.sync()
+        assert store.items() == on_disk(journal_dir) == {"a": 2**63 - 1}
+        journal.close()
+
+    def test_answers_bad_request_for_values_beyond_int64(
+        self, journal_dir, monkeypatch
+    ):
+        """It should answer 400 and keep memory and disk in agreement"""
+        store, journal = open_store(journal_dir)
+        monkeypatch.setattr(counter, "STORE", store)
+        client = app.test_client()
+        client.post("/counters/x")
+        response = client.put(f"/counters/x/set/{2**64}")
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert store.items() == on_disk(journal_dir) == {"x": 0}
+        journal.close()
+
+    def test_rejects_foreign_snapshot(self, journal_dir):
+        """It should refuse a snapshot file it did not write"""
+        os.makedirs(journal_dir)
+        with open(os.path.join(journal_dir, SNAPSHOT_FILE), "wb") as snapshot:
+            snapshot.write(b"x" * 64)
+        with pytest.raises(ValueError):
+            open_store(journal_dir)
@@ -0,0 +1,70 @@
+"""
+Test Cases for Prefix Queries
+"""
+
+import pytest
+from src import app
+from src.index import NameIndex
+from http import HTTPStatus
+
+
+@pytest.fixture()
+def client():
+    """Fixture for Flask test client with no counters"""
+    client = app.test_client()
+    client.post("/counters/reset")
+    return client
+
+
+class TestNameIndexPrefix:
+    """Test cases for NameIndex.with_prefix"""
+
+    def test_stops_at_the_first_mismatch(self):
+        """It should return only the run of names that share the prefix"""
+        index = NameIndex()
+        for name in ("ab", "abc", "abd", "ac", "b", "a"):
+            index.add(name, 0)
+        assert index.with_prefix("ab") == ["ab", "abc", "abd"]
+        assert index.with_prefix("ab", after="abc") == ["abd"]
+        assert index.with_prefix("ab", limit=1) == ["ab"]
+        assert index.with_prefix("") == ["a", "ab", "abc", "abd", "ac", "b"]
+        assert index.with_prefix("z") == []
+
+
+class TestPrefixRoutes:
+    """Test cases for /counters/prefix/<prefix>"""
+
+    def test_pages_through_a_prefix(self, client):
+        """It should list one prefix a page at a time with a cursor"""
+        for name in ("api_eu_hits", "api_us_hits", "api_us_errors", "web_hits"):
+            client.post(f"/counters/{name}")
+        result = client.get("/counters/prefix/api_?limit=2")
+        assert result.status_code == HTTPStatus.OK
+        assert result.get_json() == {
+            "counters": {"api_eu_hits": 0, "api_us_errors": 0},
+            "next": "api_us_errors",
+        }
+        result = client.get("/counters/prefix/api_?limit=2&after=api_us_errors")
+        assert result.get_json() == {"counters": {"api_us_hits": 0}, "next": None}
+
+    def test_prefix_stats(self, client):
+        """It should count and sum the counters under a prefix"""
+        client.post("/counters/api_a")
+        client.post("/counters/api_b")
+        client.post("/counters/web_a")
+        client.put("/counters/api_b/set/5")
+        client.put("/counters/web_a/set/9")
+        result = client.get("/counters/prefix/api/stats")
+        assert result.get_json() == {"prefix": "api", "count": 2, "total": 5}
+
+    def test_invalid_limit(self, client):
+        """It should refuse a page size out of range"""
+        result = client.get("/counters/prefix/a?limit=0")
+        assert result.status_code == HTTPStatus.BAD_REQUEST
+
+    def test_counter_named_prefix(self, client):
+        """It should still route a counter called prefix to the counter routes"""
+        client.post("/counters/prefix")
+        client.put("/counters/prefix")
+        result = client.post("/counters/prefix/reset")
+        assert result.get_json() == {"prefix": 0}
@@ -0,0 +1,57 @@
+"""
+Test Cases for Leaderboard Ranks
+"""
+
+import pytest
+from src import app
+from http import HTTPStatus
+
+
+@pytest.fixture()
+def client():
+    """Fixture for Flask test client with no counters"""
+    client = app.test_client()
+    client.post("/counters/reset")
+    return client
+
+
+class TestRankRoutes:
+    """Test cases for /counters/<name>/rank and /counters/rank/<k>"""
+
+    def test_rank_follows_mutations(self, client):
+        """It should move a counter's rank as values change"""
+        for name in ("a", "b", "c"):
+            client.post(f"/counters/{name}")
+        client.put("/counters/b/set/10")
+        client.put("/counters/c/set/5")
+        result = client.get("/counters/a/rank")
+        assert result.status_code == HTTPStatus.OK
+        assert result.get_json() == {"name": "a", "rank": 3}
+        client.put("/counters/a/set/20")
+        assert client.get("/counters/a/rank").get_json()["rank"] == 1
+        client.delete("/counters/b")
+        assert client.get("/counters/c/rank").get_json()["rank"] == 2
+
+    def test_counter_at_rank(self, client):
+        """It should return the counter at a position of the leaderboard"""
+        for name, value in {"a": 1, "b": 9, "c": 4}.items():
+            client.post(f"/counters/{name}")
+            client.put(f"/counters/{name}/set/{value}")
+        result = client.get("/counters/rank/2")
+        assert result.status_code == HTTPStatus.OK
+        assert result.get_json() == {"name": "c", "value": 4, "rank": 2}
+        top = client.get("/counters/top/3").get_json()
+        assert [
+            client.get(f"/counters/rank/{k}").get_json()["name"] for k in (1, 2, 3)
+        ] == sorted(top, key=top.get, reverse=True)
+
+    @pytest.mark.parametrize("path", ["/counters/rank/0", "/counters/rank/4"])
+    def test_rank_out_of_range(self, client, path):
+        """It should return 404 past either end of the leaderboard"""
+        for name in ("a", "b", "c"):
+            client.post(f"/counters/{name}")
+        assert client.get(path).status_code == HTTPStatus.NOT_FOUND
+
+    def test_missing_counter(self, client):
+        """It should return 404 for the rank of a missing counter"""
+        assert client.get("/counters/missing/rank").status_code == HTTPStatus.NOT_FOUND
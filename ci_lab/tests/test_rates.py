@@ -0,0 +1,187 @@
+"""
+Test Cases for Sliding-window Rates
+"""
+
+import pytest
+from src import app
+from src.counter import STORE
+from src.rates import MAX_WINDOW, CounterRates, Ring
+from http import HTTPStatus
+
+
+class FakeClock:
+    """A clock that only moves when told to"""
+
+    def __init__(self, now=1_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture()
+def client():
+    """Fixture for Flask test client with no counters"""
+    client = app.test_client()
+    client.post("/counters/reset")
+    return client
+
+
+class TestRing:
+    """Test cases for Ring"""
+
+    def test_counts_whole_and_partial_buckets(self):
+        """It should sum covered buckets and prorate the oldest one"""
+        ring = Ring(10.0, 4)
+        ring.add(5, 4)
+        ring.add(15, 2)
+        ring.add(25, 1)
+        assert ring.count(0, 29) == 7
+        assert ring.count(5, 29) == 2 + 2 + 1
+        assert ring.count(20, 29) == 1
+
+    def test_forgets_buckets_it_has_moved_past(self):
+        """It should zero buckets once the clock passes them"""
+        ring = Ring(1.0, 3)
+        ring.add(0, 5)
+        ring.add(4, 1)
+        assert ring.count(-1, 4) == 1
+        ring.add(100, 2)
+        assert list(ring.buckets).count(0) == 2
+        assert ring.idle(103) and not ring.idle(102)
+
+    def test_saturates(self):
+        """It should clamp a bucket at the int64 range instead of raising"""
+        ring = Ring(1.0, 3)
+        ring.add(0, 2**63)
+        ring.add(0, 1)
+        assert ring.buckets[0] == 2**63 - 1
+        ring.add(1, -(2**70))
+        assert ring.buckets[1] == -(2**63)
+
+
+class TestCounterRates:
+    """Test cases for CounterRates"""
+
+    def test_windows(self):
+        """It should count increments within each window"""
+        clock = FakeClock()
+        rates = CounterRates(clock=clock)
+        for _ in range(600):
+            rates.record("a")
+            clock.now += 1
+        assert rates.count("a", 60) == 60
+        assert rates.count("a", 300) == pytest.approx(300, abs=1)
+        assert rates.count("a", 3600) == 600
+        assert rates.count("missing", 60) == 0
+        with pytest.raises(ValueError):
+            rates.count("a", MAX_WINDOW + 1)
+
+    def test_top_by_rate(self):
+        """It should rank counters by recent increments only"""
+        clock = FakeClock()
+        rates = CounterRates(clock=clock)
+        rates.record("old", 100)
+        clock.now += 120
+        rates.record("a", 3)
+        rates.record("b", 5)
+        assert rates.top(5, 60) == [("b", 5), ("a", 3)]
+        assert rates.top(1, 3600) == [("old", 100)]
+        clock.now += 2 * MAX_WINDOW
+        assert rates.top(5, 60) == []
+        assert rates.rings == {}
+
+    def test_striped_rates(self):
+        """It should keep each counter's rings in its own stripe"""
+        rates = CounterRates(clock=FakeClock(), stripes=8)
+        for number in range(20):
+            rates.record(f"c{number}", number + 1)
+        assert rates.count("c4", 60) == 5
+        assert rates.top(2, 60) == [("c19", 20), ("c18", 19)]
+        rates.remove("c4", 5)
+        assert len(rates.rings) == 19
+        rates.clear()
+        assert rates.rings == {}
+
+    def test_forgets_removed_counters(self):
+        """It should drop the rings of deleted and cleared counters"""
+        rates = CounterRates(clock=FakeClock())
+        rates.record("a")
+        rates.record("b")
+        rates.remove("a", 1)
+        assert list(rates.rings) == ["b"]
+        rates.clear()
+        assert rates.rings == {}
+
+
+class TestRateRoutes:
+    """Test cases for the rate routes"""
+
+    def test_counter_rate(self, client):
+        """It should report a counter's recent increments"""
+        client.post("/counters/a")
+        for _ in range(3):
+            client.put("/counters/a")
+        client.put("/counters/a/set/50")
+        result = client.get("/counters/a/rate?window=1m")
+        assert result.status_code == HTTPStatus.OK
+        assert result.get_json() == {
+            "name": "a",
+            "count": 3,
+            "rate": 0.05,
+            "window": 60,
+        }
+
+    def test_batch_increments_count(self, client):
+        """It should count batch increments with their deltas"""
+        client.post("/counters/a")
+        client.post(
+            "/counters/batch", json=[{"op": "increment", "name": "a", "delta": 4}]
+        )
+        assert client.get("/counters/a/rate").get_json()["count"] == 4
+
+    def test_huge_delta_does_not_fail_after_the_write(self, client):
+        """It should finish a batch whose delta overflows a rate bucket"""
+        client.post("/counters/a")
+        operations = [
+            {"op": "increment", "name": "a", "delta": 2**63},
+            {"op": "create", "name": "b"},
+        ]
+        response = client.post("/counters/batch", json=operations)
+        assert response.status_code == HTTPStatus.OK
+        assert client.get("/counters").get_json() == {"a": 2**63, "b": 0}
+
+    def test_top_by_rate(self, client):
+        """It should list the counters with the most recent increments"""
+        for name, times in (("a", 1), ("b", 3), ("c", 0)):
+            client.post(f"/counters/{name}")
+            for _ in range(times):
+                client.put(f"/counters/{name}")
+        result = client.get("/counters/rate/top/5?window=5m")
+        assert result.get_json() == {
+            "window": 300,
+            "counters": [
+                {"name": "b", "count": 3, "rate": 0.01},
+                {"name": "a", "count": 1, "rate": 1 / 300},
+            ],
+        }
+
+    @pytest.mark.parametrize("window", ["0", "3601", "2h", "abc", "m", "1.5"])
+    def test_invalid_window(self, client, window):
+        """It should refuse windows outside one second to one hour"""
+        client.post("/counters/a")
+        result = client.get(f"/counters/a/rate?window={window}")
+        assert result.status_code == HTTPStatus.BAD_REQUEST
+
+    def test_missing_counter(self, client):
+        """It should return 404 for a counter that does not exist"""
+        result = client.get("/counters/missing/rate")
+        assert result.status_code == HTTPStatus.NOT_FOUND
+
+    def test_deleted_counter_leaves_top(self, client):
+        """It should not rank counters that have been deleted"""
+        client.post("/counters/a")
+        client.put("/counters/a")
+        client.delete("/counters/a")
+        assert client.get("/counters/rate/top/5").get_json()["counters"] == []
+        assert "a" not in STORE.rates.rings
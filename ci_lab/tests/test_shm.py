@@ -0,0 +1,217 @@
+"""
+Test Cases for the Cross-process Shared Counter Store
+"""
+
+import multiprocessing
+import pytest
+from src import app
+from src import counter
+from src.backends import INT64_MAX, CounterRangeError
+from src.counter import create_store
+from src.shm import SharedCounterStore, SharedTableError
+from src.tcp import execute
+from tests.test_asgi import AsgiClient
+from http import HTTPStatus
+
+PROCESSES = 4
+INCREMENTS = 500
+
+
+@pytest.fixture()
+def table(tmp_path):
+    """A small shared table in a temporary file"""
+    store = SharedCounterStore(str(tmp_path / "counters"), stripes=4)
+    yield store
+    store.close()
+
+
+def increment_in_child(path, names):
+    """Child process: attach to the table and increment every name"""
+    store = SharedCounterStore(path)
+    for _ in range(INCREMENTS):
+        for name in names:
+            store.increment(name)
+
+
+class TestSharedCounterStore:
+    """Test cases for SharedCounterStore"""
+
+    def test_basic_operations(self, table):
+        """It should create, increment, set and delete counters"""
+        assert table.create("a")
+        assert not table.create("a")
+        assert table.increment("a", 5) == 5
+        assert table.set("a", 2) == 2
+        assert table.get("a") == 2
+        assert "a" in table
+        assert table.increment("missing") is None
+        assert table.set("missing", 1) is None
+        assert table.delete("a") == 2
+        assert table.delete("a") is None
+        assert len(table) == 0
+        table.check()
+
+    def test_queries(self, table):
+        """It should answer ordered, range and aggregate queries"""
+        for name, value in {"a": 3, "b": 1, "c": 7, "d": 3}.items():
+            table.create(name, value)
+        assert table.top(2) == [("c", 7), ("d", 3)]
+        assert table.bottom(1) == [("b", 1)]
+        assert sorted(table.greater_than(2)) == [("a", 3), ("c", 7), ("d", 3)]
+        assert table.less_than(3) == [("b", 1)]
+        assert sorted(table.equal_to(3)) == [("a", 3), ("d", 3)]
+        assert table.total() == 14
+        assert table.page(None, 2) == [("a", 3), ("b", 1)]
+        assert table.page("b", 5) == [("c", 7), ("d", 3)]
+        assert table.summary() == {
+            "count": 4,
+            "total": 14,
+            "min": 1,
+            "max": 7,
+            "mean": 3.5,
+        }
+        table.clear()
+        assert table.items() == {}
+        assert table.total() == 0
+
+    def test_reattach_keeps_counters(self, table):
+        """It should see counters written through another mapping"""
+        table.create("kept", 4)
+        other = SharedCounterStore(table.path, stripes=16)
+        assert other.stripes == 4
+        assert other.get("kept") == 4
+        other.close()
+
+    def test_deleted_slots_are_reused(self, tmp_path):
+        """It should reuse tombstones and report a full table"""
+        table = SharedCounterStore(
+            str(tmp_path / "tiny"), stripes=1, slots_per_stripe=2
+        )
+        table.create("a")
+        table.create("b")
+        with pytest.raises(SharedTableError):
+            table.create("c")
+        table.delete("a")
+        assert table.create("c")
+        assert table.items() == {"b": 0, "c": 0}
+        table.check()
+        table.close()
+
+    def test_rejects_values_beyond_int64(self, table):
+        """It should refuse values its int64 slots cannot hold, changing nothing"""
+        with pytest.raises(CounterRangeError):
+            table.create("a", INT64_MAX + 1)
+        assert "a" not in table
+        table.create("a", INT64_MAX)
+        with pytest.raises(CounterRangeError):
+            table.increment("a")
+        table.create("b")
+        with pytest.raises(CounterRangeError):
+            table.set("b", INT64_MAX + 1)
+        assert table.items() == {"a": INT64_MAX, "b": 0}
+        table.check()
+
+    def test_stripe_sums_past_int64(self, tmp_path):
+        """It should keep exact sums when one stripe's counters add past int64"""
+        table = SharedCounterStore(str(tmp_path / "one"), stripes=1)
+        for name in ("a", "b", "c"):
+            table.create(name, INT64_MAX)
+        table.create("d", -5)
+        assert table.total() == 3 * INT64_MAX - 5
+        table.set("a", -INT64_MAX)
+        table.delete("b")
+        assert table.total() == -5
+        table.check()
+        table.close()
+
+    def test_geometry_from_environment(self, tmp_path):
+        """It should create a new table with the configured stripes and slots"""
+        store = create_store(
+            {
+                "COUNTER_SHM_PATH": str(tmp_path / "sized"),
+                "COUNTER_SHM_STRIPES": "8",
+                "COUNTER_SHM_SLOTS": "4096",
+            }
+        )
+        assert (store.stripes, store.slots_per_stripe) == (8, 4096)
+        for number in range(20_000):
+            store.create(f"c{number}")
+        assert len(store) == 20_000
+        store.close()
+
+    def test_rejects_long_names(self, table):
+        """It should refuse names longer than a slot can hold"""
+        with pytest.raises(SharedTableError):
+            table.create("x" * 100)
+        assert table.get("x" * 100) is None
+
+    def test_rejects_foreign_file(self, tmp_path):
+        """It should not map a file that is not a counter table"""
+        path = tmp_path / "other"
+        path.write_bytes(b"not a table" * 10)
+        with pytest.raises(SharedTableError):
+            SharedCounterStore(str(path))
+
+    def test_increments_across_processes(self, table):
+        """It should not lose increments made concurrently by many processes"""
+        names = ["x", "y", "z"]
+        for name in names:
+            table.create(name)
+        context = multiprocessing.get_context("fork")
+        workers = [
+            context.Process(target=increment_in_child, args=(table.path, names))
+            for _ in range(PROCESSES)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert table.items() == {name: PROCESSES * INCREMENTS for name in names}
+        table.check()
+
+    def test_forked_child_reuses_store_object(self, table):
+        """It should reattach when a forked child uses the parent's store"""
+        table.create("forked")
+        context = multiprocessing.get_context("fork")
+        worker = context.Process(target=table.increment, args=("forked", 3))
+        worker.start()
+        worker.join()
+        assert table.get("forked") == 3
+
+
+def test_routes_on_shared_table(table, monkeypatch):
+    """It should serve the existing routes from a shared table"""
+    monkeypatch.setattr(counter, "STORE", table)
+    client = app.test_client()
+    client.post("/counters/a")
+    client.put("/counters/a")
+    client.post("/counters/b")
+    client.put("/counters/b/set/5")
+
+    assert client.get("/counters").get_json() == {"a": 1, "b": 5}
+    assert client.get("/counters/total").get_json() == {"total": 6}
+    assert client.get("/counters/top/1").get_json() == {"b": 5}
+
+    response = client.post("/counters/" + "x" * 100)
+    assert response.status_code == HTTPStatus.INSUFFICIENT_STORAGE
+
+
+def test_out_of_range_values_on_shared_table(table, monkeypatch):
+    """It should answer 400 for values beyond int64 on every front-end"""
+    monkeypatch.setattr(counter, "STORE", table)
+    client = app.test_client()
+    client.post("/counters/a")
+    response = client.put(f"/counters/a/set/{INT64_MAX + 1}")
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    results = client.post(
+        "/counters/batch",
+        json=[
+            {"op": "set", "name": "a", "value": INT64_MAX},
+            {"op": "increment", "name": "a"},
+            {"op": "create", "name": "b"},
+        ],
+    ).get_json()["results"]
+    assert [result["status"] for result in results] == [200, 400, 201]
+    assert execute("INCR a").startswith("-ERR")
+    assert AsgiClient().put("/counters/a").status_code == HTTPStatus.BAD_REQUEST
+    assert client.get("/counters").get_json() == {"a": INT64_MAX, "b": 0}
@@ -0,0 +1,104 @@
+"""
+Test Cases for Approximate Heavy Hitters
+"""
+
+import random
+from collections import Counter
+import pytest
+from src import app
+from src.counter import APPROX
+from src.sketch import SpaceSaving
+from http import HTTPStatus
+
+
+@pytest.fixture()
+def client():
+    """Fixture for Flask test client with no approximate counters"""
+    client = app.test_client()
+    client.delete("/approx")
+    return client
+
+
+class TestSpaceSaving:
+    """Test cases for SpaceSaving"""
+
+    def test_exact_below_capacity(self):
+        """It should count exactly while every name fits"""
+        summary = SpaceSaving(capacity=4)
+        for name in "abacab":
+            summary.increment(name)
+        assert summary.top(3) == [("a", 3, 0), ("b", 2, 0), ("c", 1, 0)]
+        assert summary.estimate("z") == (0, 0)
+
+    def test_evicts_lowest(self):
+        """It should give a new name the lowest slot and its count as error"""
+        summary = SpaceSaving(capacity=2)
+        summary.increment("a", 5)
+        summary.increment("b", 2)
+        assert summary.increment("c") == (3, 2)
+        assert "b" not in summary.counts
+        assert summary.estimate("b") == (3, 3)
+
+    def test_error_bounds_on_skewed_stream(self):
+        """It should bracket every true count and keep the heavy hitters"""
+        rng = random.Random(7)
+        stream = [f"k{int(rng.paretovariate(1.2))}" for _ in range(20_000)]
+        summary = SpaceSaving(capacity=50)
+        for name in stream:
+            summary.increment(name)
+        exact = Counter(stream)
+        bound = len(stream) / summary.capacity
+        for name, true_count in exact.items():
+            count, error = summary.estimate(name)
+            assert count - error <= true_count <= count
+            assert error <= bound
+            if true_count > bound:
+                assert name in summary.counts
+        assert summary.top(1)[0][0] == exact.most_common(1)[0][0]
+
+    def test_rejects_bad_arguments(self):
+        """It should refuse an empty capacity and negative increments"""
+        with pytest.raises(ValueError):
+            SpaceSaving(capacity=0)
+        with pytest.raises(ValueError):
+            SpaceSaving().increment("a", -1)
+
+
+class TestApproxRoutes:
+    """Test cases for the /approx routes"""
+
+    def test_increment_and_estimate(self, client):
+        """It should count increments and report estimates with their error"""
+        client.put("/approx/a")
+        result = client.put("/approx/a")
+        assert result.status_code == HTTPStatus.OK
+        assert result.get_json() == {"name": "a", "count": 2, "error": 0}
+        result = client.get("/approx/missing")
+        assert result.get_json() == {"name": "missing", "count": 0, "error": 0}
+
+    def test_top_and_summary(self, client):
+        """It should list the heaviest names and describe the summary"""
+        for name in ("a", "b", "a"):
+            client.put(f"/approx/{name}")
+        result = client.get("/approx/top/1")
+        assert result.get_json() == {
+            "counters": [{"name": "a", "count": 2, "error": 0}]
+        }
+        summary = client.get("/approx").get_json()
+        assert summary == {
+            "capacity": APPROX.capacity,
+            "monitored": 2,
+            "total": 3,
+            "max_error": 0,
+        }
+
+    def test_invalid_name(self, client):
+        """It should refuse names the exact counters would refuse"""
+        result = client.put("/approx/bad-name")
+        assert result.status_code == HTTPStatus.BAD_REQUEST
+
+    def test_reset(self, client):
+        """It should forget every approximate counter"""
+        client.put("/approx/a")
+        assert client.delete("/approx").status_code == HTTPStatus.OK
+        assert len(APPROX) == 0
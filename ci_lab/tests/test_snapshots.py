@@ -0,0 +1,141 @@
+"""
+Test Cases for Consistent Snapshots
+"""
+
+import threading
+import pytest
+from src import app
+from src.snapshots import SnapshotRegistry
+from src.store import CounterStore
+from http import HTTPStatus
+
+
+@pytest.fixture()
+def client():
+    """Fixture for Flask test client with a few counters"""
+    client = app.test_client()
+    client.post("/counters/reset")
+    for name, value in {"a": 3, "b": 1, "c": 7}.items():
+        client.post(f"/counters/{name}")
+        client.put(f"/counters/{name}/set/{value}")
+    return client
+
+
+class FakeClock:
+    """A clock the tests move by hand"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSnapshotRegistry:
+    """Test cases for SnapshotRegistry"""
+
+    def test_isolated_from_writes(self):
+        """It should keep showing the counters as they were when taken"""
+        store, registry = CounterStore(), SnapshotRegistry()
+        store.create("a", 1)
+        snapshot_id, snapshot = registry.create(store)
+        store.increment("a", 5)
+        store.create("b", 2)
+        assert registry.get(snapshot_id).page(None, 10) == [("a", 1)]
+        assert snapshot.summary()["total"] == 1
+
+    def test_shares_copies_until_a_write(self):
+        """It should reuse an open snapshot's copy while nothing changed"""
+        store, registry = CounterStore(), SnapshotRegistry()
+        store.create("a")
+        _, first = registry.create(store)
+        _, second = registry.create(store)
+        store.increment("a")
+        _, third = registry.create(store)
+        assert first is second
+        assert third is not first
+
+    def test_expires_idle_and_excess(self):
+        """It should drop snapshots idle past the ttl or beyond the limit"""
+        clock = FakeClock()
+        store, registry = CounterStore(), SnapshotRegistry(ttl=10, limit=2, clock=clock)
+        kept, _ = registry.create(store)
+        idle, _ = registry.create(store)
+        clock.now = 8
+        assert registry.get(kept) is not None
+        clock.now = 12
+        assert registry.get(idle) is None
+        assert registry.get(kept) is not None
+        registry.create(store)
+        registry.create(store)
+        assert registry.get(kept) is None
+        assert len(registry) == 2
+
+    def test_consistent_under_concurrent_writes(self):
+        """It should always see a state where the transfer invariant holds"""
+        store, registry = CounterStore(), SnapshotRegistry(limit=1000)
+        store.create("from", 1000)
+        store.create("to", 0)
+        stop = threading.Event()
+
+        def transfer():
+            while not stop.is_set():
+                # The sum is 1001 between these two writes, 1000 otherwise
+                store.increment("to", 1)
+                store.increment("from", -1)
+
+        writer = threading.Thread(target=transfer)
+        writer.start()
+        try:
+            for _ in range(200):
+                _, snapshot = registry.create(store)
+                counters = snapshot.counters
+                assert counters["from"] + counters["to"] in (1000, 1001)
+                assert snapshot.summary()["total"] == sum(counters.values())
+        finally:
+            stop.set()
+            writer.join()
+
+
+class TestSnapshotRoutes:
+    """Test cases for /counters/snapshot"""
+
+    def test_multi_step_reads(self, client):
+        """It should answer every read of a snapshot from the same state"""
+        result = client.post("/counters/snapshot")
+        assert result.status_code == HTTPStatus.CREATED
+        body = result.get_json()
+        assert (body["count"], body["total"], body["max"]) == (3, 11, 7)
+        snapshot_id = body["id"]
+        client.put("/counters/b/set/100")
+        client.delete("/counters/c")
+
+        page = client.get(f"/counters/snapshot/{snapshot_id}?limit=2").get_json()
+        assert page == {"counters": {"a": 3, "b": 1}, "next": "b"}
+        page = client.get(f"/counters/snapshot/{snapshot_id}?limit=2&after=b")
+        assert page.get_json() == {"counters": {"c": 7}, "next": None}
+        top = client.get(f"/counters/snapshot/{snapshot_id}/top/1").get_json()
+        assert top == {"c": 7}
+        stats = client.get(f"/counters/snapshot/{snapshot_id}/stats").get_json()
+        assert stats["total"] == 11
+        assert client.get("/counters/total").get_json() == {"total": 103}
+
+    def test_release(self, client):
+        """It should forget a released snapshot"""
+        snapshot_id = client.post("/counters/snapshot").get_json()["id"]
+        result = client.delete(f"/counters/snapshot/{snapshot_id}")
+        assert result.status_code == HTTPStatus.NO_CONTENT
+        result = client.get(f"/counters/snapshot/{snapshot_id}")
+        assert result.status_code == HTTPStatus.NOT_FOUND
+
+    def test_unknown_snapshot(self, client):
+        """It should return 404 for ids it does not know"""
+        for path in ("/counters/snapshot/x", "/counters/snapshot/x/top/1"):
+            assert client.get(path).status_code == HTTPStatus.NOT_FOUND
+        assert client.delete("/counters/snapshot/x").status_code == 404
+
+    def test_invalid_limit(self, client):
+        """It should refuse a bad page size"""
+        snapshot_id = client.post("/counters/snapshot").get_json()["id"]
+        result = client.get(f"/counters/snapshot/{snapshot_id}?limit=0")
+        assert result.status_code == HTTPStatus.BAD_REQUEST
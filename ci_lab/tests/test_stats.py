@@ -0,0 +1,158 @@
+"""
+Test Cases for Running Counter Aggregates
+"""
+
+import pytest
+from src import app
+from src.counter import check_consistency, STORE
+from src.stats import CounterStats, ValueHistogram, bucket_bounds, log_bucket
+from http import HTTPStatus
+
+
+@pytest.fixture()
+def client():
+    """Fixture for Flask test client with no counters"""
+    client = app.test_client()
+    client.post("/counters/reset")
+    return client
+
+
+class TestCounterStats:
+    """Test cases for CounterStats"""
+
+    def test_running_totals(self):
+        """It should track count, total and mean through mutations"""
+        stats = CounterStats()
+        assert stats.mean() is None
+        stats.add("a", 4)
+        stats.add("b", 2)
+        stats.update("a", 4, 10)
+        assert (stats.count, stats.total, stats.mean()) == (2, 12, 6)
+        stats.remove("b", 2)
+        assert (stats.count, stats.total) == (1, 10)
+        stats.clear()
+        assert (stats.count, stats.total) == (0, 0)
+
+    def test_check_detects_drift(self):
+        """It should raise when the aggregates disagree with the counters"""
+        stats = CounterStats()
+        stats.add("a", 1)
+        stats.check({"a": 1})
+        with pytest.raises(AssertionError):
+            stats.check({"a": 2})
+
+
+class TestValueHistogram:
+    """Test cases for ValueHistogram"""
+
+    def test_log_buckets(self):
+        """It should group values by power of two, with zero on its own"""
+        assert [log_bucket(v) for v in (0, 1, 2, 3, 4, 7, 8, -1, -5)] == [
+            0,
+            1,
+            2,
+            2,
+            3,
+            3,
+            4,
+            -1,
+            -3,
+        ]
+        assert bucket_bounds(0) == (0, 0)
+        assert bucket_bounds(3) == (4, 7)
+        assert bucket_bounds(-3) == (-7, -4)
+
+    def test_follows_mutations(self):
+        """It should move counters between buckets as their values change"""
+        histogram = ValueHistogram()
+        histogram.add("a", 0)
+        histogram.add("b", 5)
+        histogram.update("a", 0, 6)
+        histogram.update("b", 5, 4)
+        assert histogram.buckets() == [{"lower": 4, "upper": 7, "count": 2}]
+        histogram.remove("a", 6)
+        histogram.check({"b": 4})
+        with pytest.raises(AssertionError):
+            histogram.check({"b": 100})
+
+
+class TestStatsRoutes:
+    """Test cases for the aggregate routes"""
+
+    def test_stats_of_empty_namespace(self, client):
+        """It should report zero counters and no min/max/mean"""
+        response = client.get("/counters/stats")
+        assert response.status_code == HTTPStatus.OK
+        assert response.get_json() == {
+            "count": 0,
+            "total": 0,
+            "min": None,
+            "max": None,
+            "mean": None,
+        }
+
+    def test_stats_follow_every_mutation(self, client):
+        """It should keep total, count and stats exact across all mutations"""
+        for name in ("a", "b", "c"):
+            client.post(f"/counters/{name}")
+        client.put("/counters/a")
+        client.put("/counters/b/set/7")
+        client.post("/counters/c/reset")
+        client.delete("/counters/c")
+
+        assert client.get("/counters/total").get_json() == {"total": 8}
+        assert client.get("/counters/count").get_json() == {"count": 2}
+        assert client.get("/counters/stats").get_json() == {
+            "count": 2,
+            "total": 8,
+            "min": 1,
+            "max": 7,
+            "mean": 4.0,
+        }
+
+    def test_consistency_check_catches_drift(self, client):
+        """It should fail the check when a derived structure is out of step"""
+        client.post("/counters/a")
+        STORE.stats.total += 1
+        try:
+            with pytest.raises(AssertionError):
+                check_consistency()
+        finally:
+            STORE.stats.total -= 1
+        check_consistency()
+
+
+class TestDistributionRoute:
+    """Test cases for GET /counters/distribution"""
+
+    def test_empty_namespace(self, client):
+        """It should report no quantiles and no buckets without counters"""
+        result = client.get("/counters/distribution?q=0.5")
+        assert result.get_json() == {
+            "count": 0,
+            "quantiles": {"0.5": None},
+            "buckets": [],
+        }
+
+    def test_quantiles_and_buckets(self, client):
+        """It should report nearest-rank quantiles and value buckets"""
+        for i in range(1, 11):
+            client.post(f"/counters/c{i}")
+            client.put(f"/counters/c{i}/set/{i * 10}")
+        result = client.get("/counters/distribution?q=0,0.5,0.9,1")
+        assert result.status_code == HTTPStatus.OK
+        body = result.get_json()
+        assert body["count"] == 10
+        assert body["quantiles"] == {"0.0": 10, "0.5": 50, "0.9": 90, "1.0": 100}
+        assert body["buckets"] == [
+            {"lower": 8, "upper": 15, "count": 1},
+            {"lower": 16, "upper": 31, "count": 2},
+            {"lower": 32, "upper": 63, "count": 3},
+            {"lower": 64, "upper": 127, "count": 4},
+        ]
+
+    @pytest.mark.parametrize("q", ["abc", "1.5", "-0.1", "0.5,", "nan"])
+    def test_invalid_quantiles(self, client, q):
+        """It should refuse quantiles outside 0..1"""
+        result = client.get(f"/counters/distribution?q={q}")
+        assert result.status_code == HTTPStatus.BAD_REQUEST
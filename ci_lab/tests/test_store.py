@@ -0,0 +1,148 @@
+"""
+Test Cases for the Thread-safe Counter Store
+"""
+
+import threading
+from src import app
+from src.store import DRAIN_AT, CounterStore
+from http import HTTPStatus
+
+THREADS = 16
+INCREMENTS = 2_000
+
+
+def hammer(target, threads=THREADS):
+    """Run target(thread_number) on many threads released at once"""
+    barrier = threading.Barrier(threads)
+
+    def run(number):
+        barrier.wait()
+        target(number)
+
+    workers = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+class TestCounterStore:
+    """Test cases for CounterStore"""
+
+    def test_basic_operations(self):
+        """It should create, increment, set and delete counters"""
+        store = CounterStore(stripes=4)
+        assert store.create("a")
+        assert not store.create("a")
+        assert store.increment("a", 5) == 5
+        assert store.set("a", 2) == 2
+        assert store.get("a") == 2
+        assert store.increment("missing") is None
+        assert store.set("missing", 1) is None
+        assert store.delete("a") == 2
+        assert store.delete("a") is None
+        assert len(store) == 0
+        store.check()
+
+    def test_items_is_a_copy(self):
+        """It should hand out a copy that later writes do not touch"""
+        store = CounterStore()
+        store.create("a")
+        items = store.items()
+        store.increment("a")
+        assert items == {"a": 0}
+
+    def test_concurrent_increments_are_not_lost(self):
+        """It should count every increment from many threads"""
+        store = CounterStore()
+        names = [f"c{i}" for i in range(8)]
+        for name in names:
+            store.create(name)
+
+        def work(number):
+            for i in range(INCREMENTS):
+                store.increment(names[(number + i) % len(names)])
+
+        hammer(work)
+
+        assert sum(store.items().values()) == THREADS * INCREMENTS
+        assert store.summary()["total"] == THREADS * INCREMENTS
+        store.check()
+
+    def test_single_hot_counter(self):
+        """It should not drop increments when every thread hits one counter"""
+        store = CounterStore()
+        store.create("hot")
+        hammer(lambda number: [store.increment("hot") for _ in range(INCREMENTS)])
+        assert store.get("hot") == THREADS * INCREMENTS
+        store.check()
+
+    def test_mixed_mutations_keep_indexes_consistent(self):
+        """It should keep the index and aggregates exact under mixed writes"""
+        store = CounterStore()
+
+        def work(number):
+            for i in range(500):
+                name = f"c{(number * 7 + i) % 20}"
+                store.create(name)
+                store.increment(name, 3)
+                if i % 5 == 0:
+                    store.set(name, i)
+                if i % 11 == 0:
+                    store.delete(name)
+
+        hammer(work)
+        store.check()
+
+    def test_writes_queue_index_updates_for_readers(self):
+        """It should leave index upkeep to the next reader, who sees every write"""
+        store = CounterStore()
+        store.create("a")
+        store.increment("a", 5)
+        assert len(store._pending) == 2
+        assert store.top(1) == [("a", 5)]
+        assert not store._pending
+        store.set("a", 1)
+        assert store.total() == 1
+
+    def test_queue_is_bounded_without_readers(self):
+        """It should apply the queue on the write path once it grows long"""
+        store = CounterStore()
+        for i in range(DRAIN_AT * 3):
+            store.create(f"c{i}")
+        assert len(store._pending) < DRAIN_AT
+        store.check()
+
+    def test_readers_during_writes(self):
+        """It should keep queries consistent while other threads write"""
+        store = CounterStore()
+        for i in range(20):
+            store.create(f"c{i}")
+
+        def work(number):
+            for i in range(500):
+                if number % 2:
+                    store.increment(f"c{(number + i) % 20}")
+                else:
+                    assert len(store.top(5)) == 5
+                    assert store.summary()["count"] == 20
+
+        hammer(work)
+        assert store.total() == THREADS // 2 * 500
+        store.check()
+
+
+def test_concurrent_requests_through_the_app():
+    """It should count every PUT issued from many request threads"""
+    client = app.test_client()
+    client.post("/counters/reset")
+    client.post("/counters/threaded")
+
+    hammer(
+        lambda number: [app.test_client().put("/counters/threaded") for _ in range(50)],
+        threads=8,
+    )
+
+    response = client.get("/counters/threaded")
+    assert response.status_code == HTTPStatus.OK
+    assert response.get_json() == {"threaded": 8 * 50}
@@ -0,0 +1,138 @@
+"""
+Test Cases for the TCP Counter Protocol
+"""
+
+import os
+import socket
+import threading
+import time
+import pytest
+from src import app, counter
+from src.persistence import CounterJournal
+from src.store import CounterStore
+from src.tcp import MAX_LINE, execute, serve_in_thread
+
+
+@pytest.fixture()
+def client():
+    """Fixture for Flask test client with no counters"""
+    client = app.test_client()
+    client.post("/counters/reset")
+    return client
+
+
+@pytest.fixture(scope="module")
+def port():
+    """Port of a protocol server running for this module's tests"""
+    return serve_in_thread("127.0.0.1", 0)
+
+
+def exchange(port, payload):
+    """Send payload on a fresh connection and return every reply received"""
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+        sock.sendall(payload)
+        sock.shutdown(socket.SHUT_WR)
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+
+class TestExecute:
+    """Test cases for single protocol commands"""
+
+    def test_commands(self, client):
+        """It should increment, read and set counters like the HTTP routes"""
+        client.post("/counters/hits")
+        assert execute("INCR hits") == ":1"
+        assert execute("incr hits 5") == ":6"
+        assert execute("GET hits") == ":6"
+        assert execute("SET hits 2") == ":2"
+        assert execute("MGET hits missing hits") == "*3 :2 _ :2"
+        assert execute("PING") == "+PONG"
+        assert client.get("/counters/hits").get_json() == {"hits": 2}
+
+    def test_missing_counters(self, client):
+        """It should reply _ for counters that do not exist"""
+        assert execute("INCR missing") == "_"
+        assert execute("GET missing") == "_"
+        assert execute("SET missing 3") == "_"
+        assert "missing" not in counter.STORE
+
+    @pytest.mark.parametrize(
+        "line",
+        ["", "NOPE a", "GET", "GET a b", "SET a", "INCR a -1", "SET a x", "PING x"],
+    )
+    def test_errors(self, client, line):
+        """It should reply -ERR to malformed commands"""
+        assert execute(line).startswith("-ERR ")
+
+    def test_rates(self, client):
+        """It should count protocol increments towards the counter's rates"""
+        client.post("/counters/hits")
+        execute("INCR hits 3")
+        assert counter.STORE.rates.count("hits", 60) == 3
+        assert execute(f"INCR hits {2**63}") == f":{2**63 + 3}"
+
+
+class TestServer:
+    """Test cases for the protocol over a socket"""
+
+    def test_pipelining(self, client, port):
+        """It should answer pipelined commands in order"""
+        client.post("/counters/hits")
+        commands = b"INCR hits\r\n" * 1000 + b"GET hits\nBAD\n"
+        replies = exchange(port, commands).decode().splitlines()
+        assert replies[:1000] == [f":{i}" for i in range(1, 1001)]
+        assert replies[1000:] == [":1000", "-ERR unknown command 'BAD'"]
+
+    def test_line_split_across_reads(self, client, port):
+        """It should wait for the rest of a line before executing it"""
+        client.post("/counters/hits")
+        with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+            sock.sendall(b"INCR hi")
+            sock.sendall(b"ts 4\n")
+            assert sock.recv(100) == b":4\n"
+
+    def test_line_too_long(self, client, port):
+        """It should close connections that send overlong lines"""
+        # Exactly one byte over, so the server has read everything we sent
+        reply = exchange(port, b"GET " + b"x" * (MAX_LINE - 3))
+        assert reply == b"-ERR line too long\n"
+
+    def test_journaled_replies_share_fsyncs(self, port, tmp_path, monkeypatch):
+        """It should wait for fsyncs off the loop, so connections share them"""
+        store = CounterStore()
+        journal = CounterJournal(str(tmp_path), flush_interval=3600).attach(store)
+        monkeypatch.setattr(counter, "STORE", store)
+        fsyncs = []
+        real_fsync = os.fsync
+
+        def slow_fsync(fd):
+            fsyncs.append(fd)
+            time.sleep(0.05)
+            real_fsync(fd)
+
+        monkeypatch.setattr(os, "fsync", slow_fsync)
+        for number in range(8):
+            store.create(f"c{number}")
+        journal.sync()
+        fsyncs.clear()
+        replies = {}
+
+        def connection(number):
+            replies[number] = exchange(port, f"INCR c{number} {number}\n".encode())
+
+        threads = [threading.Thread(target=connection, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert replies == {n: f":{n}\n".encode() for n in range(8)}
+        recovered = CounterStore()
+        CounterJournal(str(tmp_path)).recover(recovered)
+        assert recovered.items() == {f"c{n}": n for n in range(8)}
+        assert len(fsyncs) < 8
+        journal.close()
@@ -0,0 +1,127 @@
+"""
+Test Cases for Counter Versions, ETags and Cached Responses
+"""
+
+import pytest
+from src import app, counter
+from src.backends import SQLiteCounterStore
+from src.counter import STORE
+from src.versions import CounterVersions
+from http import HTTPStatus
+
+
+@pytest.fixture()
+def client():
+    """Fixture for Flask test client with no counters"""
+    client = app.test_client()
+    client.post("/counters/reset")
+    return client
+
+
+class TestCounterVersions:
+    """Test cases for CounterVersions"""
+
+    def test_versions_advance(self):
+        """It should stamp each changed counter with the global version"""
+        versions = CounterVersions()
+        versions.add("a", 0)
+        versions.add("b", 0)
+        versions.update("a", 0, 1)
+        assert versions.version == 3
+        assert versions.counters == {"a": 3, "b": 2}
+        versions.remove("b", 0)
+        assert versions.etag("b") is None
+        assert versions.etag("a") == f"{versions.epoch}-3"
+        versions.clear()
+        assert (versions.version, versions.counters) == (5, {})
+
+    def test_striped_versions(self):
+        """It should advance the version for writes to any stripe"""
+        versions = CounterVersions(stripes=8)
+        tags = set()
+        for number in range(20):
+            versions.add(f"c{number}", 0)
+            tags.add(versions.etag())
+        assert versions.version == 20 and len(tags) == 20
+        before = versions.etag("c3")
+        versions.update("c3", 0, 1)
+        assert versions.etag("c3") != before
+        versions.clear()
+        assert versions.version == 29 and versions.counters == {}
+
+    def test_cache_is_dropped_on_write(self):
+        """It should render a query once per version"""
+        versions = CounterVersions()
+        renders = []
+
+        def render():
+            renders.append(versions.version)
+            return b"body"
+
+        assert versions.cached("q", render) == (versions.etag(), b"body")
+        versions.cached("q", render)
+        assert renders == [0]
+        versions.add("a", 0)
+        versions.cached("q", render)
+        assert renders == [0, 1]
+
+    def test_cache_is_bounded(self):
+        """It should not keep more entries than cache_size"""
+        versions = CounterVersions(cache_size=2)
+        for key in range(5):
+            versions.cached(key, lambda: b"")
+        assert len(versions._cache) <= 2
+
+
+class TestConditionalRequests:
+    """Test cases for ETags and 304 responses"""
+
+    @pytest.mark.parametrize(
+        "path",
+        ["/counters", "/counters?limit=10", "/counters/top/3", "/counters/total"],
+    )
+    def test_not_modified_until_write(self, client, path):
+        """It should answer a matching If-None-Match with 304 until a write"""
+        client.post("/counters/a")
+        first = client.get(path)
+        assert first.status_code == HTTPStatus.OK
+        tag = first.headers["ETag"]
+        again = client.get(path, headers={"If-None-Match": tag})
+        assert again.status_code == HTTPStatus.NOT_MODIFIED
+        assert again.data == b""
+        client.put("/counters/a")
+        changed = client.get(path, headers={"If-None-Match": tag})
+        assert changed.status_code == HTTPStatus.OK
+        assert changed.headers["ETag"] != tag
+
+    def test_per_counter_tags(self, client):
+        """It should keep a counter's tag while other counters change"""
+        client.post("/counters/a")
+        client.post("/counters/b")
+        tag = client.get("/counters/a").headers["ETag"]
+        client.put("/counters/b")
+        result = client.get("/counters/a", headers={"If-None-Match": tag})
+        assert result.status_code == HTTPStatus.NOT_MODIFIED
+        client.put("/counters/a")
+        result = client.get("/counters/a", headers={"If-None-Match": tag})
+        assert result.status_code == HTTPStatus.OK
+        assert result.get_json() == {"a": 1}
+
+    def test_serves_cached_body(self, client, monkeypatch):
+        """It should not query the store again while nothing has changed"""
+        client.post("/counters/a")
+        assert client.get("/counters").get_json() == {"a": 0}
+        monkeypatch.setattr(STORE, "items", lambda: pytest.fail("not cached"))
+        assert client.get("/counters").get_json() == {"a": 0}
+
+    def test_unversioned_store(self, monkeypatch):
+        """It should tag responses by their content without store versions"""
+        monkeypatch.setattr(counter, "STORE", SQLiteCounterStore())
+        client = app.test_client()
+        client.post("/counters/a")
+        tag = client.get("/counters/total").headers["ETag"]
+        result = client.get("/counters/total", headers={"If-None-Match": tag})
+        assert result.status_code == HTTPStatus.NOT_MODIFIED
+        client.put("/counters/a")
+        result = client.get("/counters/total", headers={"If-None-Match": tag})
+        assert result.get_json() == {"total": 1}